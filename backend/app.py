@@ -1,18 +1,50 @@
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import UploadFile, File, Form, FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse, Response, PlainTextResponse
 from pydantic import BaseModel
 from backend.utils import save_csv_to_db
-from backend.workflow import app_graph
-from backend.database import get_all_tables, get_schema, get_table_schema, drop_table
-from langchain_core.messages import HumanMessage
+from backend.workflow import app_graph, session_graph
+from backend.nodes import query_gen_prompt, clamp_fanout
+from backend.database import drop_table, get_table_version
+from backend.catalog import catalog, get_all_tables, get_schema, get_table_schema, get_table_columns, get_table_dialect
+from backend.cache import answer_cache, make_cache_key
+from backend.config import (
+    DEFAULT_ENGINE,
+    MAX_CONCURRENT_ASKS,
+    MAX_QUEUED_ASKS,
+    EXPORT_BATCH_ROWS,
+    METRICS_ENABLED,
+    ASK_BATCH_PARALLELISM,
+    ASK_BATCH_MAX_PARALLELISM,
+    ASK_BATCH_MAX_QUESTIONS
+)
+from backend.export import EXPORT_FORMATS, export_stream
+from backend.validator import validate_sql
+from backend.index_advisor import index_advisor
+from backend.profiling import profile_jobs
+from backend.governor import query_governor, QueryBudgetError
+from backend import summaries, value_index
+from backend.sessions import session_store
+from backend.limiter import ConcurrencyLimiter, Overloaded
+from backend.metrics import record_ask, record_cached, render_metrics, timing_breakdown
+from langchain_core.messages import HumanMessage, RemoveMessage
 
 
 class QueryRequest(BaseModel):
     question:   str
     table_name: str
+    timings:    bool = False   # include a per-node timing breakdown in the response
+    summaries:  bool = True    # False bypasses the precomputed-summary rewrite
+    session_id: str = ""       # follow-ups in a session may refine its previous answer
+    fanout:     int = 0        # speculative SQL candidates per generation (0 = SPECULATIVE_FANOUT, 1 = off)
 
 
 app = FastAPI(title="SQL Agent API")
+ask_limiter = ConcurrencyLimiter(MAX_CONCURRENT_ASKS, MAX_QUEUED_ASKS)
 
 
 # ── Root ──────────────────────────────────────────────
@@ -23,11 +55,27 @@ def root():
 
 # ── Upload CSV ────────────────────────────────────────
 @app.post("/upload")
-async def upload_csv(file: UploadFile = File(...), table_name: str = Form(...)):
-    """Upload a CSV file and store it as a SQLite table."""
+async def upload_csv(file: UploadFile = File(...), table_name: str = Form(...),
+                     engine: str = Form(DEFAULT_ENGINE), mode: str = Form("create"), key: str = Form("")):
+    """Upload a CSV file (plain, .gz or .zst) as a new table, or append/upsert it into an existing one.
+
+    New tables are stored in SQLite or as a Parquet file (engine=duckdb);
+    mode=upsert updates rows whose `key` column matches.
+    """
     try:
-        row_count = save_csv_to_db(file.file, table_name)
-        return {"message": f"Table '{table_name}' created with {row_count} rows."}
+        stats = await run_in_threadpool(save_csv_to_db, file.file, table_name, file.filename, engine, mode, key)
+        if mode == "create":
+            message = f"Table '{table_name}' created with {stats['rows']} rows."
+        else:
+            message = f"Table '{table_name}': {stats['inserted']} rows inserted, {stats['updated']} updated."
+        return {
+            "message":      message,
+            "rows":         stats["rows"],
+            "inserted":     stats["inserted"],
+            "updated":      stats["updated"],
+            "seconds":      stats["seconds"],
+            "rows_per_sec": stats["rows_per_sec"]
+        }
     except ValueError as e:
         return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception as e:
@@ -65,38 +113,510 @@ def table_schema(table_name: str):
 
 
 # ── Ask Question ──────────────────────────────────────
+def initial_state(request: QueryRequest) -> dict:
+    return {
+        "messages":    [HumanMessage(content=request.question)],
+        "table_name":  request.table_name,
+        "sql_query":   "",
+        "raw_result":  [],
+        "nl_answer":   "",
+        "error":       "",
+        "retry_count": 0,
+        "digest":      {},
+        "execution":   {},
+        "path":        "",
+        "token_usage": None,   # None resets what a session's previous question recorded
+        "timings":     None,
+        "summaries":   request.summaries,
+        "session_id":  request.session_id,
+        "fanout":      clamp_fanout(request.fanout),
+        "candidates":  [],
+        "speculation": {},
+        "value_hints": None
+    }
+
+
+@asynccontextmanager
+async def graph_input(request: QueryRequest):
+    """Yield (graph, input, config) for one question.
+
+    Session questions run one at a time on the session's checkpointed state:
+    the previous question's messages are removed, and state["previous"]
+    carries what a follow-up needs.
+    """
+    if not request.session_id:
+        yield app_graph, initial_state(request), None
+        return
+    async with session_store.open(request.session_id):
+        config = session_store.config(request.session_id)
+        snapshot = await session_graph.aget_state(config)
+        state = initial_state(request)
+        stale = [RemoveMessage(id=message.id) for message in snapshot.values.get("messages", [])]
+        try:
+            yield session_graph, {**state, "messages": stale + state["messages"]}, config
+        finally:
+            session_store.finish(request.session_id)
+
+
+def answer_payload(response: dict) -> dict:
+    """The cacheable part of an /ask response."""
+    return {
+        "sql_query":  response.get("sql_query", ""),
+        "raw_result": response.get("raw_result", []),
+        "answer":     response.get("nl_answer", ""),
+        "error":      response.get("error", ""),
+        "execution":  response.get("execution", {}),
+        "path":       response.get("path") or "llm"
+    }
+
+
+async def answer_question(request: QueryRequest, endpoint: str = "ask") -> tuple:
+    """Run (or reuse) the graph for one question. Returns (payload, cached, timings).
+
+    Session questions are never cached — their answer depends on the previous one.
+    """
+    timings = {}
+
+    async def run_graph():
+        async with ask_limiter.slot(), graph_input(request) as (graph, state, config):
+            started = time.perf_counter()
+            response = await graph.ainvoke(state, config)
+        seconds = time.perf_counter() - started
+        record_ask(endpoint, response, seconds)
+        timings.update(timing_breakdown(response, seconds))
+        return answer_payload(response)
+
+    if request.session_id:
+        return await run_graph(), False, timings
+    version = await asyncio.to_thread(get_table_version, request.table_name)
+    key = make_cache_key(request.table_name, request.question, version)
+    result, cached = await answer_cache.get_or_compute(key, run_graph)
+    if cached:
+        record_cached()
+    # timings stay empty when the answer came from the cache or a coalesced request
+    return result, cached, timings
+
+
 @app.post("/ask")
 async def ask_db(request: QueryRequest):
     """Ask a natural language question on a selected table."""
     try:
-        initial_state = {
-            "messages":    [HumanMessage(content=request.question)],
-            "table_name":  request.table_name,
-            "sql_query":   "",
-            "raw_result":  [],
-            "nl_answer":   "",
-            "error":       "",
-            "retry_count": 0
-        }
-        response = app_graph.invoke(initial_state)
-        return {
+        result, cached, timings = await answer_question(request)
+        payload = {
             "question":   request.question,
             "table_name": request.table_name,
-            "sql_query":  response.get("sql_query", ""),
-            "raw_result": response.get("raw_result", []),
-            "answer":     response.get("nl_answer", ""),
-            "error":      response.get("error", "")
+            **result,
+            "cached":     cached
         }
+        if request.timings:
+            payload["timings"] = timings
+        return payload
+    except Overloaded as e:
+        return JSONResponse(status_code=429, content={"error": str(e)}, headers={"Retry-After": "1"})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+# ── Ask Batch ─────────────────────────────────────────
+class BatchItem(BaseModel):
+    table_name: str
+    questions:  list[str]
+
+
+class BatchRequest(BaseModel):
+    items:       list[BatchItem]
+    parallelism: int = ASK_BATCH_PARALLELISM
+
+
+def warm_table(table_name: str) -> str:
+    """Return the table's version with its schema and prompt prefix built (blocking)."""
+    if not get_table_columns(table_name):
+        raise ValueError(f"Table '{table_name}' does not exist.")
+    version = get_table_version(table_name)
+    query_gen_prompt(table_name, version)   # schema + prompt prefix, once per table
+    return version
+
+
+async def stream_batch(request: BatchRequest, jobs: dict, rejected: list):
+    """Yield one NDJSON line per question as its graph finishes, then a summary line.
+
+    `rejected` holds (index, table_name, question, error) for questions whose
+    table could not be prepared; they are reported first.
+    """
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, min(request.parallelism, ASK_BATCH_MAX_PARALLELISM)))
+
+    async def run(key: str, entries: list):
+        _, table_name, question = entries[0]
+        async with semaphore:
+            try:
+                result, cached, _ = await answer_question(
+                    QueryRequest(question=question, table_name=table_name), endpoint="ask_batch"
+                )
+                return key, {**result, "cached": cached}
+            except Overloaded as e:
+                return key, {"error": str(e), "status": 429}
+            except Exception as e:
+                return key, {"error": str(e), "status": 500}
+
+    tasks = [asyncio.create_task(run(key, entries)) for key, entries in jobs.items()]
+    total = failed = 0
+    try:
+        for index, table_name, question, error in rejected:
+            total += 1
+            failed += 1
+            yield json.dumps({
+                "type":         "result",
+                "index":        index,
+                "table_name":   table_name,
+                "question":     question,
+                "error":        error,
+                "status":       400,
+                "deduplicated": False
+            }) + "\n"
+        for finished in asyncio.as_completed(tasks):
+            key, result = await finished
+            # Duplicates of a question share its result
+            for position, (index, table_name, question) in enumerate(jobs[key]):
+                total += 1
+                failed += bool(result.get("error"))
+                yield json.dumps({
+                    "type":         "result",
+                    "index":        index,
+                    "table_name":   table_name,
+                    "question":     question,
+                    **result,
+                    "deduplicated": position > 0
+                }, default=str) + "\n"
+        yield json.dumps({
+            "type":      "summary",
+            "questions": total,
+            "unique":    len(jobs),
+            "failed":    failed,
+            "seconds":   round(time.perf_counter() - started, 3)
+        }) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/ask/batch")
+async def ask_batch(request: BatchRequest):
+    """Answer many questions per table concurrently, streamed as NDJSON in completion order."""
+    try:
+        count = sum(len(item.questions) for item in request.items)
+        if count > ASK_BATCH_MAX_QUESTIONS:
+            raise ValueError(f"Batch has {count} questions; the limit is {ASK_BATCH_MAX_QUESTIONS}.")
+
+        jobs = {}       # cache key -> [(index, table_name, question), ...]
+        rejected = []   # (index, table_name, question, error) of unknown tables
+        versions = {}   # table_name -> version, or the error preparing it
+        index = 0
+        for item in request.items:
+            if item.table_name not in versions:
+                try:
+                    versions[item.table_name] = await asyncio.to_thread(warm_table, item.table_name)
+                except Exception as e:
+                    versions[item.table_name] = e
+            version = versions[item.table_name]
+            for question in item.questions:
+                if isinstance(version, Exception):
+                    rejected.append((index, item.table_name, question, str(version)))
+                else:
+                    key = make_cache_key(item.table_name, question, version)
+                    jobs.setdefault(key, []).append((index, item.table_name, question))
+                index += 1
+
+        return StreamingResponse(stream_batch(request, jobs, rejected), media_type="application/x-ndjson")
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
+# ── Ask Question (Server-Sent Events) ─────────────────
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_answer(request: QueryRequest, key: str):
+    """Yield SSE events: node → sql → rows → token... → done."""
+    cached = await answer_cache.lookup(key) if not request.session_id else None
+    if cached is not None:
+        record_cached()
+        yield sse("sql", {"sql": cached["sql_query"]})
+        yield sse("rows", {"rows": cached["raw_result"], **cached.get("execution", {})})
+        yield sse("token", {"text": cached["answer"]})
+        yield sse("done", {**cached, "cached": True})
+        return
+
+    final = {}
+    try:
+        async with ask_limiter.slot(), graph_input(request) as (graph, state, config):
+            started = time.perf_counter()
+            async for mode, chunk in graph.astream(state, config, stream_mode=["updates", "messages"]):
+                if mode == "messages":
+                    message, metadata = chunk
+                    if metadata.get("langgraph_node") == "final_output" and message.content:
+                        yield sse("token", {"text": message.content})
+                    continue
+
+                for node, update in chunk.items():
+                    update = update or {}
+                    final.update({k: v for k, v in update.items() if k != "messages"})
+                    yield sse("node", {"node": node, "error": update.get("error", "")})
+                    if node in ("fast_path", "execute_query") and update.get("sql_query") and not update.get("error"):
+                        yield sse("sql", {"sql": update.get("sql_query", "")})
+                        yield sse("rows", {"rows": update.get("raw_result", []), **(update.get("execution") or {})})
+                    if node == "fast_path" and update.get("nl_answer"):
+                        yield sse("token", {"text": update["nl_answer"]})
+    except Overloaded as e:
+        yield sse("error", {"error": str(e), "status": 429})
+        return
+    except Exception as e:
+        yield sse("error", {"error": str(e), "status": 500})
+        return
+
+    seconds = time.perf_counter() - started
+    record_ask("ask_stream", final, seconds)
+    result = answer_payload(final)
+    if not request.session_id:
+        await answer_cache.store(key, result)
+    done = {**result, "cached": False}
+    if request.timings:
+        done["timings"] = timing_breakdown(final, seconds)
+    yield sse("done", done)
+
+
+@app.post("/ask/stream")
+async def ask_db_stream(request: QueryRequest):
+    """Stream node transitions, SQL, rows and summary tokens as Server-Sent Events."""
+    version = await asyncio.to_thread(get_table_version, request.table_name)
+    key = make_cache_key(request.table_name, request.question, version)
+    return StreamingResponse(
+        stream_answer(request, key),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ── Export Full Result ────────────────────────────────
+class ExportRequest(BaseModel):
+    table_name: str
+    sql:        str
+    format:     str = "csv"   # csv | ndjson | parquet
+
+
+@app.post("/export")
+def export_result(request: ExportRequest):
+    """Stream the full result of a (generated or edited) SELECT as CSV, NDJSON or Parquet."""
+    try:
+        if request.format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format '{request.format}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
+        columns = [name for name, _ in get_table_columns(request.table_name)]
+        sql, _ = validate_sql(request.sql, request.table_name, columns, get_table_dialect(request.table_name))
+        columns, batches = query_governor.stream(sql, request.table_name, EXPORT_BATCH_ROWS)
+        return StreamingResponse(
+            export_stream(request.format, columns, batches),
+            media_type=EXPORT_FORMATS[request.format],
+            headers={"Content-Disposition": f"attachment; filename={request.table_name}_export.{request.format}"}
+        )
+    except (ValueError, QueryBudgetError) as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+# ── Admin: Advised Indexes ────────────────────────────
+class IndexRequest(BaseModel):
+    table_name: str
+    expression: str   # e.g. UPPER(status) or CAST(amount AS REAL)
+
+
+@app.get("/admin/indexes")
+def list_indexes():
+    """List advised indexes and the filter expressions still being counted."""
+    try:
+        return {"indexes": index_advisor.list_indexes(), "candidates": index_advisor.candidates()}
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.post("/admin/indexes")
+def create_index(request: IndexRequest):
+    """Create an expression index within the advisor's budget."""
+    try:
+        return index_advisor.create(request.table_name, request.expression)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.delete("/admin/indexes/{index_name}")
+def drop_index(index_name: str):
+    """Drop an advised index."""
+    try:
+        index_advisor.drop(index_name)
+        return {"message": f"Index '{index_name}' dropped."}
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+# ── Admin: Query Budgets ──────────────────────────────
+@app.get("/admin/budgets")
+def list_budgets():
+    """Default and per-table query budgets, plus abort counts by reason."""
+    return query_governor.stats()
+
+
+@app.put("/admin/budgets/{table_name}")
+def set_budget(table_name: str, overrides: dict):
+    """Override budget fields for one table (timeout_ms, max_vm_steps, max_rows, ...)."""
+    try:
+        return {"table_name": table_name, "budget": query_governor.set_budget(table_name, overrides)}
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+# ── Admin: Materialized Summaries ─────────────────────
+class SummaryVerifyRequest(BaseModel):
+    table_name: str
+    sql:        str   # an aggregate query to answer both ways
+
+
+@app.get("/admin/summaries/{table_name}")
+def summary_status(table_name: str):
+    """Whether a table's summaries are current, and the columns with group-by summaries."""
+    try:
+        return summaries.status(table_name)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.post("/admin/summaries/verify")
+def verify_summaries(request: SummaryVerifyRequest):
+    """Run a query directly and from the summaries and report whether the results are identical."""
+    try:
+        columns = [name for name, _ in get_table_columns(request.table_name)]
+        sql, _ = validate_sql(request.sql, request.table_name, columns, get_table_dialect(request.table_name))
+        return summaries.verify(sql, request.table_name)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.post("/admin/summaries/{table_name}")
+def rebuild_summaries(table_name: str):
+    """Recompute a table's summaries from its rows."""
+    try:
+        return summaries.rebuild(table_name)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+# ── Value Index ───────────────────────────────────────
+class GroundRequest(BaseModel):
+    table_name: str
+    sql:        str
+
+
+@app.get("/admin/values/{table_name}")
+def value_index_status(table_name: str):
+    """Whether a table's value index is current, and its indexed text columns."""
+    try:
+        return value_index.status(table_name)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.post("/admin/values/ground")
+def ground_values(request: GroundRequest):
+    """Show how a query's filter literals would be matched to stored values."""
+    try:
+        columns = [name for name, _ in get_table_columns(request.table_name)]
+        sql, _ = validate_sql(request.sql, request.table_name, columns, get_table_dialect(request.table_name))
+        grounded, notes = value_index.ground_sql(sql, request.table_name)
+        return {"sql": grounded, "changed": bool(notes), "matches": notes}
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.post("/admin/values/{table_name}")
+def rebuild_value_index(table_name: str):
+    """Rebuild a table's value index from its rows."""
+    try:
+        return value_index.rebuild(table_name)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+# ── Metrics ───────────────────────────────────────────
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of node, database, token, retry and ingestion metrics."""
+    if not METRICS_ENABLED:
+        return JSONResponse(status_code=404, content={"error": "Metrics are disabled (METRICS_ENABLED=0)."})
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+# ── Answer Cache Stats ────────────────────────────────
+@app.get("/cache/stats")
+def cache_stats():
+    """Return answer cache hit/miss counters."""
+    return answer_cache.stats()
+
+
+@app.get("/ask/stats")
+def ask_stats():
+    """Return in-flight / queued /ask counts."""
+    return ask_limiter.stats()
+
+
+@app.delete("/cache")
+def clear_cache():
+    """Drop every cached answer."""
+    answer_cache.clear()
+    return {"message": "Answer cache cleared."}
+
+
+# ── Sessions ──────────────────────────────────────────
+@app.get("/sessions/stats")
+def session_stats():
+    """Return session counts and the rows held as materialized previous results."""
+    return session_store.stats()
+
+
+@app.delete("/session/{session_id}")
+async def end_session(session_id: str):
+    """Forget a session's state and its materialized previous result."""
+    if not await session_store.end(session_id):
+        return JSONResponse(status_code=404, content={"error": f"Session '{session_id}' not found."})
+    return {"message": f"Session '{session_id}' ended."}
+
+
 # ── Delete Table ──────────────────────────────────────
 @app.delete("/table/{table_name}")
 def delete_table(table_name: str):
     """Delete a table from the database."""
     try:
         drop_table(table_name)
+        catalog.remove(table_name)
         return {"message": f"Table '{table_name}' deleted successfully."}
     except ValueError as e:
         return JSONResponse(status_code=400, content={"error": str(e)})
@@ -105,42 +625,65 @@ def delete_table(table_name: str):
 
 
 # ── Generate Profiling Report ─────────────────────────
-@app.get("/profile/{table_name}")
-def profile_table(table_name: str):
-    """Generate a ydata-profiling HTML report for a table."""
-    try:
-        import os
-        os.environ["PANDAS_PROFILING_NO_STREAMLIT"] = "1"  
-        import pandas as pd
-        import sqlite3
-        from ydata_profiling import ProfileReport
-        import tempfile, os
-
-        conn = sqlite3.connect("uploaded.db")
-        df = pd.read_sql_query(f'SELECT * FROM "{table_name}"', conn)
-        conn.close()
-
-        profile = ProfileReport(
-            df,
-            title=f"Dataset Report — {table_name}",
-            explorative=True,
-            correlations={"pearson": {"calculate": True}, "spearman": {"calculate": True}},
-            missing_diagrams={"bar": True, "matrix": True},
-            duplicates={"head": 10},
-            progress_bar=False
-        )
+def report_response(job: dict):
+    with open(job["path"], "rb") as f:
+        html_bytes = f.read()
+    return Response(
+        content=html_bytes,
+        media_type="text/html",
+        headers={"Content-Disposition": f"attachment; filename={job['table_name']}_report.html"}
+    )
 
-        # ✅ Windows fix — write to string directly, no temp file needed
-        html_str = profile.to_html()
-        html_bytes = html_str.encode("utf-8")
 
-        from fastapi.responses import Response
-        return Response(
-            content=html_bytes,
-            media_type="text/html",
-            headers={"Content-Disposition": f"attachment; filename={table_name}_report.html"}
-        )
-    except ImportError:
-        return JSONResponse(status_code=500, content={"error": "ydata-profiling not installed. Run: pip install ydata-profiling"})
+def job_status(job: dict) -> dict:
+    return {k: v for k, v in job.items() if k != "path"}
+
+
+@app.post("/profile/{table_name}")
+def start_profile(table_name: str, mode: str = "auto"):
+    """Start (or join) a background ydata-profiling job. mode: auto | full | minimal."""
+    try:
+        job = profile_jobs.submit(table_name, mode)
+        return JSONResponse(status_code=202 if job["status"] == "running" else 200, content=job_status(job))
+    except ImportError as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.get("/profile/jobs/{job_id}")
+def profile_status(job_id: str):
+    """Return the status of a profiling job."""
+    job = profile_jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job '{job_id}'."})
+    return job_status(job)
+
+
+@app.get("/profile/jobs/{job_id}/report")
+def profile_report(job_id: str):
+    """Download the HTML report of a finished profiling job."""
+    job = profile_jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job '{job_id}'."})
+    if job["status"] != "done":
+        return JSONResponse(status_code=409, content={"error": f"Job is {job['status']}.", **job_status(job)})
+    return report_response(job)
+
+
+@app.get("/profile/{table_name}")
+def profile_table(table_name: str, mode: str = "auto"):
+    """Return the cached report for the table's current version, or start a job (202)."""
+    try:
+        job = profile_jobs.submit(table_name, mode)
+        if job["status"] == "done":
+            return report_response(job)
+        return JSONResponse(status_code=202, content=job_status(job))
+    except ImportError as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
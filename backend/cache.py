@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from backend.config import (
+    ANSWER_CACHE_BACKEND,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_PATH
+)
+
+
+# ─────────────────────────────────────────
+# KEYS
+# ─────────────────────────────────────────
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?.!")
+
+
+def make_cache_key(table_name: str, question: str, version: str) -> str:
+    """Build a cache key from table, table version and normalized question."""
+    raw = "\x1f".join([table_name, version, normalize_question(question)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ─────────────────────────────────────────
+# BACKENDS
+# ─────────────────────────────────────────
+class LRUBackend:
+    """In-process LRU with per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl: int = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """On-disk store that survives restarts."""
+
+    blocking = True   # disk I/O — AnswerCache calls it off the event loop
+
+    def __init__(self, path: str, max_entries: int = 1024, ttl: int = 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, used_at REAL NOT NULL);"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM answers WHERE key=?;", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM answers WHERE key=?;", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE answers SET used_at=? WHERE key=?;", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, value, expires_at, used_at) VALUES (?, ?, ?, ?);",
+                (key, json.dumps(value, default=str), now + self.ttl, now)
+            )
+            self._conn.execute("DELETE FROM answers WHERE expires_at < ?;", (now,))
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY used_at DESC LIMIT -1 OFFSET ?);",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers;")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers;").fetchone()[0]
+
+
+# ─────────────────────────────────────────
+# CACHE
+# ─────────────────────────────────────────
+class AnswerCache:
+    """Answer cache with hit/miss counters and single-flight coalescing."""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def _backend_call(self, call, *args):
+        if getattr(self.backend, "blocking", False):
+            return await asyncio.to_thread(call, *args)
+        return call(*args)
+
+    async def lookup(self, key: str):
+        """Return the cached value (counting a hit) or None (counting a miss)."""
+        if not self.enabled:
+            return None
+        value = await self._backend_call(self.backend.get, key)
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    async def store(self, key: str, value: dict):
+        # Errors are not cached — the next request gets a fresh attempt
+        if self.enabled and not value.get("error"):
+            await self._backend_call(self.backend.set, key, value)
+
+    async def get_or_compute(self, key: str, compute):
+        """Return (value, cached). `compute` is an async callable run at most once per key."""
+        if not self.enabled:
+            return await compute(), False
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending), True
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise   # this waiter itself was cancelled
+                # The leader was cancelled — compute it here instead
+                return await self.get_or_compute(key, compute)
+
+        # Registered before the lookup, which may yield to the event loop
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self.lookup(key)
+            cached = value is not None
+            if not cached:
+                value = await compute()
+                await self.store(key, value)
+            future.set_result(value)
+            return value, cached
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an un-awaited future does not log a warning
+            future.exception()
+            raise
+        finally:
+            # Cancelled (a BaseException): release the coalesced waiters too
+            if not future.done():
+                future.cancel()
+            del self._inflight[key]
+
+    def clear(self):
+        if self.enabled:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend":   ANSWER_CACHE_BACKEND,
+            "entries":   len(self.backend) if self.enabled else 0,
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "hit_rate":  round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def build_answer_cache() -> AnswerCache:
+    if ANSWER_CACHE_BACKEND == "sqlite":
+        return AnswerCache(SQLiteBackend(ANSWER_CACHE_PATH, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL))
+    if ANSWER_CACHE_BACKEND == "memory":
+        return AnswerCache(LRUBackend(ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL))
+    return AnswerCache(None)
+
+
+answer_cache = build_answer_cache()
@@ -0,0 +1,168 @@
+import threading
+from backend.database import table_store, get_table_version, get_table_engine, engine_tables
+from backend.columnar import parquet_store, SAMPLE_SCAN_ROWS, LOW_CARDINALITY
+
+SAMPLE_VALUES = 10   # values shown per low-cardinality column
+
+
+class TableInfo:
+    def __init__(self, name: str, columns: list, row_count: int, samples: dict, version: str,
+                 engine: str = "sqlite"):
+        self.name = name
+        self.columns = columns        # [(name, declared_type), ...]
+        self.row_count = row_count
+        self.samples = samples        # {column: [all distinct values]} for low-cardinality text
+        self.version = version
+        self.engine = engine          # sqlite | duckdb
+
+    def describe(self) -> str:
+        """Schema text used by the prompts and the /schema endpoints."""
+        col_defs = ", ".join(f"{name} ({col_type})" for name, col_type in self.columns)
+        lines = [f"Table: {self.name}", f"Columns: {col_defs}", f"Rows: {self.row_count}"]
+        if self.samples:
+            lines.append("Sample values:")
+            lines += [f"  {col}: {', '.join(map(str, values[:SAMPLE_VALUES]))}" for col, values in self.samples.items()]
+        return "\n".join(lines)
+
+
+def load_table_info(table_name: str) -> TableInfo | None:
+    version = get_table_version(table_name)
+    engine = get_table_engine(table_name)
+    if engine != "sqlite":
+        described = parquet_store.describe(table_name)
+        return TableInfo(table_name, *described, version, engine) if described else None
+    if not table_store.exists(table_name):
+        return None
+
+    with table_store.reader(table_name) as conn:
+        cols = conn.execute(f'PRAGMA table_info("{table_name}");').fetchall()
+        if not cols:
+            return None
+        columns = [(col[1], col[2]) for col in cols]
+        row_count = conn.execute(f'SELECT COUNT(*) FROM "{table_name}";').fetchone()[0]
+
+        samples = {}
+        for name, col_type in columns:
+            if col_type.upper() not in ("TEXT", ""):
+                continue
+            values = conn.execute(
+                f'SELECT DISTINCT "{name}" FROM (SELECT "{name}" FROM "{table_name}" LIMIT ?) '
+                f'WHERE "{name}" IS NOT NULL LIMIT ?;',
+                (SAMPLE_SCAN_ROWS, LOW_CARDINALITY + 1)
+            ).fetchall()
+            if 0 < len(values) <= LOW_CARDINALITY:
+                samples[name] = sorted(str(v[0]) for v in values)
+    return TableInfo(table_name, columns, row_count, samples, version)
+
+
+class SchemaCatalog:
+    """Process-wide schema catalog, loaded once.
+
+    Upload and drop update it explicitly. The table directory's mtime
+    catches SQLite table files created or dropped by another process, the
+    engine registry catches Parquet tables, and the per-table version
+    fingerprint catches data rewritten elsewhere.
+    """
+
+    def __init__(self):
+        self._tables = {}
+        self._generation = None
+        self._lock = threading.RLock()
+
+    def _sync(self):
+        generation = table_store.generation()
+        if generation == self._generation:
+            return
+        with self._lock:
+            tables = {}
+            for name in table_store.names() + list(engine_tables()):
+                info = self._tables.get(name)
+                if info is None or info.version != get_table_version(name):
+                    info = load_table_info(name)
+                if info is not None:
+                    tables[name] = info
+            self._tables = tables
+            self._generation = generation
+
+    def get(self, table_name: str) -> TableInfo | None:
+        self._sync()
+        info = self._tables.get(table_name)
+        if info is not None and info.version != get_table_version(table_name):
+            info = self.refresh(table_name)
+        elif info is None and table_name in engine_tables():
+            info = self.refresh(table_name)   # registered by another process
+        return info
+
+    def tables(self) -> list:
+        self._sync()
+        return sorted(self._tables)
+
+    def refresh(self, table_name: str) -> TableInfo | None:
+        """Reload one table after it was created or its data changed."""
+        with self._lock:
+            info = load_table_info(table_name)
+            if info is None:
+                self._tables.pop(table_name, None)
+            else:
+                self._tables[table_name] = info
+        return info
+
+    def apply_load(self, table_name: str, version: str, inserted: int, new_values: dict) -> TableInfo | None:
+        """Update a table's stats after an append/upsert without rescanning it.
+
+        `new_values` holds the distinct loaded values of the sampled columns;
+        a column whose merged values are no longer low-cardinality loses its
+        sample.
+        """
+        with self._lock:
+            info = self._tables.get(table_name)
+            if info is None:
+                return self.refresh(table_name)
+            samples = {}
+            for col, values in info.samples.items():
+                merged = set(values) | new_values.get(col, set())
+                if len(merged) <= LOW_CARDINALITY:
+                    samples[col] = sorted(merged)
+            info = TableInfo(table_name, info.columns, info.row_count + inserted, samples, version, info.engine)
+            self._tables[table_name] = info
+        return info
+
+    def remove(self, table_name: str):
+        """Forget a dropped table."""
+        with self._lock:
+            self._tables.pop(table_name, None)
+
+
+catalog = SchemaCatalog()
+
+
+# ── Readers used by prompts, endpoints and the validator ──
+def get_schema() -> str:
+    """Return full schema of all tables."""
+    parts = [catalog.get(name).describe() for name in catalog.tables()]
+    return "\n\n".join(parts) if parts else "No tables found."
+
+
+def get_table_schema(table_name: str) -> str:
+    """Return schema for a specific table."""
+    info = catalog.get(table_name)
+    if info is None:
+        return f"Table '{table_name}' not found."
+    return info.describe()
+
+
+def get_table_columns(table_name: str) -> list:
+    """Return [(name, declared_type), ...] for a table (empty if unknown)."""
+    info = catalog.get(table_name)
+    return list(info.columns) if info else []
+
+
+def get_table_dialect(table_name: str) -> str:
+    """Return the table's engine ("sqlite" if unknown) — also its sqlglot dialect name."""
+    info = catalog.get(table_name)
+    return info.engine if info else "sqlite"
+
+
+def get_all_tables() -> list:
+    """Return list of all table names."""
+    return catalog.tables()
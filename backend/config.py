@@ -1,11 +1,93 @@
 import os
+import json
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from backend.llm import build_llm
 
 load_dotenv(override=True)  # Load .env file, override existing env vars if needed
 
-llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
+# ── LLM provider ──────────────────────────────────────
+LLM_PROVIDER        = os.getenv("LLM_PROVIDER", "groq")                  # groq | stub (offline, deterministic)
+LLM_MODEL           = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+STUB_LLM_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "0"))       # simulated round trip per call
+STUB_LLM_RESPONSES  = os.getenv("STUB_LLM_RESPONSES", "")                # JSON file: {question: sql}
+
+llm = build_llm(
+    LLM_PROVIDER,
+    LLM_MODEL,
     api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0
-)
\ No newline at end of file
+    stub_latency_ms=STUB_LLM_LATENCY_MS,
+    stub_responses=STUB_LLM_RESPONSES
+)
+
+# ── Answer cache ──────────────────────────────────────
+ANSWER_CACHE_BACKEND     = os.getenv("ANSWER_CACHE_BACKEND", "memory")   # memory | sqlite | none
+ANSWER_CACHE_TTL         = int(os.getenv("ANSWER_CACHE_TTL", "3600"))     # seconds
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+ANSWER_CACHE_PATH        = os.getenv("ANSWER_CACHE_PATH", "answer_cache.db")
+
+# ── CSV ingestion ─────────────────────────────────────
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "50000"))   # rows per read/insert batch
+
+# ── Storage engines ───────────────────────────────────
+DEFAULT_ENGINE = os.getenv("DEFAULT_ENGINE", "sqlite")         # sqlite | duckdb (Parquet, needs the duckdb package)
+PARQUET_DIR    = os.getenv("PARQUET_DIR", "parquet_tables")    # one <table>.parquet per DuckDB table
+
+# ── /ask concurrency ──────────────────────────────────
+MAX_CONCURRENT_ASKS = int(os.getenv("MAX_CONCURRENT_ASKS", "32"))   # graph runs in flight
+MAX_QUEUED_ASKS     = int(os.getenv("MAX_QUEUED_ASKS", "64"))       # waiting beyond that → 429
+
+# ── /ask/batch ────────────────────────────────────────
+ASK_BATCH_PARALLELISM     = int(os.getenv("ASK_BATCH_PARALLELISM", "4"))       # default graphs per batch at once
+ASK_BATCH_MAX_PARALLELISM = int(os.getenv("ASK_BATCH_MAX_PARALLELISM", "16"))  # upper bound a client may ask for
+ASK_BATCH_MAX_QUESTIONS   = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", "500"))
+
+# ── Result export ─────────────────────────────────────
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))   # rows per fetchmany / output chunk
+
+# ── Result digest for the summary prompt ──────────────
+RESULT_TOKEN_BUDGET = int(os.getenv("RESULT_TOKEN_BUDGET", "1500"))   # above this, send aggregates
+DIGEST_SAMPLE_ROWS  = int(os.getenv("DIGEST_SAMPLE_ROWS", "10"))
+DIGEST_TOP_K        = int(os.getenv("DIGEST_TOP_K", "5"))
+
+# ── Index advisor ─────────────────────────────────────
+INDEX_ADVISOR_ENABLED     = os.getenv("INDEX_ADVISOR_ENABLED", "1") == "1"
+INDEX_ADVISOR_MIN_SCANS   = int(os.getenv("INDEX_ADVISOR_MIN_SCANS", "5"))     # full scans before indexing
+INDEX_ADVISOR_MAX_INDEXES = int(os.getenv("INDEX_ADVISOR_MAX_INDEXES", "20"))
+INDEX_ADVISOR_MAX_MB      = int(os.getenv("INDEX_ADVISOR_MAX_MB", "256"))      # total advised index size
+
+# ── Speculative SQL candidates ────────────────────────
+SPECULATIVE_FANOUT     = int(os.getenv("SPECULATIVE_FANOUT", "1"))       # SQL candidates per generation; 1 = off
+SPECULATIVE_MAX_FANOUT = int(os.getenv("SPECULATIVE_MAX_FANOUT", "5"))   # upper bound a request may ask for
+
+# ── Template fast path ────────────────────────────────
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1") == "1"   # answer template questions without the LLM
+
+# ── Materialized summaries ────────────────────────────
+SUMMARIES_ENABLED  = os.getenv("SUMMARIES_ENABLED", "1") == "1"   # build at load time + answer simple aggregates from them
+SUMMARY_MAX_GROUPS = int(os.getenv("SUMMARY_MAX_GROUPS", "100"))  # distinct values for a column to get group-by summaries
+
+# ── Value index ───────────────────────────────────────
+VALUE_INDEX_ENABLED      = os.getenv("VALUE_INDEX_ENABLED", "1") == "1"         # index text values at load time + ground filter literals
+VALUE_INDEX_MAX_DISTINCT = int(os.getenv("VALUE_INDEX_MAX_DISTINCT", "10000"))  # distinct values for a text column to be indexed
+
+# ── Conversation sessions ─────────────────────────────
+SESSION_MAX_SESSIONS    = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))      # least recently used beyond → forgotten
+SESSION_MAX_RESULT_ROWS = int(os.getenv("SESSION_MAX_RESULT_ROWS", "200000")) # previous-result rows kept across sessions
+
+# ── Profiling jobs ────────────────────────────────────
+PROFILE_WORKERS          = int(os.getenv("PROFILE_WORKERS", "1"))                # report processes
+PROFILE_CACHE_DIR        = os.getenv("PROFILE_CACHE_DIR", "profile_reports")
+PROFILE_SAMPLE_THRESHOLD = int(os.getenv("PROFILE_SAMPLE_THRESHOLD", "100000"))  # rows; above → sampled/minimal
+PROFILE_MAX_JOBS         = int(os.getenv("PROFILE_MAX_JOBS", "100"))             # job records kept in memory
+
+# ── Query execution guard ─────────────────────────────
+QUERY_TIMEOUT_MS      = int(os.getenv("QUERY_TIMEOUT_MS", "10000"))          # wall clock per query; 0 = off
+QUERY_MAX_VM_STEPS    = int(os.getenv("QUERY_MAX_VM_STEPS", "500000000"))    # SQLite VM instructions; 0 = off
+QUERY_MAX_ROWS        = int(os.getenv("QUERY_MAX_ROWS", "5000"))             # rows returned; more → truncated
+QUERY_MAX_JOIN_ROWS   = int(os.getenv("QUERY_MAX_JOIN_ROWS", "10000000"))    # estimated nested-scan rows before rejecting
+QUERY_HUGE_TABLE_ROWS = int(os.getenv("QUERY_HUGE_TABLE_ROWS", "1000000"))   # unbounded scans above this get a LIMIT
+# Per-table overrides, e.g. {"transactions": {"timeout_ms": 30000, "max_rows": 1000}}
+QUERY_TABLE_BUDGETS   = json.loads(os.getenv("QUERY_TABLE_BUDGETS", "{}"))
+
+# ── Metrics ───────────────────────────────────────────
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"   # /metrics + per-request timings; off = no wrappers
@@ -1,81 +1,392 @@
+import os
+import queue
 import sqlite3
+import threading
 import re
+import uuid
+from contextlib import contextmanager
+from backend.metrics import timed
+from backend.columnar import parquet_store, fetch_dicts
 
-DB_PATH = "uploaded.db"
+TABLES_DIR   = os.getenv("TABLES_DIR", "tables")           # one SQLite file per uploaded table
+CATALOG_PATH = os.getenv("CATALOG_PATH", "catalog.db")   # per-table version fingerprints
+DB_PATH      = os.getenv("DB_PATH", "uploaded.db")       # old single-file store, migrated on first use
 
+READ_POOL_SIZE       = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))   # per table
+STATEMENT_CACHE_SIZE = int(os.getenv("SQLITE_STATEMENT_CACHE", "256"))   # prepared statements per connection
 
-def get_connection():
-    return sqlite3.connect(DB_PATH)
+# Applied to every connection on open. WAL lets readers run while the single
+# writer holds the lock; busy_timeout turns "database is locked" into a wait.
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))};",
+    f"PRAGMA cache_size={int(os.getenv('SQLITE_CACHE_SIZE', '-65536'))};",   # negative = KiB
+    "PRAGMA temp_store=MEMORY;",
+    f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))};",
+]
 
 
-def get_schema() -> str:
-    """Return full schema of all tables."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
-    tables = [row[0] for row in cursor.fetchall()]
-    schema_parts = []
-    for table in tables:
-        cursor.execute(f'PRAGMA table_info("{table}");')
-        cols = cursor.fetchall()
-        col_defs = ", ".join([f"{col[1]} ({col[2]})" for col in cols])
-        schema_parts.append(f"Table: {table}\nColumns: {col_defs}")
-    conn.close()
-    return "\n\n".join(schema_parts) if schema_parts else "No tables found."
+def open_connection(path: str, **kwargs):
+    """Open a SQLite connection with the tuned PRAGMAs and a prepared-statement cache."""
+    conn = sqlite3.connect(
+        path,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        **kwargs
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
 
 
-def get_table_schema(table_name: str) -> str:
-    """Return schema for a specific table."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(f'PRAGMA table_info("{table_name}");')
-    cols = cursor.fetchall()
-    conn.close()
-    if not cols:
-        return f"Table '{table_name}' not found."
-    col_defs = ", ".join([f"{col[1]} ({col[2]})" for col in cols])
-    return f"Table: {table_name}\nColumns: {col_defs}"
+class ConnectionPool:
+    """Thread-safe pool of reader connections plus one serialized writer."""
 
+    def __init__(self, path: str, size: int = READ_POOL_SIZE, on_open=None):
+        self.path = path
+        self.size = size
+        self.on_open = on_open
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._writer = None
+        self._write_lock = threading.Lock()
 
-def get_all_tables() -> list:
-    """Return list of all table names."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")
-    tables = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return tables
+    def _open(self, **kwargs):
+        conn = open_connection(self.path, **kwargs)
+        if self.on_open:
+            self.on_open(conn)
+        return conn
 
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    conn = self._open()
+                    conn.execute("PRAGMA query_only=ON;")   # readers can never write
+                    return conn
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._idle.get()
 
+    @contextmanager
+    def reader(self):
+        """Borrow a pooled read connection."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """Hold the single writer connection inside one transaction."""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._open(isolation_level=None)
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE;")
+            try:
+                yield conn
+                conn.execute("COMMIT;")
+            except BaseException:
+                conn.execute("ROLLBACK;")
+                raise
+
+    def close(self):
+        """Close every idle reader and the writer (e.g. on shutdown)."""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+
+
+# ─────────────────────────────────────────
+# ONE FILE PER TABLE
+# ─────────────────────────────────────────
+class TableStore:
+    """SQLite tables stored as one file each, with a connection pool per file.
+
+    A query only opens the file of the table it reads, so an upload, an index
+    build or a drop never holds a lock that readers of another table wait on.
+    New tables are built in a temporary file and linked into place; dropping
+    one closes its pool and unlinks the file.
+    """
+
+    def __init__(self, directory: str = TABLES_DIR, legacy_path: str = DB_PATH):
+        self.directory = directory
+        self.legacy_path = legacy_path
+        self._pools = {}          # table -> (ConnectionPool, inode of the file it opened)
+        self._lock = threading.Lock()
+        self._migrated = False
+
+    def path(self, table_name: str) -> str:
+        # Every access goes through here — a name must never reach outside the directory
+        if not re.fullmatch(r'[a-zA-Z0-9_]+', table_name):
+            raise ValueError(f"Invalid table name: '{table_name}'")
+        return os.path.join(self.directory, f"{table_name}.db")
+
+    def pool(self, table_name: str) -> ConnectionPool:
+        """The table's pool — reopened if another process replaced the file."""
+        self._migrate()
+        try:
+            inode = os.stat(self.path(table_name)).st_ino
+        except FileNotFoundError:
+            raise ValueError(f"Table '{table_name}' does not exist.")
+        with self._lock:
+            table_pool, pool_inode = self._pools.get(table_name, (None, None))
+            if pool_inode != inode:
+                if table_pool is not None:
+                    table_pool.close()
+                table_pool = ConnectionPool(self.path(table_name))
+                self._pools[table_name] = (table_pool, inode)
+            return table_pool
+
+    def reader(self, table_name: str):
+        return self.pool(table_name).reader()
+
+    def writer(self, table_name: str):
+        return self.pool(table_name).writer()
+
+    def exists(self, table_name: str) -> bool:
+        self._migrate()
+        return os.path.exists(self.path(table_name))
+
+    def names(self) -> list:
+        self._migrate()
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-3] for name in os.listdir(self.directory) if name.endswith(".db"))
+
+    def generation(self) -> int:
+        """Changes whenever a table file is created, renamed or removed (by any process)."""
+        try:
+            return os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    @contextmanager
+    def create(self, table_name: str):
+        """Yield a connection on a new, private file; it becomes the table on success.
+
+        Nothing can read the file before it is linked into place, so it is
+        written without a journal and synced once at the end. Linking fails
+        if another upload claimed the name first.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        final = self.path(table_name)
+        partial = f"{final}.{uuid.uuid4().hex}.tmp"
+        conn = sqlite3.connect(partial, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=OFF;")
+            conn.execute("PRAGMA synchronous=OFF;")
+            yield conn
+            conn.commit()
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.close()
+            with open(partial, "rb+") as f:
+                os.fsync(f.fileno())
+            try:
+                os.link(partial, final)
+            except FileExistsError:
+                raise ValueError(f"Table '{table_name}' already exists. Please choose a unique name.")
+        finally:
+            conn.close()
+            for path in (partial, f"{partial}-wal", f"{partial}-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def drop(self, table_name: str):
+        """Close the table's pool and unlink its file.
+
+        Queries already running keep their open handle to the unlinked file.
+        """
+        with self._lock:
+            table_pool, _ = self._pools.pop(table_name, (None, None))
+        if table_pool is not None:
+            table_pool.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path(table_name) + suffix):
+                os.remove(self.path(table_name) + suffix)
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for table_pool, _ in pools:
+            table_pool.close()
+
+    def _migrate(self):
+        """Split the old single-file store (DB_PATH) into per-table files, once."""
+        if self._migrated:
+            return
+        with self._lock:
+            if self._migrated:
+                return
+            self._migrated = True
+            if not os.path.exists(self.legacy_path):
+                return
+            legacy = sqlite3.connect(self.legacy_path)
+            try:
+                tables = legacy.execute(
+                    "SELECT name, sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';"
+                ).fetchall()
+            finally:
+                legacy.close()
+            for name, create_sql in tables:
+                if os.path.exists(self.path(name)):
+                    continue
+                with self.create(name) as conn:
+                    conn.execute("ATTACH DATABASE ? AS legacy;", (self.legacy_path,))
+                    conn.execute(create_sql)
+                    conn.execute(f'INSERT INTO main."{name}" SELECT * FROM legacy."{name}";')
+                    conn.commit()
+                    conn.execute("DETACH DATABASE legacy;")
+            # Keep the old file, but never migrate it again (dropped tables would come back)
+            os.replace(self.legacy_path, f"{self.legacy_path}.migrated")
+
+
+def _init_catalog(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS table_versions ("
+        "table_name TEXT PRIMARY KEY, version TEXT NOT NULL);"
+    )
+    # Tables not stored in TABLES_DIR (absent = sqlite)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS table_engines ("
+        "table_name TEXT PRIMARY KEY, engine TEXT NOT NULL);"
+    )
+    conn.commit()
+
+
+table_store  = TableStore()
+catalog_pool = ConnectionPool(CATALOG_PATH, size=4, on_open=_init_catalog)
+
+
+def get_connection(table_name: str):
+    """Open a private (unpooled) connection to a table's file, e.g. for long-running reads."""
+    if not table_store.exists(table_name):
+        raise ValueError(f"Table '{table_name}' does not exist.")
+    return open_connection(table_store.path(table_name))
+
+
+@timed("get_table_version")
+def get_table_version(table_name: str) -> str:
+    """Return the current data/schema fingerprint of a table ('' if never written)."""
+    with catalog_pool.reader() as conn:
+        row = conn.execute(
+            "SELECT version FROM table_versions WHERE table_name=?;", (table_name,)
+        ).fetchone()
+    return row[0] if row else ""
+
+
+def new_version() -> str:
+    return uuid.uuid4().hex
+
+
+@timed("bump_table_version")
+def bump_table_version(table_name: str, version: str = "") -> str:
+    """Assign a fresh fingerprint to a table so anything keyed on the old one goes stale.
+
+    Pass `version` (from new_version) when data written earlier was already stamped with it.
+    """
+    version = version or new_version()
+    with catalog_pool.writer() as conn:
+        conn.execute(
+            "INSERT INTO table_versions (table_name, version) VALUES (?, ?) "
+            "ON CONFLICT(table_name) DO UPDATE SET version=excluded.version;",
+            (table_name, version)
+        )
+    return version
+
+
+def get_table_engine(table_name: str) -> str:
+    """Return the engine a table is stored in ('sqlite' unless registered otherwise)."""
+    with catalog_pool.reader() as conn:
+        row = conn.execute(
+            "SELECT engine FROM table_engines WHERE table_name=?;", (table_name,)
+        ).fetchone()
+    return row[0] if row else "sqlite"
+
+
+def set_table_engine(table_name: str, engine: str | None):
+    """Register a non-SQLite table, or forget it (engine=None)."""
+    with catalog_pool.writer() as conn:
+        conn.execute("DELETE FROM table_engines WHERE table_name=?;", (table_name,))
+        if engine and engine != "sqlite":
+            conn.execute("INSERT INTO table_engines (table_name, engine) VALUES (?, ?);", (table_name, engine))
+
+
+def engine_tables() -> dict:
+    """Return {table_name: engine} for every table stored outside TABLES_DIR."""
+    with catalog_pool.reader() as conn:
+        return dict(conn.execute("SELECT table_name, engine FROM table_engines;").fetchall())
+
+
+@timed("table_exists")
 def table_exists(table_name: str) -> bool:
-    """Check if a table already exists."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?;", (table_name,))
-    exists = cursor.fetchone() is not None
-    conn.close()
-    return exists
-
-
-def db_query_tool(sql: str) -> list:
-    """Execute a SELECT query and return results as list of dicts."""
-    conn = get_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute(sql)
-    rows = cursor.fetchall()
-    conn.close()
+    """Check if a table already exists (in any engine)."""
+    return table_store.exists(table_name) or table_name in engine_tables()
+
+
+@timed("db_query_tool")
+def db_query_tool(sql: str, table_name: str) -> list:
+    """Execute a SELECT query on `table_name` (in its engine) and return results as list of dicts."""
+    if get_table_engine(table_name) == "duckdb":
+        with parquet_store.cursor(table_name) as cursor:
+            return fetch_dicts(cursor, cursor.execute(sql).fetchall())
+    with table_store.reader(table_name) as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute(sql)
+        rows = cursor.fetchall()
     return [dict(row) for row in rows]
 
 
+@timed("explain_query_plan")
+def explain_query_plan(conn, sql: str) -> list:
+    """Return the EXPLAIN QUERY PLAN rows (id, parent, notused, detail) for `sql`.
+
+    EXPLAIN is planned against the connection's in-memory schema and is not
+    re-prepared after a schema change, so first touch sqlite_master (which
+    reloads a stale schema) and fold the schema version into the text so the
+    statement cache cannot hand back an old plan.
+    """
+    conn.execute("SELECT COUNT(*) FROM sqlite_master;").fetchone()
+    schema_version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+    return conn.execute(f"EXPLAIN QUERY PLAN {sql.strip().rstrip(';')} -- schema {schema_version}").fetchall()
+
+
+def explain_plan(conn, sql: str) -> list:
+    """Return the EXPLAIN QUERY PLAN detail lines for `sql`."""
+    return [row[-1] for row in explain_query_plan(conn, sql)]
+
+
+@timed("drop_table")
 def drop_table(table_name: str):
     """Safely drop a table by name."""
     if not re.match(r'^[a-zA-Z0-9_]+$', table_name):
         raise ValueError(f"Invalid table name: '{table_name}'")
     if not table_exists(table_name):
         raise ValueError(f"Table '{table_name}' does not exist.")
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(f'DROP TABLE "{table_name}";')
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    if get_table_engine(table_name) == "duckdb":
+        parquet_store.drop(table_name)
+        set_table_engine(table_name, None)
+    else:
+        table_store.drop(table_name)
+    bump_table_version(table_name)
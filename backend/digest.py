@@ -0,0 +1,61 @@
+import json
+from collections import Counter
+from backend.config import RESULT_TOKEN_BUDGET, DIGEST_SAMPLE_ROWS, DIGEST_TOP_K
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) — good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def compact_json(value) -> str:
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def encode_rows(rows: list) -> str:
+    """Columnar encoding — column names once instead of once per row."""
+    columns = list(rows[0].keys()) if rows else []
+    return compact_json({"columns": columns, "rows": [[row.get(c) for c in columns] for row in rows]})
+
+
+def column_summary(values: list, top_k: int) -> dict:
+    present = [v for v in values if v is not None]
+    summary = {"count": len(present), "nulls": len(values) - len(present)}
+    numbers = [v for v in present if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    if numbers and len(numbers) == len(present):
+        summary.update({
+            "min":  min(numbers),
+            "max":  max(numbers),
+            "mean": round(sum(numbers) / len(numbers), 4)
+        })
+    else:
+        counts = Counter(str(v) for v in present)
+        summary["distinct"] = len(counts)
+        summary["top"] = counts.most_common(top_k)
+    return summary
+
+
+def build_result_digest(rows: list, budget: int = RESULT_TOKEN_BUDGET,
+                        sample_rows: int = DIGEST_SAMPLE_ROWS, top_k: int = DIGEST_TOP_K) -> dict:
+    """Return {"mode", "text", "tokens"} for the summarization prompt.
+
+    Results that fit the token budget are passed through as rows; larger ones
+    are replaced by per-column aggregates plus a small row sample.
+    """
+    text = encode_rows(rows)
+    tokens = estimate_tokens(text)
+    if tokens <= budget:
+        return {"mode": "rows", "text": text, "tokens": tokens}
+
+    columns = list(rows[0].keys())
+    digest = {
+        "row_count": len(rows),
+        "columns":   {c: column_summary([row.get(c) for row in rows], top_k) for c in columns},
+        "sample":    [[row.get(c) for c in columns] for row in rows[:sample_rows]]
+    }
+    text = compact_json(digest)
+    # Very wide results: shrink the sample before giving up on the budget
+    while estimate_tokens(text) > budget and digest["sample"]:
+        digest["sample"] = digest["sample"][:len(digest["sample"]) // 2]
+        text = compact_json(digest)
+    return {"mode": "digest", "text": text, "tokens": estimate_tokens(text)}
@@ -0,0 +1,119 @@
+import io
+import csv
+import json
+
+EXPORT_FORMATS = {
+    "ndjson":  "application/x-ndjson",
+    "csv":     "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def iter_ndjson(columns: list, batches):
+    for rows in batches:
+        yield "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows).encode("utf-8")
+
+
+def iter_csv(columns: list, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain.
+
+    Keeps the absolute position so the Parquet footer offsets stay correct.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_type(pa, values: list):
+    kinds = {type(v) for v in values if v is not None}
+    if kinds and kinds <= {int, bool}:
+        return pa.int64()
+    if kinds and kinds <= {int, float}:
+        return pa.float64()
+    if kinds == {bytes}:
+        return pa.binary()
+    return pa.string()
+
+
+def require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export needs the 'pyarrow' package. Run: pip install pyarrow")
+    return pa, pq
+
+
+def iter_parquet(columns: list, batches):
+    """Stream Parquet one row group per batch.
+
+    SQLite columns are dynamically typed while Parquet needs one type per
+    column, so types are fixed from the first batch. Columns that change
+    type later on should be exported as CSV or NDJSON instead.
+    """
+    pa, pq = require_pyarrow()
+
+    sink = _ChunkSink()
+    writer = None
+    for rows in batches:
+        values = list(zip(*rows))
+        if writer is None:
+            schema = pa.schema([
+                (col, _arrow_type(pa, list(vals))) for col, vals in zip(columns, values)
+            ])
+            writer = pq.ParquetWriter(sink, schema)
+        arrays = []
+        for field, vals in zip(schema, values):
+            vals = list(vals)
+            if field.type == pa.string():
+                vals = [None if v is None else str(v) for v in vals]
+            arrays.append(pa.array(vals, type=field.type))
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+
+    if writer is None:
+        writer = pq.ParquetWriter(sink, pa.schema([(col, pa.string()) for col in columns]))
+    writer.close()
+    yield sink.drain()
+
+
+def export_stream(fmt: str, columns: list, batches):
+    """Return a byte-chunk iterator for the requested format."""
+    if fmt == "ndjson":
+        return iter_ndjson(columns, batches)
+    if fmt == "csv":
+        return iter_csv(columns, batches)
+    if fmt == "parquet":
+        require_pyarrow()   # fail before the response starts, not mid-stream
+        return iter_parquet(columns, batches)
+    raise ValueError(f"Unsupported export format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
@@ -0,0 +1,392 @@
+import re
+import math
+import time
+import sqlite3
+import logging
+import threading
+from collections import Counter
+import sqlglot
+from sqlglot import exp
+from backend.config import (
+    QUERY_TIMEOUT_MS,
+    QUERY_MAX_VM_STEPS,
+    QUERY_MAX_ROWS,
+    QUERY_MAX_JOIN_ROWS,
+    QUERY_HUGE_TABLE_ROWS,
+    QUERY_TABLE_BUDGETS
+)
+from backend.database import table_store, explain_query_plan, get_connection
+from backend.catalog import catalog
+from backend.columnar import parquet_store, fetch_dicts
+from backend import summaries
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 10000   # VM instructions between progress-handler calls
+BUDGET_FIELDS = ("timeout_ms", "max_vm_steps", "max_rows", "max_join_rows", "huge_table_rows")
+
+
+class QueryBudgetError(Exception):
+    """Raised when a query is rejected before running or aborted while running."""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason   # timeout | vm_steps | cartesian
+
+
+# ─────────────────────────────────────────
+# BUDGETS
+# ─────────────────────────────────────────
+DEFAULT_BUDGET = {
+    "timeout_ms":      QUERY_TIMEOUT_MS,
+    "max_vm_steps":    QUERY_MAX_VM_STEPS,
+    "max_rows":        QUERY_MAX_ROWS,
+    "max_join_rows":   QUERY_MAX_JOIN_ROWS,
+    "huge_table_rows": QUERY_HUGE_TABLE_ROWS,
+}
+
+
+def check_budget(overrides: dict) -> dict:
+    unknown = set(overrides) - set(BUDGET_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown budget field(s): {', '.join(sorted(unknown))}. Use: {', '.join(BUDGET_FIELDS)}.")
+    if any(not isinstance(v, int) or v < 0 for v in overrides.values()):
+        raise ValueError("Budget values must be non-negative integers (0 = no limit).")
+    return dict(overrides)
+
+
+# ─────────────────────────────────────────
+# PLAN CHECKS
+# ─────────────────────────────────────────
+def table_aliases(tree) -> dict:
+    """Map every alias (and bare name) in the query to its table."""
+    return {t.alias_or_name: t.name for t in tree.find_all(exp.Table)}
+
+
+def estimate_join_rows(plan: list, aliases: dict) -> int:
+    """Largest product of full-scan sizes among sibling loops of the plan.
+
+    Sibling SCAN lines under one parent are nested loops; without a SEARCH
+    between them every pair of rows is visited (a cartesian product).
+    """
+    products = Counter()
+    scans = Counter()
+    for _, parent, _, detail in plan:
+        match = re.match(r"SCAN (\S+)", detail)
+        if not match:
+            continue
+        info = catalog.get(aliases.get(match.group(1), match.group(1)))
+        if info is None:
+            continue
+        products[parent] = products.get(parent, 1) * max(info.row_count, 1)
+        scans[parent] += 1
+    return max((products[p] for p in products if scans[p] > 1), default=0)
+
+
+def unbounded_scan(plan: list, aliases: dict, huge_table_rows: int) -> bool:
+    """True if the plan fully scans a table larger than `huge_table_rows`."""
+    for detail in (row[-1] for row in plan):
+        match = re.match(r"SCAN (\S+)", detail)
+        if match:
+            info = catalog.get(aliases.get(match.group(1), match.group(1)))
+            if info is not None and info.row_count > huge_table_rows:
+                return True
+    return False
+
+
+def plan_cost(plan: list, aliases: dict) -> float:
+    """Rough cost of a plan, used to order equivalent candidates.
+
+    Full scans count the table's rows (nested loops multiply, see
+    estimate_join_rows), index searches a few rows each, and temporary
+    B-trees for sorting or grouping the rows of the table they follow.
+    """
+    cost = float(estimate_join_rows(plan, aliases))
+    rows = 1
+    for detail in (row[-1] for row in plan):
+        match = re.match(r"(SCAN|SEARCH) (\S+)", detail)
+        if match:
+            info = catalog.get(aliases.get(match.group(2), match.group(2)))
+            rows = max(info.row_count, 1) if info is not None else 1
+            cost += rows if match.group(1) == "SCAN" else math.log2(rows + 1)
+        elif "TEMP B-TREE" in detail:
+            cost += rows
+    return cost
+
+
+def returns_all_rows(tree) -> bool:
+    """True for a row-listing query without LIMIT (no aggregates, no GROUP BY)."""
+    if not isinstance(tree, exp.Query) or tree.args.get("limit"):
+        return False
+    if isinstance(tree, exp.Select) and (tree.args.get("group") or tree.find(exp.AggFunc)):
+        return False
+    return True
+
+
+# ─────────────────────────────────────────
+# GOVERNOR
+# ─────────────────────────────────────────
+class QueryGovernor:
+    """Run generated SQL within a per-table budget.
+
+    Before execution the plan is checked: cartesian products above
+    `max_join_rows` are rejected, and row listings that fully scan a huge
+    table get a LIMIT. While running, a progress handler aborts the query
+    once it exceeds `timeout_ms` or `max_vm_steps`. At most `max_rows` rows
+    are fetched; the rest is reported as truncated.
+    """
+
+    def __init__(self, defaults: dict = DEFAULT_BUDGET, table_budgets: dict = QUERY_TABLE_BUDGETS):
+        self.defaults = dict(defaults)
+        self.table_budgets = {t: check_budget(b) for t, b in table_budgets.items()}
+        self.aborts = Counter()   # reason -> count
+        self._lock = threading.Lock()
+
+    def budget_for(self, table_name: str) -> dict:
+        return {**self.defaults, **self.table_budgets.get(table_name, {})}
+
+    def set_budget(self, table_name: str, overrides: dict) -> dict:
+        with self._lock:
+            self.table_budgets[table_name] = check_budget(overrides)
+        return self.budget_for(table_name)
+
+    def plan(self, conn, sql: str, budget: dict) -> tuple:
+        """Return (sql to run, rewrites) or raise QueryBudgetError."""
+        try:
+            tree = sqlglot.parse_one(sql, read="sqlite")
+        except sqlglot.errors.ParseError:
+            return sql, []   # let SQLite report the syntax error
+        aliases = table_aliases(tree)
+        plan = explain_query_plan(conn, sql)
+
+        joined = estimate_join_rows(plan, aliases)
+        if budget["max_join_rows"] and joined > budget["max_join_rows"]:
+            raise QueryBudgetError(
+                f"Query rejected: the plan joins without a usable condition (~{joined:,} row combinations). "
+                "Add a join condition or aggregate instead.",
+                "cartesian"
+            )
+
+        if budget["max_rows"] and returns_all_rows(tree) and unbounded_scan(plan, aliases, budget["huge_table_rows"]):
+            limit = budget["max_rows"] + 1   # one extra row tells us the result was cut
+            return tree.limit(limit).sql(dialect="sqlite"), [f"added LIMIT {limit} to an unbounded scan"]
+        return sql, []
+
+    def rank(self, candidates: list, table_name: str) -> list:
+        """Order candidate SQL by plan cost, cheapest first (stable on ties).
+
+        Candidates SQLite cannot plan (unknown functions or columns the
+        validator let through) or that the join budget would reject are
+        dropped. DuckDB tables keep the given order.
+        """
+        info = catalog.get(table_name)
+        if info is not None and info.engine == "duckdb":
+            return list(candidates)
+        budget = self.budget_for(table_name)
+        ranked = []
+        with table_store.reader(table_name) as conn:
+            for sql in candidates:
+                try:
+                    aliases = table_aliases(sqlglot.parse_one(sql, read="sqlite"))
+                    plan = explain_query_plan(conn, sql)
+                except (sqlglot.errors.ParseError, sqlite3.Error):
+                    continue
+                if budget["max_join_rows"] and estimate_join_rows(plan, aliases) > budget["max_join_rows"]:
+                    continue
+                ranked.append((plan_cost(plan, aliases), len(ranked), sql))
+        return [sql for _, _, sql in sorted(ranked)]
+
+    def run(self, sql: str, table_name: str, use_summaries: bool = True, conn=None) -> tuple:
+        """Execute a SELECT within the table's budget.
+
+        Simple aggregates over SQLite tables are answered from the table's
+        precomputed summaries unless `use_summaries` is off. `conn` runs the
+        query on another SQLite connection (a session's previous result)
+        under the same budget. Returns (rows, execution) where execution
+        holds row_count, truncated, row_cap, rewrites and elapsed_ms.
+        """
+        budget = self.budget_for(table_name)
+        started = time.monotonic()
+        info = catalog.get(table_name)
+        if conn is not None:
+            rows, rewrites = self._execute_sqlite(conn, sql, table_name, budget, started, False)
+        elif info is not None and info.engine == "duckdb":
+            rows, rewrites = self._run_duckdb(sql, table_name, budget, started), []
+        else:
+            rows, rewrites = self._run_sqlite(sql, table_name, budget, started, use_summaries)
+
+        truncated = bool(budget["max_rows"]) and len(rows) > budget["max_rows"]
+        if truncated:
+            rows = rows[:budget["max_rows"]]
+        return rows, {
+            "row_count":  len(rows),
+            "truncated":  truncated,
+            "row_cap":    budget["max_rows"],
+            "rewrites":   rewrites,
+            "elapsed_ms": round((time.monotonic() - started) * 1000, 1)
+        }
+
+    def stream(self, sql: str, table_name: str, batch_size: int) -> tuple:
+        """Run a SELECT for export, streaming every row in batches of `batch_size`.
+
+        The plan checks and the time/step budget apply as in run(); the row
+        cap does not. Time counts only while the engine works, not while the
+        client reads. Returns (columns, batches); the statement runs up front
+        so errors surface before any output, and the private connection
+        closes once `batches` is exhausted or closed.
+        """
+        budget = {**self.budget_for(table_name), "max_rows": 0}
+        started = time.monotonic()
+        timeout = budget["timeout_ms"] / 1000
+        state = {"steps": 0, "busy": 0.0, "since": started, "reason": None}
+        info = catalog.get(table_name)
+        duckdb = info is not None and info.engine == "duckdb"
+        conn = parquet_store.open_cursor(table_name) if duckdb else get_connection(table_name)
+
+        def progress():
+            state["steps"] += PROGRESS_INTERVAL
+            if budget["max_vm_steps"] and state["steps"] > budget["max_vm_steps"]:
+                state["reason"] = "vm_steps"
+            elif timeout and state["busy"] + time.monotonic() - state["since"] > timeout:
+                state["reason"] = "timeout"
+            return 1 if state["reason"] else 0
+
+        def interrupt():
+            state["reason"] = "timeout"
+            conn.interrupt()
+
+        def guarded(call, *args):
+            # DuckDB has no progress handler — a timer interrupts the cursor instead
+            timer = threading.Timer(max(timeout - state["busy"], 0), interrupt) if duckdb and timeout else None
+            if timer:
+                timer.start()
+            state["since"] = time.monotonic()
+            try:
+                return call(*args)
+            except Exception as e:
+                if state["reason"] is None:
+                    raise
+                raise self._budget_exceeded(table_name, sql, state["reason"], budget, started) from e
+            finally:
+                state["busy"] += time.monotonic() - state["since"]
+                if timer:
+                    timer.cancel()
+
+        try:
+            if not duckdb:
+                conn.execute("PRAGMA query_only=ON;")
+                try:
+                    self.plan(conn, sql, budget)
+                except QueryBudgetError as e:
+                    self._aborted(table_name, sql, e.reason, started)
+                    raise
+                conn.set_progress_handler(progress, PROGRESS_INTERVAL)
+            cursor = guarded(conn.execute, sql)
+        except Exception:
+            conn.close()
+            raise
+        columns = [d[0] for d in cursor.description or []]
+
+        def batches():
+            try:
+                while rows := guarded(cursor.fetchmany, batch_size):
+                    yield rows
+            finally:
+                conn.close()
+
+        return columns, batches()
+
+    def _budget_exceeded(self, table_name: str, sql: str, reason: str, budget: dict, started: float):
+        self._aborted(table_name, sql, reason, started)
+        limit = (f"{budget['timeout_ms']} ms time budget" if reason == "timeout"
+                 else f"{budget['max_vm_steps']:,} step budget")
+        return QueryBudgetError(
+            f"Query aborted: exceeded the {limit}. Add filters, a LIMIT or aggregate instead.", reason
+        )
+
+    def _run_sqlite(self, sql: str, table_name: str, budget: dict, started: float, use_summaries: bool) -> tuple:
+        with table_store.reader(table_name) as conn:
+            return self._execute_sqlite(conn, sql, table_name, budget, started, use_summaries)
+
+    def _execute_sqlite(self, conn, sql: str, table_name: str, budget: dict, started: float,
+                        use_summaries: bool) -> tuple:
+        deadline = started + budget["timeout_ms"] / 1000
+        state = {"steps": 0, "reason": None}
+
+        def progress():
+            state["steps"] += PROGRESS_INTERVAL
+            if budget["max_vm_steps"] and state["steps"] > budget["max_vm_steps"]:
+                state["reason"] = "vm_steps"
+            elif budget["timeout_ms"] and time.monotonic() > deadline:
+                state["reason"] = "timeout"
+            return 1 if state["reason"] else 0
+
+        summary_sql = summaries.rewrite(conn, sql, table_name) if use_summaries else None
+        if summary_sql is not None:
+            # Reads only the small summary table — no plan checks needed
+            sql, rewrites = summary_sql, ["answered from precomputed summaries"]
+        else:
+            try:
+                sql, rewrites = self.plan(conn, sql, budget)
+            except QueryBudgetError as e:
+                self._aborted(table_name, sql, e.reason, started)
+                raise
+        conn.set_progress_handler(progress, PROGRESS_INTERVAL)
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        try:
+            cursor.execute(sql)
+            rows = cursor.fetchmany(budget["max_rows"] + 1) if budget["max_rows"] else cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            if state["reason"] is None:
+                raise
+            raise self._budget_exceeded(table_name, sql, state["reason"], budget, started) from e
+        finally:
+            cursor.close()
+            conn.set_progress_handler(None, 0)
+        return [dict(row) for row in rows], rewrites
+
+    def _run_duckdb(self, sql: str, table_name: str, budget: dict, started: float) -> list:
+        """DuckDB has no progress handler — a timer interrupts the cursor instead.
+
+        The SQLite plan checks and step budget do not apply; the row cap does.
+        """
+        state = {"reason": None}
+        with parquet_store.cursor(table_name) as cursor:
+            def interrupt():
+                state["reason"] = "timeout"
+                cursor.interrupt()
+
+            timer = threading.Timer(budget["timeout_ms"] / 1000, interrupt) if budget["timeout_ms"] else None
+            if timer:
+                timer.start()
+            try:
+                cursor.execute(sql)
+                rows = cursor.fetchmany(budget["max_rows"] + 1) if budget["max_rows"] else cursor.fetchall()
+            except Exception as e:
+                if state["reason"] is None:
+                    raise
+                raise self._budget_exceeded(table_name, sql, state["reason"], budget, started) from e
+            finally:
+                if timer:
+                    timer.cancel()
+            return fetch_dicts(cursor, rows)
+
+    def _aborted(self, table_name: str, sql: str, reason: str, started: float):
+        with self._lock:
+            self.aborts[reason] += 1
+        logger.warning(
+            "query stopped (%s) on %s after %.0f ms: %s",
+            reason, table_name, (time.monotonic() - started) * 1000, " ".join(sql.split())
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "defaults":      dict(self.defaults),
+                "table_budgets": {t: dict(b) for t, b in self.table_budgets.items()},
+                "aborts":        dict(self.aborts)
+            }
+
+
+query_governor = QueryGovernor()
@@ -0,0 +1,200 @@
+import hashlib
+import logging
+import threading
+from collections import Counter
+import sqlglot
+from sqlglot import exp
+from backend.config import (
+    INDEX_ADVISOR_ENABLED,
+    INDEX_ADVISOR_MIN_SCANS,
+    INDEX_ADVISOR_MAX_INDEXES,
+    INDEX_ADVISOR_MAX_MB
+)
+from backend.database import table_store, explain_plan
+from backend.catalog import get_table_columns, get_table_dialect
+
+logger = logging.getLogger(__name__)
+
+INDEX_PREFIX = "ix_adv_"
+COMPARISONS = (exp.EQ, exp.NEQ, exp.GT, exp.GTE, exp.LT, exp.LTE, exp.In, exp.Between, exp.Like)
+EST_BYTES_PER_ENTRY = 40   # used when SQLite is built without the dbstat table
+
+
+# ─────────────────────────────────────────
+# PREDICATES
+# ─────────────────────────────────────────
+def indexable_expression(node) -> exp.Expression | None:
+    """Return the indexable form of one side of a comparison.
+
+    Plain columns, UPPER(col) and CAST(col AS REAL|INTEGER|NUMERIC) — the
+    shapes the query-gen prompt asks for.
+    """
+    if isinstance(node, exp.Column):
+        return exp.column(node.name, quoted=True)
+    if isinstance(node, exp.Upper) and isinstance(node.this, exp.Column):
+        return exp.Upper(this=exp.column(node.this.name, quoted=True))
+    if isinstance(node, exp.Cast) and isinstance(node.this, exp.Column):
+        return exp.Cast(this=exp.column(node.this.name, quoted=True), to=node.args["to"].copy())
+    return None
+
+
+def predicate_expressions(sql: str) -> list:
+    """SQLite expression strings that appear as filter operands in WHERE clauses."""
+    try:
+        tree = sqlglot.parse_one(sql, read="sqlite")
+    except sqlglot.errors.ParseError:
+        return []
+    found = []
+    for where in tree.find_all(exp.Where):
+        for comparison in where.find_all(*COMPARISONS):
+            target = indexable_expression(comparison.this)
+            if target is not None:
+                found.append(target.sql(dialect="sqlite"))
+    return list(dict.fromkeys(found))
+
+
+def full_scan(conn, sql: str) -> bool:
+    """True if EXPLAIN QUERY PLAN shows a table scan without an index."""
+    return any(line.startswith("SCAN") and "INDEX" not in line for line in explain_plan(conn, sql))
+
+
+def index_name(table_name: str, expression: str) -> str:
+    digest = hashlib.sha1(f"{table_name}:{expression}".encode("utf-8")).hexdigest()[:10]
+    return f"{INDEX_PREFIX}{table_name}_{digest}"
+
+
+# ─────────────────────────────────────────
+# ADVISOR
+# ─────────────────────────────────────────
+class IndexAdvisor:
+    """Count filter expressions behind full scans and index the hot ones.
+
+    Indexes are created on a background thread once an expression has
+    caused INDEX_ADVISOR_MIN_SCANS full scans, within a budget on the number
+    of advised indexes and their total size.
+    """
+
+    def __init__(self, enabled: bool = INDEX_ADVISOR_ENABLED, min_scans: int = INDEX_ADVISOR_MIN_SCANS,
+                 max_indexes: int = INDEX_ADVISOR_MAX_INDEXES, max_mb: int = INDEX_ADVISOR_MAX_MB):
+        self.enabled = enabled
+        self.min_scans = min_scans
+        self.max_indexes = max_indexes
+        self.max_bytes = max_mb * 1024 * 1024
+        self.scans = Counter()       # (table, expression) -> full scans seen
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def observe(self, sql: str, table_name: str):
+        """Record the predicates of an executed query (called after execute_query)."""
+        if not self.enabled or get_table_dialect(table_name) != "sqlite":
+            return   # Parquet tables have no indexes to advise
+        expressions = predicate_expressions(sql)
+        if not expressions:
+            return
+        try:
+            with table_store.reader(table_name) as conn:
+                if not full_scan(conn, sql):
+                    return
+        except Exception:
+            return
+
+        hot = []
+        with self._lock:
+            for expression in expressions:
+                key = (table_name, expression)
+                self.scans[key] += 1
+                if self.scans[key] >= self.min_scans and key not in self._pending:
+                    self._pending.add(key)
+                    hot.append(key)
+        for table, expression in hot:
+            threading.Thread(target=self._advise, args=(table, expression), daemon=True).start()
+
+    def _advise(self, table_name: str, expression: str):
+        try:
+            self.create(table_name, expression)
+        except Exception as e:
+            logger.info("index advisor skipped %s(%s): %s", table_name, expression, e)
+        finally:
+            with self._lock:
+                self._pending.discard((table_name, expression))
+                self.scans.pop((table_name, expression), None)
+
+    # ── Admin operations ─────────────────────────────
+    def list_indexes(self) -> list:
+        indexes = []
+        for table_name in table_store.names():
+            try:
+                with table_store.reader(table_name) as conn:
+                    rows = conn.execute(
+                        "SELECT name, tbl_name, sql FROM sqlite_master WHERE type='index' AND name LIKE ? ORDER BY name;",
+                        (f"{INDEX_PREFIX}%",)
+                    ).fetchall()
+                    indexes += [
+                        {"name": name, "table": table, "sql": sql, "size_bytes": self._index_size(conn, name, table)}
+                        for name, table, sql in rows
+                    ]
+            except ValueError:
+                continue   # dropped while listing
+        return sorted(indexes, key=lambda ix: ix["name"])
+
+    def candidates(self) -> list:
+        with self._lock:
+            return [
+                {"table": table, "expression": expression, "full_scans": count}
+                for (table, expression), count in self.scans.most_common()
+            ]
+
+    def create(self, table_name: str, expression: str) -> dict:
+        """Create an advised expression index, enforcing the budget."""
+        columns = [name for name, _ in get_table_columns(table_name)]
+        if not columns:
+            raise ValueError(f"Table '{table_name}' does not exist.")
+        try:
+            parsed = indexable_expression(sqlglot.parse_one(expression, read="sqlite"))
+        except sqlglot.errors.ParseError:
+            parsed = None
+        if parsed is None:
+            raise ValueError("Expression must be a column, UPPER(column) or CAST(column AS type).")
+        column = parsed if isinstance(parsed, exp.Column) else parsed.this
+        if column.name not in columns:
+            raise ValueError(f"Unknown column '{column.name}' in table '{table_name}'.")
+        expression = parsed.sql(dialect="sqlite")
+
+        existing = self.list_indexes()
+        name = index_name(table_name, expression)
+        if any(ix["name"] == name for ix in existing):
+            return {"name": name, "created": False}
+        if len(existing) >= self.max_indexes:
+            raise ValueError(f"Index budget reached ({self.max_indexes} advised indexes).")
+
+        with table_store.reader(table_name) as conn:
+            row_count = conn.execute(f'SELECT COUNT(*) FROM "{table_name}";').fetchone()[0]
+        used = sum(ix["size_bytes"] for ix in existing)
+        if used + row_count * EST_BYTES_PER_ENTRY > self.max_bytes:
+            raise ValueError(f"Index size budget reached ({self.max_bytes // (1024 * 1024)} MB).")
+
+        with table_store.writer(table_name) as conn:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table_name}" ({expression});')
+        logger.info("index advisor created %s on %s(%s)", name, table_name, expression)
+        return {"name": name, "created": True}
+
+    def drop(self, name: str):
+        if not name.startswith(INDEX_PREFIX):
+            raise ValueError(f"'{name}' is not an advised index.")
+        index = next((ix for ix in self.list_indexes() if ix["name"] == name), None)
+        if index is None:
+            raise ValueError(f"Index '{name}' does not exist.")
+        with table_store.writer(index["table"]) as conn:
+            conn.execute(f'DROP INDEX "{name}";')
+
+    @staticmethod
+    def _index_size(conn, name: str, table: str) -> int:
+        try:
+            size = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name=?;", (name,)).fetchone()[0]
+            return size or 0
+        except Exception:
+            rows = conn.execute(f'SELECT COUNT(*) FROM "{table}";').fetchone()[0]
+            return rows * EST_BYTES_PER_ENTRY
+
+
+index_advisor = IndexAdvisor()
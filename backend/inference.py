@@ -0,0 +1,144 @@
+import pandas as pd
+
+COLUMN_TYPES = ("BOOLEAN", "INTEGER", "REAL", "DATE", "DATETIME", "TEXT")
+
+# "1,234", "$1,234.50", "-€12" — thousands separators only in groups of three
+CURRENCY       = "$€£₹¥"
+NUMBER_PATTERN = rf"[-+]?[{CURRENCY}]?\s*(?:\d{{1,3}}(?:,\d{{3}})+|\d+)(?:\.\d+)?"
+STRIP_PATTERN  = rf"[{CURRENCY},\s]"
+LEADING_ZERO   = r"\s*[-+]?0\d"       # zip codes, account numbers — keep as TEXT
+
+PROBE_ROWS = 200   # a candidate type must fit these before the whole sample is tried
+
+TRUE_VALUES  = {"true", "yes", "y", "t"}
+FALSE_VALUES = {"false", "no", "n", "f"}
+
+# Tried in order; day-first before month-first when both fit the sample
+DATE_FORMATS = (
+    ("%Y-%m-%d", "DATE"),
+    ("%d/%m/%Y", "DATE"),
+    ("%m/%d/%Y", "DATE"),
+    ("%Y/%m/%d", "DATE"),
+    ("%d-%m-%Y", "DATE"),
+    ("%Y-%m-%d %H:%M:%S", "DATETIME"),
+    ("%Y-%m-%dT%H:%M:%S", "DATETIME"),
+    ("%Y-%m-%d %H:%M", "DATETIME"),
+)
+ISO_FORMATS = {"DATE": "%Y-%m-%d", "DATETIME": "%Y-%m-%d %H:%M:%S"}
+
+# Incoming types each declared type accepts when loading into an existing table
+ACCEPTS = {
+    "INTEGER":  ("INTEGER",),
+    "REAL":     ("INTEGER", "REAL"),
+    "BOOLEAN":  ("BOOLEAN",),
+    "DATE":     ("DATE",),
+    "DATETIME": ("DATE", "DATETIME"),
+}
+
+
+# ─────────────────────────────────────────
+# NORMALIZATION
+# ─────────────────────────────────────────
+def normalize(values: pd.Series, col_type: str, date_format: str = ""):
+    """Convert raw CSV strings to `col_type` values (None for missing).
+
+    Returns an object Series of Python values ready for sqlite3, or None if
+    any present value does not fit the type.
+    """
+    present = values.notna()
+    raw = values[present]
+    # String methods are per-value Python calls on object columns — the
+    # common cases below avoid them and only fall back when a value fails.
+    if col_type == "TEXT":
+        converted = raw.astype(object)
+    elif col_type in ("INTEGER", "REAL"):
+        numbers = pd.to_numeric(raw, errors="coerce")
+        if numbers.isna().any():
+            # Formatted numbers: strip currency and thousands separators
+            text = raw.str.strip()
+            if not text.str.fullmatch(NUMBER_PATTERN).astype(bool).all():
+                return None
+            numbers = pd.to_numeric(text.str.replace(STRIP_PATTERN, "", regex=True), errors="coerce")
+            if numbers.isna().any():
+                return None
+        if raw.str.match(LEADING_ZERO).astype(bool).any():
+            return None
+        if col_type == "INTEGER" and not pd.api.types.is_integer_dtype(numbers):
+            return None
+        converted = numbers.astype("int64" if col_type == "INTEGER" else "float64").astype(object)
+    elif col_type == "BOOLEAN":
+        lowered = raw.str.strip().str.lower()
+        if not lowered.isin(TRUE_VALUES | FALSE_VALUES).all():
+            return None
+        converted = lowered.isin(TRUE_VALUES).astype(int).astype(object)
+    else:
+        parsed = pd.to_datetime(raw, format=date_format, errors="coerce")
+        if parsed.isna().any():
+            parsed = pd.to_datetime(raw.str.strip(), format=date_format, errors="coerce")
+            if parsed.isna().any():
+                return None
+        converted = parsed.dt.strftime(ISO_FORMATS[col_type]).astype(object)
+
+    result = pd.Series(None, index=values.index, dtype=object)
+    result[present] = converted.to_numpy()
+    return result
+
+
+# ─────────────────────────────────────────
+# INFERENCE
+# ─────────────────────────────────────────
+def infer_column(sample: pd.Series) -> tuple:
+    """Pick (type, date_format) for a column from a sample of raw strings."""
+    present = sample.dropna()
+    if present.empty:
+        return "TEXT", ""
+    probe = present.head(PROBE_ROWS)
+    candidates = [(col_type, "") for col_type in ("BOOLEAN", "INTEGER", "REAL")]
+    candidates += [(col_type, date_format) for date_format, col_type in DATE_FORMATS]
+    for col_type, date_format in candidates:
+        if (normalize(probe, col_type, date_format) is not None
+                and normalize(present, col_type, date_format) is not None):
+            return col_type, date_format
+    return "TEXT", ""
+
+
+def load_type(name: str, declared: str, sample: pd.Series) -> tuple:
+    """Pick (type, date_format) to load `sample` into an existing column of type `declared`.
+
+    Raises ValueError when the incoming values do not fit the column.
+    """
+    declared = declared.upper()
+    if declared not in ACCEPTS:
+        return "TEXT", ""   # TEXT, or a column declared before ingestion typing
+    if sample.dropna().empty:
+        return declared, ISO_FORMATS.get(declared, "")
+    col_type, date_format = infer_column(sample)
+    if col_type not in ACCEPTS[declared]:
+        raise ValueError(f"Column '{name}' is {declared} in the table but the upload has {col_type} values.")
+    return declared, date_format
+
+
+def normalize_chunk(chunk: pd.DataFrame, types: list, widen: bool = True) -> tuple:
+    """Normalize every column of a chunk to its inferred type.
+
+    A value that does not fit widens the column for the rest of the load:
+    INTEGER to REAL when the chunk is numeric, anything else to TEXT (whose
+    earlier rows the caller reloads from the raw CSV). With
+    widen=False (loading into an existing table) it raises ValueError instead.
+    Returns (typed DataFrame, types).
+    """
+    types = list(types)
+    typed = {}
+    for i, name in enumerate(chunk.columns):
+        col_type, date_format = types[i]
+        values = normalize(chunk[name], col_type, date_format)
+        if values is None:
+            if not widen:
+                raise ValueError(f"Column '{name}' has values that do not fit its type {col_type}.")
+            if col_type == "INTEGER" and (values := normalize(chunk[name], "REAL")) is not None:
+                types[i] = ("REAL", "")
+            else:
+                types[i] = ("TEXT", "")
+                values = normalize(chunk[name], "TEXT")
+        typed[i] = values
+    return pd.DataFrame(typed), types
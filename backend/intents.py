@@ -0,0 +1,209 @@
+import re
+from backend.columnar import quote_ident
+from backend.validator import closest_name
+
+# Deterministic templates for questions simple enough to answer without the
+# LLM. A question must match a template in full — anything extra (filters,
+# joins of ideas, "spent across all transactions") falls through to the graph.
+
+PREVIEW_ROWS = 10   # "show some rows" without a number
+LIST_LIMIT   = 50   # same default LIMIT the query-gen prompt asks for
+ANSWER_ITEMS = 10   # values spelled out in a templated answer
+
+AGGREGATE_WORDS = {
+    "AVG": ("average", "avg", "mean"),
+    "SUM": ("sum", "total"),
+    "MIN": ("minimum", "min", "lowest", "smallest"),
+    "MAX": ("maximum", "max", "highest", "largest", "biggest"),
+}
+AGGREGATE_NAMES = {"AVG": "average", "SUM": "total", "MIN": "minimum", "MAX": "maximum"}
+NUMERIC_AFFINITY = ("INT", "REAL", "DOUB", "FLOA", "DEC", "NUM", "BOOL")   # SQLite/DuckDB numeric type names
+
+LEAD   = (r"(?:(?:what is|what's|whats|what are|show|show me|give me|get|find|tell me|"
+          r"calculate|compute|list|display)\s+)?(?:the\s+)?")
+ROWS   = r"(?:rows|records|entries|lines)"
+COLUMN = r"(?:the\s+)?(?P<col>[\w ]+?)(?:\s+(?:column|field|values?))?"
+
+
+class Intent:
+    def __init__(self, name: str, sql: str, answer):
+        self.name = name
+        self.sql = sql
+        self.answer = answer   # rows -> templated answer text
+
+
+def normalize_question(question: str) -> str:
+    text = re.sub(r"\s+", " ", question.lower()).strip()
+    text = re.sub(r"^(?:please|can you|could you|kindly)\s+", "", text)
+    return re.sub(r"(?:\s+please)?\s*[?.!]*$", "", text)
+
+
+def match_column(phrase: str, columns: list) -> str | None:
+    """Column named by a phrase — exact after normalizing, then by edit distance."""
+    key = re.sub(r"[^a-z0-9]", "", phrase.lower())
+    names = [name for name, _ in columns]
+    for name in names:
+        if re.sub(r"[^a-z0-9]", "", name.lower()) in (key, key.rstrip("s")):
+            return name
+    return closest_name(phrase, names)
+
+
+def is_numeric(col_type: str) -> bool:
+    return any(token in col_type.upper() for token in NUMERIC_AFFINITY)
+
+
+def format_value(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, int):
+        return f"{value:,}"
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    return str(value)
+
+
+def listing(values: list) -> str:
+    shown = ", ".join(format_value(v) for v in values[:ANSWER_ITEMS])
+    return shown + (f" and {len(values) - ANSWER_ITEMS} more" if len(values) > ANSWER_ITEMS else "")
+
+
+# ─────────────────────────────────────────
+# TEMPLATES
+# ─────────────────────────────────────────
+def table_nouns(table_name: str) -> set:
+    """Words that may stand for the table's rows ("transactions" for table transactions)."""
+    name = table_name.lower()
+    return {name, name.rstrip("s"), name + "s"}
+
+
+def names_rows(noun: str | None, table_name: str) -> bool:
+    return not noun or bool(re.fullmatch(ROWS, noun)) or noun in table_nouns(table_name)
+
+
+def row_count(match, table_name: str, columns: list) -> Intent | None:
+    if not names_rows(match.group("noun"), table_name):
+        return None
+    return Intent(
+        "row_count",
+        f"SELECT COUNT(*) AS row_count FROM {quote_ident(table_name)}",
+        lambda rows: f"The table {table_name} has {format_value(rows[0]['row_count'])} rows."
+    )
+
+
+def preview(match, table_name: str, columns: list) -> Intent | None:
+    limit = int(match.group("n") or PREVIEW_ROWS)
+    if limit <= 0:
+        return None
+    return Intent(
+        "preview",
+        f"SELECT * FROM {quote_ident(table_name)} LIMIT {limit}",
+        lambda rows: f"Here are the first {len(rows)} rows of {table_name}."
+    )
+
+
+def aggregate(match, table_name: str, columns: list) -> Intent | None:
+    func = next(f for f, words in AGGREGATE_WORDS.items() if match.group("agg") in words)
+    column = match_column(match.group("col"), columns)
+    if column is None or (func in ("AVG", "SUM") and not is_numeric(dict(columns)[column])):
+        return None
+    alias = f"{func.lower()}_{column}"
+
+    def answer(rows):
+        value = rows[0][alias] if rows else None
+        if value is None:
+            return f"{column} has no values, so its {AGGREGATE_NAMES[func]} is empty."
+        return f"The {AGGREGATE_NAMES[func]} of {column} is {format_value(value)}."
+    return Intent(
+        f"aggregate_{func.lower()}",
+        f"SELECT {func}({quote_ident(column)}) AS {quote_ident(alias)} FROM {quote_ident(table_name)}",
+        answer
+    )
+
+
+def distinct_values(match, table_name: str, columns: list) -> Intent | None:
+    column = match_column(match.group("col"), columns)
+    if column is None:
+        return None
+
+    def answer(rows):
+        values = [row[column] for row in rows]
+        more = f" (the first {LIST_LIMIT} shown)" if len(values) >= LIST_LIMIT else ""
+        return f"{column} has these distinct values{more}: {listing(values)}."
+    return Intent(
+        "distinct_values",
+        f"SELECT DISTINCT {quote_ident(column)} FROM {quote_ident(table_name)} ORDER BY 1 LIMIT {LIST_LIMIT}",
+        answer
+    )
+
+
+def distinct_count(match, table_name: str, columns: list) -> Intent | None:
+    column = match_column(match.group("col"), columns)
+    if column is None:
+        return None
+    return Intent(
+        "distinct_count",
+        f"SELECT COUNT(DISTINCT {quote_ident(column)}) AS distinct_count FROM {quote_ident(table_name)}",
+        lambda rows: f"{column} has {format_value(rows[0]['distinct_count'])} distinct values."
+    )
+
+
+def count_by(match, table_name: str, columns: list) -> Intent | None:
+    column = match_column(match.group("col"), columns)
+    if column is None or not names_rows(match.group("noun"), table_name):
+        return None
+
+    def answer(rows):
+        counts = [f"{format_value(row[column])} ({format_value(row['count'])})" for row in rows]
+        return f"Rows per {column}, most frequent first: {listing(counts)}."
+    return Intent(
+        "count_by",
+        f"SELECT {quote_ident(column)}, COUNT(*) AS count FROM {quote_ident(table_name)} "
+        f"GROUP BY {quote_ident(column)} ORDER BY count DESC LIMIT {LIST_LIMIT}",
+        answer
+    )
+
+
+AGGREGATE = "|".join(word for words in AGGREGATE_WORDS.values() for word in words)
+SUFFIX    = r"(?:\s+(?:of|from|in)\s+(?:the\s+|this\s+)?(?P<source>\w+))?"   # "... in the table"
+ROW_TAIL  = r"(?: are there| are| exist| there are| does (?:the|this) (?:table|dataset) have)?"
+
+# Tried in order — the more specific patterns first
+TEMPLATES = [
+    (rf"{LEAD}(?:how many|number of|count(?: of)?) (?:distinct|unique|different) {COLUMN}(?: are there)?{SUFFIX}",
+     distinct_count),
+    (rf"{LEAD}(?:(?:how many|number of|count of) (?P<noun>\w+)(?: are there)?|count|counts|(?:row|record) count) "
+     rf"(?:per|by|for each|grouped by) {COLUMN}{SUFFIX}",
+     count_by),
+    (rf"{LEAD}(?:how many|number of|count(?: of| the)?|total(?: number of)?) (?:total )?(?P<noun>\w+){ROW_TAIL}{SUFFIX}",
+     row_count),
+    (rf"{LEAD}(?:row|record) count(?P<noun>)",
+     row_count),
+    (rf"(?:show|display|list|give|get|view|see)(?: me)?(?: the)? (?:first|top) (?:(?P<n>\d+) )?{ROWS}{SUFFIX}",
+     preview),
+    (rf"(?:show|display|give|get|view|see)(?: me)? (?:(?P<n>\d+) |some |a few )?(?:sample |example )?{ROWS}{SUFFIX}",
+     preview),
+    (r"preview(?: the| this)?(?: table| dataset| data)?(?P<n>)",
+     preview),
+    (rf"{LEAD}(?P<agg>{AGGREGATE})(?: value)?(?: (?:of|for|in))? {COLUMN}{SUFFIX}",
+     aggregate),
+    (rf"{LEAD}(?:distinct|unique|different)(?: values?)?(?: (?:of|for|in))? {COLUMN}{SUFFIX}",
+     distinct_values),
+]
+TEMPLATES = [(re.compile(pattern), build) for pattern, build in TEMPLATES]
+
+
+def match_intent(question: str, table_name: str, columns: list) -> Intent | None:
+    """The first template the whole question matches and that resolves, or None."""
+    if not columns:
+        return None
+    text = normalize_question(question)
+    sources = {"table", "dataset", "data"} | table_nouns(table_name)
+    for pattern, build in TEMPLATES:
+        match = pattern.fullmatch(text)
+        if match and match.groupdict().get("source") in sources | {None}:
+            intent = build(match, table_name, columns)
+            if intent is not None:
+                return intent
+    return None
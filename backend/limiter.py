@@ -0,0 +1,46 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class Overloaded(Exception):
+    """Raised when the wait queue is full — surfaced as HTTP 429."""
+
+
+class ConcurrencyLimiter:
+    """Cap in-flight work and the number of callers allowed to wait for a slot."""
+
+    def __init__(self, max_concurrent: int, max_queued: int):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.active >= self.max_concurrent and self.waiting >= self.max_queued:
+            self.rejected += 1
+            raise Overloaded(
+                f"Server busy: {self.active} requests running, {self.waiting} queued. Retry shortly."
+            )
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queued":     self.max_queued,
+            "active":         self.active,
+            "waiting":        self.waiting,
+            "rejected":       self.rejected
+        }
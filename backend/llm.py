@@ -0,0 +1,88 @@
+import re
+import json
+import time
+import asyncio
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+LLM_PROVIDERS = ("groq", "stub")
+
+
+# ─────────────────────────────────────────
+# STUB (offline, deterministic)
+# ─────────────────────────────────────────
+class StubChatModel(BaseChatModel):
+    """Deterministic stand-in for the real LLM, used by benchmarks and offline runs.
+
+    Recognises the prompts of the graph: SQL generation and repair answer
+    with the canned SQL for the question (or `default_sql`), validation
+    echoes the SQL back, and summarization returns a fixed sentence. Every
+    call sleeps `latency_ms` to imitate the provider's round trip.
+    """
+
+    latency_ms: float = 0.0
+    responses: dict = {}    # question -> SQL
+    default_sql: str = 'SELECT COUNT(*) AS row_count FROM "{table}"'
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _reply(self, messages) -> str:
+        system = next((m.content for m in messages if m.type == "system"), "")
+        humans = [m.content for m in messages if m.type == "human"]
+
+        validated = re.search(r"SQL to validate:\s*(.*?)\n\s*\n", system, re.DOTALL)
+        if validated:
+            return f"```sqlite\n{validated.group(1).strip()}\n```"
+        if humans and humans[-1].startswith("Summarize"):
+            return "Stub summary: the query ran and returned the result shown above."
+
+        # Generation, or repair of a failed query: the canned SQL for the question
+        question = humans[0] if humans else ""
+        table = re.search(r'table:? "([^"]+)"', system) or re.search(r"^Table: (\S+)", system, re.MULTILINE)
+        sql = self.responses.get(question) or self.default_sql.format(table=table.group(1) if table else "")
+        return f"```sqlite\n{sql}\n```"
+
+    def _result(self, messages) -> ChatResult:
+        content = self._reply(messages)
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        message = AIMessage(content=content, usage_metadata={
+            "input_tokens":  prompt_chars // 4 + 1,
+            "output_tokens": len(content) // 4 + 1,
+            "total_tokens":  (prompt_chars + len(content)) // 4 + 2
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_ms / 1000)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._result(messages)
+
+
+def load_stub_responses(path: str) -> dict:
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ─────────────────────────────────────────
+# FACTORY
+# ─────────────────────────────────────────
+def build_llm(provider: str, model: str, api_key: str | None = None,
+              stub_latency_ms: float = 0.0, stub_responses: str = ""):
+    """Create the chat model for the configured provider.
+
+    Provider packages are imported here, so the stub runs without them.
+    """
+    if provider == "groq":
+        from langchain_groq import ChatGroq
+        return ChatGroq(model=model, api_key=api_key, temperature=0)
+    if provider == "stub":
+        return StubChatModel(latency_ms=stub_latency_ms, responses=load_stub_responses(stub_responses))
+    raise ValueError(f"Unknown LLM_PROVIDER '{provider}'. Use one of: {', '.join(LLM_PROVIDERS)}.")
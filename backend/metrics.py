@@ -0,0 +1,202 @@
+import time
+import threading
+from bisect import bisect_left
+from functools import wraps
+from backend.config import METRICS_ENABLED
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ROW_BUCKETS     = (0, 1, 10, 100, 1000, 10000, 100000)
+RETRY_BUCKETS   = (0, 1, 2, 3)
+
+
+# ─────────────────────────────────────────
+# METRIC TYPES (Prometheus text format)
+# ─────────────────────────────────────────
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(f"{self.name}{_labels(self.labels, k)}", v) for k, v in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._series = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = 'le="%s"' % bound
+                    lines.append((f"{self.name}_bucket{_labels(self.labels, key, le)}", cumulative))
+                le = 'le="+Inf"'
+                lines.append((f"{self.name}_bucket{_labels(self.labels, key, le)}", series[-1]))
+                lines.append((f"{self.name}_sum{_labels(self.labels, key)}", round(series[-2], 6)))
+                lines.append((f"{self.name}_count{_labels(self.labels, key)}", series[-1]))
+        return lines
+
+
+# ─────────────────────────────────────────
+# REGISTRY
+# ─────────────────────────────────────────
+NODE_SECONDS   = Histogram("sql_agent_node_seconds", "Graph node latency.", ("node",))
+DB_SECONDS     = Histogram("sql_agent_db_seconds", "backend.database call latency.", ("call",))
+LLM_TOKENS     = Counter("sql_agent_llm_tokens_total", "LLM tokens by node and kind.", ("node", "kind"))
+ASK_SECONDS    = Histogram("sql_agent_ask_seconds", "End-to-end /ask latency (uncached).", ("endpoint", "path"))
+ASK_RETRIES    = Histogram("sql_agent_ask_retries", "Retries through should_continue per request.", buckets=RETRY_BUCKETS)
+ROWS_RETURNED  = Histogram("sql_agent_rows_returned", "Rows returned by executed queries.", buckets=ROW_BUCKETS)
+ASKS           = Counter("sql_agent_asks_total", "/ask requests by outcome.", ("outcome",))
+SPECULATION    = Counter("sql_agent_speculation_total", "Speculative generations by outcome.", ("outcome",))
+RETRIES_SAVED  = Counter("sql_agent_speculation_retries_prevented_total",
+                         "Retries a speculative candidate made unnecessary, by stage.", ("stage",))
+INGEST_ROWS    = Counter("sql_agent_ingest_rows_total", "Rows ingested from uploaded CSVs.")
+INGEST_SECONDS = Histogram("sql_agent_ingest_seconds", "CSV ingestion duration.")
+INGEST_RATE    = Gauge("sql_agent_ingest_rows_per_second", "Throughput of the most recent ingestion.")
+
+REGISTRY = [NODE_SECONDS, DB_SECONDS, LLM_TOKENS, ASK_SECONDS, ASK_RETRIES, ROWS_RETURNED,
+            ASKS, SPECULATION, RETRIES_SAVED, INGEST_ROWS, INGEST_SECONDS, INGEST_RATE]
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines += [f"{name} {value}" for name, value in metric.samples()]
+    return "\n".join(lines) + "\n"
+
+
+# ─────────────────────────────────────────
+# INSTRUMENTATION
+# ─────────────────────────────────────────
+# Everything below is a no-op when METRICS_ENABLED is off: decorators hand
+# back the original function, so the hot path pays nothing.
+
+def timed(call: str):
+    """Decorator recording the latency of a database call."""
+    def decorate(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                DB_SECONDS.observe(time.perf_counter() - started, call)
+        return wrapper
+    return decorate
+
+
+def _record_node(node: str, started: float, update) -> dict:
+    elapsed = time.perf_counter() - started
+    NODE_SECONDS.observe(elapsed, node)
+    update = update or {}
+    for usage in update.get("token_usage", []):
+        LLM_TOKENS.inc(usage["input_tokens"], usage["node"], "prompt")
+        LLM_TOKENS.inc(usage["output_tokens"], usage["node"], "completion")
+    if node in ("fast_path", "execute_query") and update.get("sql_query") and not update.get("error"):
+        ROWS_RETURNED.observe(len(update.get("raw_result") or []))
+    # Reduced into state["timings"] for the per-request breakdown
+    return {**update, "timings": [{"node": node, "ms": round(elapsed * 1000, 2)}]}
+
+
+def instrument_node(node: str, func, afunc):
+    """Wrap a node's sync and async implementations with timing."""
+    if not METRICS_ENABLED:
+        return func, afunc
+
+    @wraps(func)
+    def wrapper(state):
+        started = time.perf_counter()
+        return _record_node(node, started, func(state))
+
+    @wraps(afunc)
+    async def awrapper(state):
+        started = time.perf_counter()
+        return _record_node(node, started, await afunc(state))
+
+    return wrapper, awrapper
+
+
+def record_ask(endpoint: str, response: dict, seconds: float):
+    """Per-request outcome of an uncached graph run."""
+    if not METRICS_ENABLED:
+        return
+    ASK_SECONDS.observe(seconds, endpoint, response.get("path") or "llm")
+    ASK_RETRIES.observe(response.get("retry_count", 0))
+    ASKS.inc(1, "error" if response.get("error") else "answered")
+
+
+def record_cached():
+    if METRICS_ENABLED:
+        ASKS.inc(1, "cached")
+
+
+def record_speculation(outcome: str):
+    """How a speculative generation ended: first_choice | fallback | all_failed | all_rejected."""
+    if METRICS_ENABLED:
+        SPECULATION.inc(1, outcome)
+
+
+def record_retry_prevented(stage: str):
+    """A speculative candidate stood in for SQL that would have failed at `stage`."""
+    if METRICS_ENABLED:
+        RETRIES_SAVED.inc(1, stage)
+
+
+def record_ingestion(rows: int, seconds: float):
+    if not METRICS_ENABLED:
+        return
+    INGEST_ROWS.inc(rows)
+    INGEST_SECONDS.observe(seconds)
+    INGEST_RATE.set(round(rows / seconds) if seconds > 0 else rows)
+
+
+def timing_breakdown(response: dict, seconds: float) -> dict:
+    """Per-request timings returned by /ask when asked for."""
+    return {"total_ms": round(seconds * 1000, 2), "nodes": response.get("timings", [])}
@@ -1,13 +1,39 @@
 import re
 import json
+import asyncio
+import logging
 import sqlparse
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from typing import Annotated, TypedDict, Literal, Any
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import AIMessage, HumanMessage
 from langgraph.graph.message import AnyMessage, add_messages
 from langgraph.graph import END
-from backend.config import llm
-from backend.database import get_table_schema, db_query_tool
+from backend.config import llm, FAST_PATH_ENABLED, SPECULATIVE_FANOUT, SPECULATIVE_MAX_FANOUT
+from backend.database import get_table_version
+from backend.catalog import get_table_schema, get_table_columns, get_table_dialect
+from backend.columnar import ENGINE_DIALECTS
+from backend.validator import validate_sql, is_read_only, SQLValidationError
+from backend.digest import build_result_digest
+from backend.index_advisor import index_advisor
+from backend.governor import query_governor
+from backend.repair import repair_sql
+from backend.intents import match_intent
+from backend.sessions import session_store, compose_followup, split_followup, PREVIOUS_RESULT
+from backend.metrics import record_speculation, record_retry_prevented
+from backend.value_index import question_hints, ground_sql
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 3
+
+
+def add_or_reset(current: list | None, update: list | None) -> list:
+    """operator.add for per-question lists; None empties them (a session's next question)."""
+    if update is None:
+        return []
+    return (current or []) + update
 
 
 class State(TypedDict):
@@ -18,26 +44,152 @@ class State(TypedDict):
     nl_answer:    str       # natural language answer
     error:        str       # any error message
     retry_count:  int       # retry counter
+    digest:       dict      # how the result was encoded for the summary prompt
+    execution:    dict      # row cap / truncation / rewrites from the execution guard
+    summaries:    bool      # answer simple aggregates from precomputed summaries
+    path:         str       # "fast_path" when answered from a template, without the LLM
+    session_id:   str       # conversation the question belongs to ("" = none)
+    previous:     dict      # the session's last answered question, SQL and result shape
+    fanout:       int       # SQL candidates per generation (1 = no speculation)
+    candidates:   list      # validated fallback SQL from speculation, cheapest first
+    speculation:  dict      # how the last speculative generation went
+    value_hints:  list      # (column, stored value) pairs matching the question; None = not looked up
+    token_usage:  Annotated[list, add_or_reset]   # per LLM call: node, input/output tokens
+    timings:      Annotated[list, add_or_reset]   # per node run: node, ms (when metrics are on)
+
+
+def usage_of(node: str, message) -> list:
+    """Token usage record for one LLM call (empty if the provider reports none)."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if not usage:
+        return []
+    return [{
+        "node":          node,
+        "input_tokens":  usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0)
+    }]
 
 
 # ─────────────────────────────────────────
-# NODE 1 — Generate SQL
+# SESSION FOLLOW-UPS
 # ─────────────────────────────────────────
-def query_gen_node(state: State):
+# In a session, query_gen may read the previous answer as previous_result.
+# Validation and execution see the follow-up composed with the previous SQL
+# (backend.sessions), and execution runs it on the materialized previous
+# result when the session still holds it.
+def previous_result(state: State) -> dict | None:
+    """The session's previous answer, if it was on the selected table."""
+    previous = state.get("previous") or {}
+    if not state.get("session_id") or previous.get("table_name") != state.get("table_name"):
+        return None
+    return previous
+
+
+def with_previous(sql: str, state: State) -> str:
+    previous = previous_result(state)
+    if previous is None:
+        return sql
+    return compose_followup(sql, previous["sql"], get_table_dialect(state.get("table_name", "")))
+
+
+def remember_result(state: State, sql: str, result: list, execution: dict) -> dict:
+    """Keep a successful answer as the session's previous result."""
+    if not state.get("session_id"):
+        return {}
+    table_name = state.get("table_name", "")
+    if not execution.get("truncated") and get_table_dialect(table_name) == "sqlite":
+        session_store.materialize(state["session_id"], sql, get_table_version(table_name), result)
+    return {"previous": {
+        "question":   next((m.content for m in state["messages"] if m.type == "human"), ""),
+        "sql":        sql,
+        "columns":    list(result[0]) if result else [],
+        "row_count":  len(result),
+        "table_name": table_name
+    }}
+
+
+def run_query(state: State, sql: str) -> tuple:
+    """Execute through the governor — on the session's previous result when possible."""
+    table_name = state.get("table_name", "")
+    previous = previous_result(state)
+    materialized = previous and session_store.result(state["session_id"], previous["sql"], get_table_version(table_name))
+    local_sql = materialized and split_followup(sql, previous["sql"], table_name)
+    if local_sql:
+        with materialized.use() as conn:
+            # Evicted since it was looked up → run on the base table below
+            if conn is not None:
+                result, execution = query_governor.run(local_sql, table_name, conn=conn)
+                execution["rewrites"].append(f"ran on the session's {PREVIOUS_RESULT} ({materialized.row_count} rows)")
+                return result, execution
+    return query_governor.run(sql, table_name, use_summaries=state.get("summaries", True))
+
+
+# Each LLM node is split into a prompt builder shared by a sync variant
+# (app_graph.invoke) and an async variant (app_graph.ainvoke) that awaits
+# the LLM's async API instead of blocking the event loop.
+
+
+# ─────────────────────────────────────────
+# NODE 0 — Template fast path
+# ─────────────────────────────────────────
+# Questions like "how many rows" or "average of amount" are mapped onto SQL
+# by backend.intents and answered from a template — no LLM call at all.
+# Anything that does not match (or fails to run) goes on to query_gen.
+def fast_path_node(state: State):
+    if not FAST_PATH_ENABLED:
+        return {}
     table_name = state.get("table_name", "")
+    intent = match_intent(state["messages"][-1].content, table_name, get_table_columns(table_name))
+    if intent is None:
+        return {}
+    try:
+        result, execution = query_governor.run(intent.sql, table_name, use_summaries=state.get("summaries", True))
+    except Exception as e:
+        logger.info("fast_path: %s failed, falling back to the LLM: %s", intent.name, e)
+        return {}
+    answer = intent.answer(result)
+    return {
+        "messages": [AIMessage(content=answer)],
+        "sql_query": sqlparse.format(intent.sql, reindent=True, keyword_case="upper"),
+        "raw_result": result,
+        "execution": {**execution, "intent": intent.name},
+        "nl_answer": answer,
+        "error": "",
+        "path": "fast_path",
+        **remember_result(state, intent.sql, result, execution)
+    }
+
+
+async def afast_path_node(state: State):
+    return await asyncio.to_thread(fast_path_node, state)
+
+
+# ─────────────────────────────────────────
+# NODE 1 — Generate SQL
+# ─────────────────────────────────────────
+@lru_cache(maxsize=256)
+def query_gen_prompt(table_name: str, version: str):
+    """SQL-generation prompt for one version of a table — built once and
+    shared by every question, so the system prefix is byte-identical."""
     schema = get_table_schema(table_name)
+    dialect = ENGINE_DIALECTS[get_table_dialect(table_name)]
+    # Columns are typed at ingestion (backend.inference), so no CAST workaround.
+    # The ```sqlite fence below is the graph's marker for SQL, whatever the engine.
+    typed_rule = ("Columns are typed — compare numbers directly. DATE/DATETIME columns hold ISO text "
+                  "('YYYY-MM-DD'), BOOLEAN columns hold 1/0." if dialect == "SQLite"
+                  else "Columns are typed — compare numbers and dates directly.")
 
-    system_prompt = f"""You are an expert SQLite query generator.
+    system_prompt = f"""You are an expert {dialect} query generator.
 
 The user has selected this table:
 {schema}
 
 STRICT RULES:
-1. Use ONLY SQLite syntax.
+1. Use ONLY {dialect} syntax.
 2. Only query the table: "{table_name}". Do not reference other tables.
 3. Only SELECT statements — never INSERT, UPDATE, DELETE, DROP, ALTER.
 4. LIMIT to 50 rows unless user asks for more.
-5. For numeric comparisons on TEXT columns use CAST(col AS REAL).
+5. {typed_rule}
 6. Always wrap final SQL in:
 ```sqlite
 SELECT ...
@@ -47,21 +199,165 @@ SELECT ...
    Example: WHERE UPPER(status) = 'SUCCESS'  not  WHERE status = 'Success'
    Same for all text columns: category, payment_mode, bank, status etc.
 """
-    prompt = ChatPromptTemplate.from_messages([
+    return ChatPromptTemplate.from_messages([
         ("system", system_prompt),
         ("placeholder", "{messages}")
     ])
-    message = (prompt | llm).invoke(state)
+
+
+def followup_context(previous: dict, table_name: str) -> str:
+    question = previous["question"].replace("{", "{{").replace("}", "}}")
+    columns = ", ".join(previous["columns"]).replace("{", "{{").replace("}", "}}")
+    return f"""This question follows up on the previous one in the conversation:
+{question}
+
+Its result ({previous["row_count"]} rows; columns: {columns}) is available as the table "{PREVIOUS_RESULT}".
+If the question refines that result (filters, sorts, limits or re-aggregates it), query "{PREVIOUS_RESULT}"
+instead of "{table_name}" — it may be used alongside "{table_name}". Otherwise query "{table_name}" as usual.
+"""
+
+
+def value_hints_context(hints: list) -> str:
+    lines = "\n".join(f"  {column}: {value}" for column, value in hints)
+    text = f"Stored values matching words in the question — use these exact spellings in filters:\n{lines}"
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def with_value_hints(state: State) -> State:
+    """State with the question's value-index hints looked up (once per question)."""
+    if state.get("value_hints") is not None:
+        return state
+    question = next((m.content for m in state["messages"] if m.type == "human"), "")
+    return {**state, "value_hints": question_hints(question, state.get("table_name", ""))}
+
+
+def build_query_gen_prompt(state: State, hint: str = ""):
+    table_name = state.get("table_name", "")
+    prompt = query_gen_prompt(table_name, get_table_version(table_name))
+    extra = []
+    previous = previous_result(state)
+    if previous is not None:
+        extra.append(("system", followup_context(previous, table_name)))
+    if state.get("value_hints"):
+        extra.append(("system", value_hints_context(state["value_hints"])))
+    if hint:
+        extra.append(("system", hint))
+    if not extra:
+        return prompt
+    # The cached system prompt stays first and unchanged; the additions come after it
+    system, history = prompt.messages
+    return ChatPromptTemplate.from_messages([system, *extra, history])
+
+
+def query_gen_node(state: State):
+    state = with_value_hints(state)
+    if state.get("fanout", 1) > 1:
+        chains = candidate_chains(state)
+        with ThreadPoolExecutor(max_workers=len(chains)) as pool:
+            futures = [pool.submit(chain.invoke, state) for chain in chains]
+        return speculation_update(state, [f.exception() or f.result() for f in futures])
+    message = (build_query_gen_prompt(state) | llm).invoke(state)
     return {
         "messages": [message],
-        "retry_count": state.get("retry_count", 0)
+        "retry_count": state.get("retry_count", 0),
+        "value_hints": state["value_hints"],
+        "token_usage": usage_of("query_gen", message)
+    }
+
+
+async def aquery_gen_node(state: State):
+    state = await asyncio.to_thread(with_value_hints, state)
+    if state.get("fanout", 1) > 1:
+        replies = await asyncio.gather(*(chain.ainvoke(state) for chain in candidate_chains(state)),
+                                       return_exceptions=True)
+        # Validation and EXPLAIN touch SQLite — off the event loop
+        return await asyncio.to_thread(speculation_update, state, replies)
+    message = await (build_query_gen_prompt(state) | llm).ainvoke(state)
+    return {
+        "messages": [message],
+        "retry_count": state.get("retry_count", 0),
+        "value_hints": state["value_hints"],
+        "token_usage": usage_of("query_gen", message)
+    }
+
+
+# ── Speculative candidates ───────────────────────────
+# With a fan-out above 1, several SQL candidates are requested at once: the
+# regular prompt plus variants at other temperatures with an extra hint.
+# The ones the local validator accepts are ranked by plan cost
+# (QueryGovernor.rank). The cheapest goes on to validation and execution;
+# the rest wait in state["candidates"] and run if it fails, instead of a
+# repair or regeneration round trip.
+CANDIDATE_VARIANTS = [
+    (None, ""),   # the regular prompt at the configured temperature
+    (0.3, "Write the most direct query that answers the question."),
+    (0.6, "Check every column name against the schema before writing the query."),
+    (0.9, "If the question is ambiguous, pick its most common interpretation."),
+    (0.5, "Aggregate in SQL rather than returning raw rows where the question allows it."),
+]
+
+
+def clamp_fanout(requested: int) -> int:
+    """Candidates per generation for a request (0 = the configured default)."""
+    return max(1, min(requested or SPECULATIVE_FANOUT, SPECULATIVE_MAX_FANOUT, len(CANDIDATE_VARIANTS)))
+
+
+def candidate_chains(state: State) -> list:
+    chains = []
+    for temperature, hint in CANDIDATE_VARIANTS[:state["fanout"]]:
+        model = llm if temperature is None else llm.bind(temperature=temperature)
+        chains.append(build_query_gen_prompt(state, hint) | model)
+    return chains
+
+
+def speculation_update(state: State, replies: list) -> dict:
+    """Validate and rank the candidate replies; the cheapest becomes the node's message."""
+    messages = [reply for reply in replies if not isinstance(reply, Exception)]
+    if not messages:
+        raise replies[0]
+    table_name = state.get("table_name", "")
+    columns = [name for name, _ in get_table_columns(table_name)]
+    dialect = get_table_dialect(table_name)
+
+    valid = {}   # checked SQL -> index of the first candidate that produced it
+    for index, reply in enumerate(replies):
+        match = None if isinstance(reply, Exception) else re.search(r"```sqlite\s+(.*?)```", reply.content, re.DOTALL)
+        if not match:
+            continue
+        try:
+            checked_sql, _ = validate_sql(with_previous(match.group(1).strip(), state), table_name, columns, dialect)
+        except SQLValidationError:
+            continue
+        valid.setdefault(checked_sql, index)
+    ranked = query_governor.rank(list(valid), table_name)
+
+    update = {
+        "retry_count": state.get("retry_count", 0),
+        "value_hints": state["value_hints"],
+        "token_usage": [usage for message in messages for usage in usage_of("query_gen", message)]
+    }
+    if not ranked:
+        record_speculation("all_rejected")
+        # The regular prompt's reply takes the usual validation path (LLM fallback, retries)
+        return {**update, "messages": [messages[0]], "candidates": [], "speculation": {}}
+    if 0 not in (valid[sql] for sql in ranked):
+        record_retry_prevented("validation")   # the regular prompt's SQL would not have run
+    return {
+        **update,
+        "messages": [AIMessage(content=f"```sqlite\n{ranked[0]}\n```")],
+        "candidates": ranked[1:],
+        "speculation": {"fanout": len(replies), "valid": len(ranked), "chosen": valid[ranked[0]]}
     }
 
 
 # ─────────────────────────────────────────
 # NODE 2 — Validate SQL
 # ─────────────────────────────────────────
-def query_validation_node(state: State):
+def validate_locally(state: State):
+    """Settle the SQL with the deterministic validator.
+
+    Returns the node update, or None when the SQL needs the LLM validator.
+    """
     last_msg = state["messages"][-1]
     match = re.search(r"```sqlite\s+(.*?)```", last_msg.content, re.DOTALL)
 
@@ -72,7 +368,30 @@ def query_validation_node(state: State):
             "retry_count": state.get("retry_count", 0) + 1
         }
 
-    sql_query = match.group(1).strip()
+    sql_query = with_previous(match.group(1).strip(), state)
+    table_name = state.get("table_name", "")
+    columns = [name for name, _ in get_table_columns(table_name)]
+
+    try:
+        checked_sql, _ = validate_sql(sql_query, table_name, columns, get_table_dialect(table_name))
+    except SQLValidationError as e:
+        if e.repairable:
+            return None
+        return {
+            "messages": [AIMessage(content=f"Error: {e}")],
+            "error": str(e),
+            "retry_count": state.get("retry_count", 0) + 1
+        }
+    return {
+        "messages": [AIMessage(content=f"```sqlite\n{checked_sql}\n```")],
+        "error": ""
+    }
+
+
+def build_validation_prompt(state: State):
+    last_msg = state["messages"][-1]
+    match = re.search(r"```sqlite\s+(.*?)```", last_msg.content, re.DOTALL)
+    sql_query = with_previous(match.group(1).strip(), state)
     table_name = state.get("table_name", "")
     schema = get_table_schema(table_name)
 
@@ -93,14 +412,34 @@ Rules:
 SELECT ...
 ```
 """
-    prompt = ChatPromptTemplate.from_messages([
+    return ChatPromptTemplate.from_messages([
         ("system", system_prompt),
         ("human", "Validate and fix the SQL if needed.")
     ])
-    checked = (prompt | llm).invoke(state)
+
+
+# The LLM validator is only a fallback for SQL the local validator cannot repair
+def query_validation_node(state: State):
+    update = validate_locally(state)
+    if update is not None:
+        return update
+    checked = (build_validation_prompt(state) | llm).invoke(state)
     return {
         "messages": [checked],
-        "error": ""
+        "error": "",
+        "token_usage": usage_of("query_validation", checked)
+    }
+
+
+async def aquery_validation_node(state: State):
+    update = await asyncio.to_thread(validate_locally, state)
+    if update is not None:
+        return update
+    checked = await (build_validation_prompt(state) | llm).ainvoke(state)
+    return {
+        "messages": [checked],
+        "error": "",
+        "token_usage": usage_of("query_validation", checked)
     }
 
 
@@ -122,43 +461,166 @@ def execute_query_node(state: State):
 
     sql_query = match.group(1).strip()
     formatted_sql = sqlparse.format(sql_query, reindent=True, keyword_case="upper")
+    speculation = state.get("speculation") or {}
+    fallbacks = [sql for sql in state.get("candidates") or [] if sql != sql_query]
 
     try:
-        result = db_query_tool(sql_query)
+        sql_query, result, execution, fallbacks_used = run_candidates(state, [sql_query] + fallbacks)
+        formatted_sql = sqlparse.format(sql_query, reindent=True, keyword_case="upper")
+        index_advisor.observe(sql_query, state.get("table_name", ""))
+        if speculation:
+            execution["speculation"] = {**speculation, "fallbacks_used": fallbacks_used}
+            record_speculation("fallback" if fallbacks_used else "first_choice")
+            if fallbacks_used:
+                record_retry_prevented("execution")
+        # Rows live in state["raw_result"]; the message only notes what ran so the
+        # history sent on retries does not grow with the result set.
         return {
-            "messages": [AIMessage(content=json.dumps({"sql": formatted_sql, "result": result}))],
+            "messages": [AIMessage(content=json.dumps({
+                "sql": formatted_sql, "row_count": len(result), "truncated": execution["truncated"]
+            }))],
             "sql_query": formatted_sql,
             "raw_result": result,
-            "error": ""
+            "execution": execution,
+            "error": "",
+            "candidates": [],
+            "speculation": {},
+            **remember_result(state, sql_query, result, execution)
         }
     except Exception as e:
+        if speculation:
+            record_speculation("all_failed")
         return {
             "messages": [AIMessage(content=f"Error: SQL execution failed: {str(e)}")],
             "sql_query": formatted_sql,
             "raw_result": [],
             "error": str(e),
+            "candidates": [],
+            "speculation": {},
             "retry_count": state.get("retry_count", 0) + 1
         }
 
 
+def run_candidates(state: State, candidates: list) -> tuple:
+    """Run the first candidate that succeeds — (sql, rows, execution, fallbacks used).
+
+    Filter literals are grounded in the table's stored values first
+    (backend.value_index). Raises the first candidate's error if none
+    succeeds, so a repair sees the chosen SQL's error.
+    """
+    first_error = None
+    for tried, sql in enumerate(candidates):
+        sql, grounded = ground_sql(sql, state.get("table_name", ""))
+        try:
+            result, execution = run_query(state, sql)
+        except Exception as e:
+            first_error = first_error or e
+            continue
+        execution["rewrites"] = grounded + execution["rewrites"]
+        return sql, result, execution, tried
+    raise first_error
+
+
+async def aexecute_query_node(state: State):
+    # SQLite is synchronous — run it on a worker thread so the loop stays free
+    return await asyncio.to_thread(execute_query_node, state)
+
+
+# ─────────────────────────────────────────
+# NODE 3b — Repair failed SQL
+# ─────────────────────────────────────────
+# Runs after a failed execution instead of regenerating from the whole
+# message history: it only sees the schema, the failed SQL and the SQLite
+# error, so the prompt stays the same size on every attempt.
+def repair_locally(state: State):
+    """Deterministic fix for common SQLite errors — returns the node update or None."""
+    table_name = state.get("table_name", "")
+    if get_table_dialect(table_name) != "sqlite":
+        return None   # the fixes are keyed on SQLite's error messages
+    columns = [name for name, _ in get_table_columns(table_name)]
+    repaired = repair_sql(state.get("sql_query", ""), state.get("error", ""), table_name, columns)
+    if repaired is None:
+        return None
+    sql, fix = repaired
+    logger.info("repair_query: local fix (%s)", fix)
+    return {
+        "messages": [AIMessage(content=f"```sqlite\n{sql}\n```")],
+        "error": ""
+    }
+
+
+def build_repair_prompt(state: State):
+    schema = get_table_schema(state.get("table_name", "")).replace("{", "{{").replace("}", "}}")
+    dialect = ENGINE_DIALECTS[get_table_dialect(state.get("table_name", ""))]
+    sql_escaped = state.get("sql_query", "").replace("{", "{{").replace("}", "}}")
+    error_escaped = state.get("error", "").replace("{", "{{").replace("}", "}}")
+
+    system_prompt = f"""You fix {dialect} queries that failed to run.
+
+Schema:
+{schema}
+
+Failed SQL:
+{sql_escaped}
+
+{dialect} error:
+{error_escaped}
+
+Rules:
+- Change only what the error requires; keep the query's intent.
+- Use only the table and columns in the schema, and {dialect} functions.
+- Return ONLY the corrected SQL wrapped in:
+```sqlite
+SELECT ...
+```
+"""
+    return ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        ("human", "Fix the SQL.")
+    ])
+
+
+def repair_update(message) -> dict:
+    return {
+        "messages": [message],
+        "error": "",
+        "token_usage": usage_of("repair_query", message)
+    }
+
+
+def repair_query_node(state: State):
+    update = repair_locally(state)
+    if update is not None:
+        return update
+    return repair_update((build_repair_prompt(state) | llm).invoke({}))
+
+
+async def arepair_query_node(state: State):
+    update = await asyncio.to_thread(repair_locally, state)
+    if update is not None:
+        return update
+    return repair_update(await (build_repair_prompt(state) | llm).ainvoke({}))
+
+
 # ─────────────────────────────────────────
 # NODE 4 — Natural Language Output
 # ─────────────────────────────────────────
-def final_output_node(state: State):
-    last_msg = state["messages"][-1]
-    try:
-        parsed = json.loads(last_msg.content)
-        sql_query = parsed.get("sql", "")
-        result = parsed.get("result", [])
-    except Exception:
-        return {
-            "messages": [AIMessage(content="Could not parse results.")],
-            "nl_answer": "Could not parse SQL execution result.",
-            "error": "Parse error in final output."
+def build_final_output_prompt(state: State):
+    """Return (prompt, digest, None), or (None, None, update) when there is nothing to summarize."""
+    if state.get("error") or not state.get("sql_query"):
+        return None, None, {
+            "messages": [AIMessage(content="Could not summarize results.")],
+            "nl_answer": "",
+            "error": state.get("error") or "No SQL result to summarize."
         }
 
-    result_str = json.dumps(result, indent=2).replace("{", "{{").replace("}", "}}")
-    sql_escaped = sql_query.replace("{", "{{").replace("}", "}}")
+    digest = build_result_digest(state.get("raw_result") or [])
+    result_str = digest["text"].replace("{", "{{").replace("}", "}}")
+    sql_escaped = state["sql_query"].replace("{", "{{").replace("}", "}}")
+    result_label = "Result" if digest["mode"] == "rows" else "Result digest (per-column aggregates and a row sample)"
+    execution = state.get("execution") or {}
+    if execution.get("truncated"):
+        result_label += f" — truncated to the first {execution['row_cap']} rows, mention this"
 
     system_prompt = f"""You are a helpful data analyst assistant.
 
@@ -167,7 +629,7 @@ Convert the following SQL query and its result into a clear, concise natural lan
 SQL Query:
 {sql_escaped}
 
-Result:
+{result_label}:
 {result_str}
 
 Rules:
@@ -180,19 +642,49 @@ Rules:
         ("system", system_prompt),
         ("human", "Summarize the result in natural language.")
     ])
-    message = (prompt | llm).invoke(state)
+    return prompt, digest, None
+
+
+def final_output_update(digest: dict, message) -> dict:
+    usage = usage_of("final_output", message)
+    logger.info(
+        "final_output: %s encoding, ~%d result tokens, %s prompt tokens",
+        digest["mode"], digest["tokens"], usage[0]["input_tokens"] if usage else "n/a"
+    )
     return {
         "messages": [message],
         "nl_answer": message.content,
-        "error": ""
+        "error": "",
+        "digest": {"mode": digest["mode"], "estimated_tokens": digest["tokens"]},
+        "token_usage": usage
     }
 
 
+def final_output_node(state: State):
+    prompt, digest, update = build_final_output_prompt(state)
+    if prompt is None:
+        return update
+    message = (prompt | llm).invoke(state)
+    return final_output_update(digest, message)
+
+
+async def afinal_output_node(state: State):
+    prompt, digest, update = build_final_output_prompt(state)
+    if prompt is None:
+        return update
+    message = await (prompt | llm).ainvoke(state)
+    return final_output_update(digest, message)
+
+
 # ─────────────────────────────────────────
 # CONDITIONAL EDGE
 # ─────────────────────────────────────────
+def after_fast_path(state: State) -> Literal["query_gen", "__end__"]:
+    return "__end__" if state.get("path") == "fast_path" else "query_gen"
+
+
 def should_continue(state: State) -> Literal["query_gen", "execute_query", "__end__"]:
-    if state.get("retry_count", 0) >= 3:
+    if state.get("retry_count", 0) >= MAX_RETRIES:
         return "__end__"
 
     last_msg = state["messages"][-1]
@@ -205,9 +697,14 @@ def should_continue(state: State) -> Literal["query_gen", "execute_query", "__en
     if not match:
         return "query_gen"
 
-    sql = match.group(1).strip().lower()
-    forbidden = ["insert", "update", "delete", "drop", "alter"]
-    if any(word in sql for word in forbidden):
+    if not is_read_only(match.group(1).strip(), get_table_dialect(state.get("table_name", ""))):
         return "query_gen"
 
-    return "execute_query"
\ No newline at end of file
+    return "execute_query"
+
+
+def after_execute(state: State) -> Literal["repair_query", "final_output"]:
+    """Send failed executions to the repair node while retries remain."""
+    if state.get("error") and state.get("sql_query") and state.get("retry_count", 0) < MAX_RETRIES:
+        return "repair_query"
+    return "final_output"
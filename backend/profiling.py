@@ -0,0 +1,191 @@
+import os
+import re
+import uuid
+import time
+import sqlite3
+import threading
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+from backend.config import (
+    PROFILE_WORKERS,
+    PROFILE_CACHE_DIR,
+    PROFILE_SAMPLE_THRESHOLD,
+    PROFILE_MAX_JOBS
+)
+from backend.database import table_store, get_table_version
+from backend.catalog import catalog, get_table_dialect
+from backend.columnar import parquet_path, quote_literal
+
+PROFILE_MODES = ("auto", "full", "minimal")
+
+
+# ─────────────────────────────────────────
+# WORKER (runs in a separate process)
+# ─────────────────────────────────────────
+def load_frame(source: str, table_name: str, sample_step: int, engine: str = "sqlite"):
+    """Read a table (SQLite database or Parquet file at `source`) into a DataFrame."""
+    if engine == "duckdb":
+        import duckdb
+        relation = f"read_parquet({quote_literal(source)}, file_row_number=true)"
+        where = f"WHERE file_row_number % {sample_step} = 0" if sample_step > 1 else ""
+        conn = duckdb.connect()
+        try:
+            return conn.execute(f"SELECT * EXCLUDE (file_row_number) FROM {relation} {where};").df()
+        finally:
+            conn.close()
+
+    import pandas as pd
+    conn = sqlite3.connect(source)
+    conn.execute("PRAGMA query_only=ON;")
+    if sample_step > 1:
+        # Systematic rowid sample — deterministic, so cached reports stay reproducible
+        sql = f'SELECT * FROM "{table_name}" WHERE rowid % {sample_step} = 0'
+    else:
+        sql = f'SELECT * FROM "{table_name}"'
+    try:
+        return pd.read_sql_query(sql, conn)
+    finally:
+        conn.close()
+
+
+def render_report(source: str, table_name: str, mode: str, sample_step: int, out_path: str,
+                  engine: str = "sqlite") -> str:
+    """Build the ydata-profiling HTML for one table and write it to `out_path`."""
+    os.environ["PANDAS_PROFILING_NO_STREAMLIT"] = "1"
+    from ydata_profiling import ProfileReport
+
+    df = load_frame(source, table_name, sample_step, engine)
+
+    title = f"Dataset Report — {table_name}"
+    if sample_step > 1:
+        title += f" (1 in {sample_step} rows sampled)"
+
+    if mode == "minimal":
+        profile = ProfileReport(df, title=title, minimal=True, progress_bar=False)
+    else:
+        profile = ProfileReport(
+            df,
+            title=title,
+            explorative=True,
+            correlations={"pearson": {"calculate": True}, "spearman": {"calculate": True}},
+            missing_diagrams={"bar": True, "matrix": True},
+            duplicates={"head": 10},
+            progress_bar=False
+        )
+
+    # Write the HTML string ourselves (Windows-safe) and rename into place
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(profile.to_html())
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+# ─────────────────────────────────────────
+# JOBS
+# ─────────────────────────────────────────
+class ProfileJobs:
+    """Run profiling reports in a process pool, cached on disk by table version.
+
+    Requests for the same table, version and mode share one job.
+    """
+
+    def __init__(self, workers: int = PROFILE_WORKERS, cache_dir: str = PROFILE_CACHE_DIR):
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self._executor = None
+        self._jobs = {}          # job_id -> job dict
+        self._by_key = {}        # (table, version, mode, step) -> job_id
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def plan(self, table_name: str, mode: str) -> tuple:
+        """Resolve 'auto' and the sampling step from the table's row count."""
+        info = catalog.get(table_name)
+        if info is None:
+            raise ValueError(f"Table '{table_name}' does not exist.")
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'. Use one of: {', '.join(PROFILE_MODES)}.")
+        large = info.row_count > PROFILE_SAMPLE_THRESHOLD
+        if mode == "auto":
+            mode = "minimal" if large else "full"
+        step = -(-info.row_count // PROFILE_SAMPLE_THRESHOLD) if large else 1
+        return mode, step
+
+    def report_path(self, table_name: str, version: str, mode: str, step: int) -> str:
+        return os.path.join(self.cache_dir, f"{table_name}_{version or 'v0'}_{mode}_{step}.html")
+
+    def submit(self, table_name: str, mode: str = "auto") -> dict:
+        """Start (or join) a profiling job and return its status."""
+        if importlib.util.find_spec("ydata_profiling") is None:
+            raise ImportError("ydata-profiling not installed. Run: pip install ydata-profiling")
+        mode, step = self.plan(table_name, mode)
+        version = get_table_version(table_name)
+        key = (table_name, version, mode, step)
+        path = self.report_path(*key)
+
+        with self._lock:
+            job_id = self._by_key.get(key)
+            if job_id in self._jobs and self._jobs[job_id]["status"] != "failed":
+                return dict(self._jobs[job_id])
+
+            job = {
+                "job_id":     uuid.uuid4().hex,
+                "table_name": table_name,
+                "mode":       mode,
+                "sampled":    step > 1,
+                "status":     "running",
+                "error":      "",
+                "created_at": time.time(),
+                "path":       path
+            }
+            self._jobs[job["job_id"]] = job
+            self._by_key[key] = job["job_id"]
+            self._trim()
+
+            if os.path.exists(path):
+                job["status"] = "done"
+                return dict(job)
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._remove_stale(table_name, version)
+            engine = get_table_dialect(table_name)
+            source = parquet_path(table_name) if engine == "duckdb" else table_store.path(table_name)
+            future = self._pool().submit(render_report, source, table_name, mode, step, path, engine)
+            future.add_done_callback(lambda f, job=job: self._finish(job, f))
+            return dict(job)
+
+    def _remove_stale(self, table_name: str, version: str):
+        """Delete cached reports for older versions of this table."""
+        pattern = re.compile(rf"^{re.escape(table_name)}_(v0|[0-9a-f]{{32}})_(full|minimal)_\d+\.html$")
+        for name in os.listdir(self.cache_dir):
+            match = pattern.match(name)
+            if match and match.group(1) != (version or "v0"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def _finish(self, job: dict, future):
+        with self._lock:
+            error = future.exception()
+            job["status"] = "failed" if error else "done"
+            job["error"] = str(error) if error else ""
+
+    def _trim(self):
+        # Forget the oldest finished jobs beyond PROFILE_MAX_JOBS (reports stay on disk)
+        finished = [j for j in self._jobs.values() if j["status"] != "running"]
+        for job in sorted(finished, key=lambda j: j["created_at"])[:max(0, len(self._jobs) - PROFILE_MAX_JOBS)]:
+            del self._jobs[job["job_id"]]
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+profile_jobs = ProfileJobs()
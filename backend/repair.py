@@ -0,0 +1,100 @@
+import re
+import sqlglot
+from sqlglot import exp
+from backend.validator import closest_name
+
+# Dialects whose functions the LLM tends to borrow; sqlglot rewrites them for SQLite
+FOREIGN_DIALECTS = ("mysql", "postgres", "tsql")
+DATE_PARTS = {exp.Year: "%Y", exp.Month: "%m", exp.Day: "%d"}
+
+
+# ─────────────────────────────────────────
+# DETERMINISTIC FIXES (keyed on the SQLite error)
+# ─────────────────────────────────────────
+def fix_no_such_column(tree, name: str, columns: list) -> str | None:
+    """Rename a near-miss column, or turn a bare word compared to a column into a string."""
+    qualifier, _, name = name.rpartition(".")
+    targets = [c for c in tree.find_all(exp.Column)
+               if c.name.lower() == name.lower() and (not qualifier or c.table.lower() == qualifier.lower())]
+    if not targets:
+        return None
+
+    match = closest_name(name, columns)
+    if match:
+        for column in targets:
+            column.set("this", exp.to_identifier(match, quoted=True))
+        return f"column {name} -> {match}"
+
+    # WHERE status = Success → WHERE status = 'Success'
+    fixed = False
+    for column in targets:
+        comparison = column.parent
+        if not isinstance(comparison, (exp.EQ, exp.NEQ, exp.Like, exp.In)) or comparison.this is column:
+            continue
+        if isinstance(comparison.this, (exp.Column, exp.Upper, exp.Lower)):
+            column.replace(exp.Literal.string(column.name))
+            fixed = True
+    return f"{name} -> string literal" if fixed else None
+
+
+def fix_ambiguous_column(tree, name: str) -> str | None:
+    """Qualify an ambiguous column with the first table in FROM."""
+    source = tree.find(exp.From)
+    table = source.find(exp.Table) if source else None
+    if table is None:
+        return None
+    fixed = False
+    for column in tree.find_all(exp.Column):
+        if column.name.lower() == name.lower() and not column.table:
+            column.set("table", exp.to_identifier(table.alias_or_name))
+            fixed = True
+    return f"column {name} -> {table.alias_or_name}.{name}" if fixed else None
+
+
+def fix_no_such_function(sql: str, tree, name: str) -> tuple | None:
+    """Translate YEAR()/MONTH()/DAY() and other foreign functions to SQLite."""
+    for node_type, fmt in DATE_PARTS.items():
+        for node in list(tree.find_all(node_type)):
+            node.replace(exp.Cast(
+                this=exp.Anonymous(this="STRFTIME", expressions=[exp.Literal.string(fmt), node.this.copy()]),
+                to=exp.DataType.build("INTEGER")
+            ))
+    candidate = tree.sql(dialect="sqlite")
+    if name.lower() + "(" not in candidate.lower():
+        return candidate, f"function {name} -> SQLite equivalent"
+
+    for dialect in FOREIGN_DIALECTS:
+        try:
+            candidate = sqlglot.transpile(sql, read=dialect, write="sqlite")[0]
+        except Exception:
+            continue
+        if name.lower() + "(" not in candidate.lower():
+            return candidate, f"function {name} -> SQLite equivalent ({dialect})"
+    return None
+
+
+def repair_sql(sql: str, error: str, table_name: str, columns: list) -> tuple | None:
+    """Try a deterministic fix for a SQLite error. Returns (sql, fix) or None."""
+    try:
+        tree = sqlglot.parse_one(sql, read="sqlite")
+    except sqlglot.errors.ParseError:
+        return None
+
+    if match := re.search(r"no such column: (\S+)", error):
+        fix = fix_no_such_column(tree, match.group(1), columns)
+    elif match := re.search(r"ambiguous column name: (\S+)", error):
+        fix = fix_ambiguous_column(tree, match.group(1))
+    elif match := re.search(r"no such table: (\S+)", error):
+        fix = None
+        for table in tree.find_all(exp.Table):
+            if table.name.lower() == match.group(1).lower():
+                table.set("this", exp.to_identifier(table_name, quoted=True))
+                fix = f"table {match.group(1)} -> {table_name}"
+    elif match := re.search(r"no such function: (\S+)", error):
+        return fix_no_such_function(sql, tree, match.group(1))
+    else:
+        fix = None
+
+    if fix is None:
+        return None
+    return tree.sql(dialect="sqlite"), fix
@@ -0,0 +1,240 @@
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import sqlglot
+from sqlglot import exp
+from langgraph.checkpoint.memory import InMemorySaver
+from backend.config import SESSION_MAX_SESSIONS, SESSION_MAX_RESULT_ROWS
+from backend.columnar import quote_ident
+
+# Name follow-up SQL uses for the previous answer of the session
+PREVIOUS_RESULT = "previous_result"
+
+
+# ─────────────────────────────────────────
+# FOLLOW-UP SQL
+# ─────────────────────────────────────────
+# A follow-up reads previous_result. It is composed into one self-contained
+# query over the base table (the previous SQL as a CTE), which is what is
+# validated, shown and remembered; when the previous rows are still held in
+# memory, the part after the CTE runs on them instead.
+def reads_previous(tree) -> bool:
+    return any(table.name.lower() == PREVIOUS_RESULT for table in tree.find_all(exp.Table))
+
+
+def previous_cte(tree):
+    with_ = tree.args.get("with_")
+    if with_ is None:
+        return None
+    return next((cte for cte in with_.expressions if cte.alias_or_name.lower() == PREVIOUS_RESULT), None)
+
+
+def compose_followup(sql: str, previous_sql: str, dialect: str = "sqlite") -> str:
+    """Define previous_result as a CTE of `previous_sql` if `sql` reads it."""
+    try:
+        tree = sqlglot.parse_one(sql, read=dialect)
+        previous = sqlglot.parse_one(previous_sql, read=dialect)
+    except sqlglot.errors.ParseError:
+        return sql
+    if not reads_previous(tree) or previous_cte(tree) is not None:
+        return sql
+    cte = exp.CTE(this=previous, alias=exp.TableAlias(this=exp.to_identifier(PREVIOUS_RESULT)))
+    with_ = tree.args.get("with_")
+    tree.set("with_", exp.With(expressions=[cte] + (list(with_.expressions) if with_ else [])))
+    return tree.sql(dialect=dialect)
+
+
+def split_followup(sql: str, previous_sql: str, table_name: str, dialect: str = "sqlite") -> str | None:
+    """The SQL to run on a materialized previous result, or None if `sql` needs the base table."""
+    try:
+        tree = sqlglot.parse_one(sql, read=dialect)
+        previous = sqlglot.parse_one(previous_sql, read=dialect)
+    except sqlglot.errors.ParseError:
+        return None
+    cte = previous_cte(tree)
+    if cte is None or cte.this.sql(dialect=dialect) != previous.sql(dialect=dialect):
+        return None
+    remaining = [other for other in tree.args["with_"].expressions if other is not cte]
+    tree.set("with_", exp.With(expressions=remaining) if remaining else None)
+    if any(table.name.lower() == table_name.lower() for table in tree.find_all(exp.Table)):
+        return None
+    return tree.sql(dialect="sqlite")
+
+
+# ─────────────────────────────────────────
+# CHECKPOINTS
+# ─────────────────────────────────────────
+class SessionCheckpointer(InMemorySaver):
+    """LangGraph's in-memory checkpointer, trimmed to each session's newest checkpoint.
+
+    A session only resumes from its latest state, so the per-step history
+    InMemorySaver keeps would only grow.
+    """
+
+    def keep_latest(self, thread_id: str):
+        for checkpoint_ns, saved in list(self.storage.get(thread_id, {}).items()):
+            if not saved:
+                continue
+            latest = max(saved)
+            versions = self.serde.loads_typed(saved[latest][0])["channel_versions"]
+            for checkpoint_id in [c for c in saved if c != latest]:
+                del saved[checkpoint_id]
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            stale = [key for key in self.blobs
+                     if key[:2] == (thread_id, checkpoint_ns) and versions.get(key[2]) != key[3]]
+            for key in stale:
+                del self.blobs[key]
+
+
+# ─────────────────────────────────────────
+# SESSIONS
+# ─────────────────────────────────────────
+class MaterializedResult:
+    """A session's previous result, copied into a private in-memory SQLite table."""
+
+    def __init__(self, sql: str, version: str, rows: list):
+        self.sql = sql
+        self.version = version
+        self.row_count = len(rows)
+        self.retired = False
+        self.closed = False
+        self.lock = threading.Lock()   # one query at a time on the connection
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        columns = list(rows[0])
+        self.conn.execute(f"CREATE TABLE {PREVIOUS_RESULT} ({', '.join(quote_ident(c) for c in columns)});")
+        self.conn.executemany(
+            f"INSERT INTO {PREVIOUS_RESULT} VALUES ({', '.join('?' for _ in columns)});",
+            (tuple(row.values()) for row in rows)
+        )
+        self.conn.commit()
+
+    @contextmanager
+    def use(self):
+        """Hold the connection for one query; yields None once it is closed."""
+        try:
+            with self.lock:
+                yield None if self.closed else self.conn
+        finally:
+            if self.retired:
+                self.retire()
+
+    def retire(self):
+        """Close the connection now, or after the query holding it (never blocks).
+
+        Whoever releases the lock after `retired` is set closes it, so
+        eviction from the event loop never waits for a running query.
+        """
+        self.retired = True
+        if self.lock.acquire(blocking=False):
+            try:
+                if not self.closed:
+                    self.closed = True
+                    self.conn.close()
+            finally:
+                self.lock.release()
+
+
+class SessionStore:
+    """Conversation sessions for follow-up questions, bounded in memory.
+
+    Each session is a LangGraph thread in `checkpointer`; the least recently
+    used sessions beyond `max_sessions` are forgotten. Complete previous
+    results are materialized for follow-ups, and the least recently used
+    ones are dropped once they hold more than `max_result_rows` rows in total
+    (a follow-up then recomputes the previous result from the base table).
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, max_result_rows: int = SESSION_MAX_RESULT_ROWS):
+        self.max_sessions = max_sessions
+        self.max_result_rows = max_result_rows
+        self.checkpointer = SessionCheckpointer()
+        self._sessions = OrderedDict()   # session_id -> asyncio.Lock, least recently used first
+        self._results = OrderedDict()    # session_id -> MaterializedResult, least recently used first
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def config(session_id: str) -> dict:
+        return {"configurable": {"thread_id": session_id}}
+
+    def open(self, session_id: str) -> asyncio.Lock:
+        """Mark a session used and return its lock (one question at a time per session).
+
+        Sessions with a question running are never evicted, so the store can
+        briefly hold more than `max_sessions`.
+        """
+        lock = self._sessions.pop(session_id, None) or asyncio.Lock()
+        self._sessions[session_id] = lock
+        idle = [other for other, other_lock in self._sessions.items()
+                if other != session_id and not other_lock.locked()]
+        for other in idle[:len(self._sessions) - self.max_sessions]:
+            self.forget(other)
+        return lock
+
+    def finish(self, session_id: str):
+        """Drop the checkpoints of a finished question except the newest."""
+        self.checkpointer.keep_latest(session_id)
+
+    async def end(self, session_id: str) -> bool:
+        """Forget a session once its running question (if any) is done."""
+        lock = self._sessions.get(session_id)
+        if lock is None:
+            return self.forget(session_id)
+        async with lock:
+            return self.forget(session_id)
+
+    def forget(self, session_id: str) -> bool:
+        known = self._sessions.pop(session_id, None) is not None
+        self.checkpointer.delete_thread(session_id)
+        self._drop_result(session_id)
+        return known
+
+    # ── Materialized results ─────────────────────────
+    def materialize(self, session_id: str, sql: str, version: str, rows: list) -> bool:
+        """Keep `rows` (the complete result of `sql`) for the session's next question."""
+        self._drop_result(session_id)
+        if not rows or len(rows) > self.max_result_rows:
+            return False
+        result = MaterializedResult(sql, version, rows)
+        evicted = []
+        with self._lock:
+            self._results[session_id] = result
+            self._rows += result.row_count
+            while self._rows > self.max_result_rows:
+                evicted.append(self._results.popitem(last=False)[1])
+                self._rows -= evicted[-1].row_count
+        for old in evicted:
+            old.retire()
+        return True
+
+    def result(self, session_id: str, sql: str, version: str) -> MaterializedResult | None:
+        """The materialized result of `sql` at table `version`, if still held."""
+        with self._lock:
+            result = self._results.get(session_id)
+            if result is None or result.sql != sql or result.version != version:
+                return None
+            self._results.move_to_end(session_id)
+            return result
+
+    def _drop_result(self, session_id: str):
+        with self._lock:
+            result = self._results.pop(session_id, None)
+            if result is not None:
+                self._rows -= result.row_count
+        if result is not None:
+            result.retire()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions":             len(self._sessions),
+                "max_sessions":         self.max_sessions,
+                "materialized_results": len(self._results),
+                "materialized_rows":    self._rows,
+                "max_result_rows":      self.max_result_rows
+            }
+
+
+session_store = SessionStore()
@@ -0,0 +1,324 @@
+import time
+import sqlite3
+import sqlglot
+from sqlglot import exp
+from backend.config import SUMMARIES_ENABLED, SUMMARY_MAX_GROUPS
+from backend.database import table_store
+from backend.catalog import catalog
+from backend.columnar import quote_ident, quote_literal, SAMPLE_SCAN_ROWS
+
+# Side tables kept inside each table's own database file, so they are written
+# in the same transaction as the rows they describe
+SUMMARY_PREFIX = "__summary_"
+VALUES_TABLE   = "__summary_values"
+META_TABLE     = "__summary_meta"
+
+NUMERIC_TYPES = ("INTEGER", "REAL", "BOOLEAN")                 # get SUM (and so AVG)
+GROUP_TYPES   = ("TEXT", "BOOLEAN", "INTEGER", "DATE", "")     # may get group-by summaries
+AGGREGATES    = (exp.Count, exp.Sum, exp.Avg, exp.Min, exp.Max)
+UNSUPPORTED   = ("with_", "joins", "where", "distinct", "laterals", "qualify", "windows", "pivots", "connect")
+
+
+# ─────────────────────────────────────────
+# BUILDING
+# ─────────────────────────────────────────
+# One row per (group_column, group_value, measure). group_column '' is the
+# whole table; measure '' carries the row count, other measures are columns.
+def ensure_tables(conn):
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {VALUES_TABLE} (group_column TEXT, group_value, measure TEXT, "
+        "row_count INTEGER, non_null INTEGER, total, low, high);"
+    )
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (version TEXT, built_at REAL);")
+
+
+def table_columns(conn, table_name: str) -> list:
+    return [(row[1], row[2].upper()) for row in conn.execute(f"PRAGMA table_info({quote_ident(table_name)});")]
+
+
+def built_version(conn) -> str:
+    """Data version the stored summaries describe ('' if there are none)."""
+    try:
+        row = conn.execute(f"SELECT version FROM {META_TABLE};").fetchone()
+    except sqlite3.OperationalError:
+        return ""
+    return row[0] if row else ""
+
+
+def group_candidates(conn, table_name: str, columns: list) -> list:
+    """Columns with few distinct values among the first SAMPLE_SCAN_ROWS rows."""
+    found = []
+    for name, col_type in columns:
+        if col_type not in GROUP_TYPES:
+            continue
+        distinct = conn.execute(
+            f"SELECT COUNT(DISTINCT {quote_ident(name)}) FROM "
+            f"(SELECT {quote_ident(name)} FROM {quote_ident(table_name)} LIMIT ?);",
+            (SAMPLE_SCAN_ROWS,)
+        ).fetchone()[0]
+        if distinct <= SUMMARY_MAX_GROUPS:
+            found.append(name)
+    return found
+
+
+def summary_rows(conn, table_name: str, columns: list, groups: list, after_rowid: int | None = None) -> list:
+    """Aggregate the table (or only rows past `after_rowid`) into summary rows."""
+    table = quote_ident(table_name)
+    where = "" if after_rowid is None else f" WHERE rowid > {int(after_rowid)}"
+
+    def measures(cols):
+        parts = []
+        for name, col_type in cols:
+            col = quote_ident(name)
+            total = f"SUM({col})" if col_type in NUMERIC_TYPES else "NULL"
+            parts.append(f", COUNT({col}), {total}, MIN({col}), MAX({col})")
+        return "".join(parts)
+
+    def expand(group, value, count, stats, cols):
+        rows = [(group, value, "", count, count, None, None, None)]
+        rows += [(group, value, name, count, *stats[4 * i:4 * i + 4]) for i, (name, _) in enumerate(cols)]
+        return rows
+
+    row = conn.execute(f"SELECT COUNT(*){measures(columns)} FROM {table}{where};").fetchone()
+    rows = expand("", None, row[0], row[1:], columns)
+
+    numeric = [(name, col_type) for name, col_type in columns if col_type in NUMERIC_TYPES]
+    for group in groups:
+        result = conn.execute(
+            f"SELECT {quote_ident(group)}, COUNT(*){measures(numeric)} FROM {table}{where} "
+            f"GROUP BY {quote_ident(group)} LIMIT ?;",
+            (SUMMARY_MAX_GROUPS + 1,)
+        ).fetchall()
+        if len(result) > SUMMARY_MAX_GROUPS:
+            continue
+        for value, count, *stats in result:
+            rows += expand(group, value, count, stats, numeric)
+    return rows
+
+
+def store(conn, rows: list, version: str, merge: bool = False):
+    """Replace (or merge `rows` into) the stored summaries and stamp them with `version`."""
+    ensure_tables(conn)
+    if not merge:
+        conn.execute(f"DELETE FROM {VALUES_TABLE};")
+    conn.executemany(f"INSERT INTO {VALUES_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?);", rows)
+    if merge:
+        # Collapse old and new rows per key — SQLite's own SUM/MIN/MAX keep
+        # NULL handling and cross-type ordering identical to the originals
+        merged = conn.execute(
+            "SELECT group_column, group_value, measure, SUM(row_count), SUM(non_null), "
+            f"SUM(total), MIN(low), MAX(high) FROM {VALUES_TABLE} "
+            "GROUP BY group_column, group_value, measure;"
+        ).fetchall()
+        conn.execute(f"DELETE FROM {VALUES_TABLE};")
+        conn.executemany(f"INSERT INTO {VALUES_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?);", merged)
+        # A group column that grew past the limit loses its summaries
+        conn.execute(
+            f"DELETE FROM {VALUES_TABLE} WHERE group_column IN (SELECT group_column FROM {VALUES_TABLE} "
+            "WHERE group_column != '' AND measure = '' GROUP BY group_column HAVING COUNT(*) > ?);",
+            (SUMMARY_MAX_GROUPS,)
+        )
+    conn.execute(f"DELETE FROM {META_TABLE};")
+    conn.execute(f"INSERT INTO {META_TABLE} VALUES (?, ?);", (version, time.time()))
+
+
+def build(conn, table_name: str, version: str):
+    """Compute all summaries of a table from scratch (inside the caller's write)."""
+    columns = table_columns(conn, table_name)
+    store(conn, summary_rows(conn, table_name, columns, group_candidates(conn, table_name, columns)), version)
+
+
+def apply_load(conn, table_name: str, version: str, previous: str, after_rowid: int, rebuild: bool = False):
+    """Bring summaries up to date after an append/upsert, in the load's transaction.
+
+    Appended rows (rowid past `after_rowid`) are merged into summaries that
+    were current for `previous`; updates in place cannot be subtracted, so
+    `rebuild` (or missing/stale summaries) recomputes them.
+    """
+    if rebuild or built_version(conn) != previous:
+        build(conn, table_name, version)
+        return
+    groups = [row[0] for row in conn.execute(
+        f"SELECT DISTINCT group_column FROM {VALUES_TABLE} WHERE group_column != '';"
+    )]
+    rows = summary_rows(conn, table_name, table_columns(conn, table_name), groups, after_rowid)
+    store(conn, rows, version, merge=True)
+
+
+# ─────────────────────────────────────────
+# QUERY REWRITE
+# ─────────────────────────────────────────
+def aggregate_shape(tree, table_name: str) -> tuple | None:
+    """(source table node, group column name or '') for single-table aggregate SELECTs."""
+    if not isinstance(tree, exp.Select) or any(tree.args.get(k) for k in UNSUPPORTED):
+        return None
+    source = tree.args.get("from_")
+    if source is None or not isinstance(source.this, exp.Table) or source.this.name.lower() != table_name.lower():
+        return None
+    if any(node is not tree and isinstance(node, (exp.Select, exp.Subquery, exp.Window)) for node in tree.walk()):
+        return None
+
+    group = tree.args.get("group")
+    keys = list(group.expressions) if group else []
+    if len(keys) > 1 or (group and any(group.args.get(k) for k in ("rollup", "cube", "grouping_sets"))):
+        return None
+    if not keys:
+        # Without GROUP BY only aggregates make a single-row result
+        return (source.this, "") if tree.find(exp.AggFunc) else None
+    key = keys[0]
+    if isinstance(key, exp.Literal) and key.is_int and 0 < int(key.this) <= len(tree.expressions):
+        key = tree.expressions[int(key.this) - 1].unalias()   # GROUP BY 1
+    return (source.this, key.name) if isinstance(key, exp.Column) else None
+
+
+def replacement(agg, columns: dict, available: set) -> tuple | None:
+    """(summary expression SQL, measure) standing in for one aggregate call."""
+    arg = agg.this
+    if isinstance(agg, exp.Count) and (isinstance(arg, exp.Star) or (isinstance(arg, exp.Literal) and arg.is_number)):
+        return "SUM(__rows)", ""
+    if not isinstance(arg, exp.Column) or arg.name not in columns:
+        return None
+    measure = arg.name
+    if measure not in available:
+        return None
+    i = list(columns).index(measure)
+    if isinstance(agg, exp.Count):
+        return f"SUM(__nn_{i})", measure
+    if isinstance(agg, (exp.Sum, exp.Avg)) and columns[measure] not in NUMERIC_TYPES:
+        return None
+    if isinstance(agg, exp.Sum):
+        return f"SUM(__sum_{i})", measure
+    if isinstance(agg, exp.Avg):
+        return f"(CAST(SUM(__sum_{i}) AS REAL) / SUM(__nn_{i}))", measure
+    return (f"MIN(__min_{i})" if isinstance(agg, exp.Min) else f"MAX(__max_{i})"), measure
+
+
+def pivot_sql(group: str, measures: list, columns: dict) -> str:
+    """One row per group with the stored fields of the measures used."""
+    fields = [f"group_value AS {quote_ident(group or '__group')}",
+              "MAX(CASE WHEN measure = '' THEN row_count END) AS __rows"]
+    for measure in measures:
+        i = list(columns).index(measure)
+        for stored, alias in (("non_null", "nn"), ("total", "sum"), ("low", "min"), ("high", "max")):
+            fields.append(f"MAX(CASE WHEN measure = {quote_literal(measure)} THEN {stored} END) AS __{alias}_{i}")
+    return (f"SELECT {', '.join(fields)} FROM {VALUES_TABLE} "
+            f"WHERE group_column = {quote_literal(group)} GROUP BY group_value")
+
+
+def rewrite(conn, sql: str, table_name: str) -> str | None:
+    """Rewrite an aggregate query to read the table's summaries, or None.
+
+    Handles COUNT/SUM/AVG/MIN/MAX over plain columns with no WHERE, either
+    over the whole table or grouped by one summarized column; HAVING, ORDER
+    BY, LIMIT and expressions around the aggregates are kept. Summaries are
+    used only when stamped with the table's current data version.
+    """
+    if not SUMMARIES_ENABLED:
+        return None
+    info = catalog.get(table_name)
+    if info is None or info.engine != "sqlite":
+        return None
+    try:
+        tree = sqlglot.parse_one(sql, read="sqlite")
+    except sqlglot.errors.ParseError:
+        return None
+    shape = aggregate_shape(tree, table_name)
+    if shape is None or built_version(conn) != info.version:
+        return None
+    source, group = shape
+    columns = {name: col_type.upper() for name, col_type in info.columns}
+    available = {row[0] for row in conn.execute(
+        f"SELECT DISTINCT measure FROM {VALUES_TABLE} WHERE group_column = ?;", (group,)
+    )}
+    if "" not in available:
+        return None
+
+    # SQLite names unaliased result columns after their source text — keep those names
+    inner = sql.strip().rstrip(";")
+    names = [d[0] for d in conn.execute(f"SELECT * FROM ({inner}) WHERE 0;").description]
+    if len(names) != len(tree.expressions):
+        return None
+
+    used = []
+    for agg in list(tree.find_all(exp.AggFunc)):
+        found = replacement(agg, columns, available) if isinstance(agg, AGGREGATES) else None
+        if found is None:
+            return None
+        expression, measure = found
+        agg.replace(sqlglot.parse_one(expression, read="sqlite"))
+        if measure and measure not in used:
+            used.append(measure)
+
+    aliases = {e.alias.lower() for e in tree.expressions if isinstance(e, exp.Alias)}
+    for column in tree.find_all(exp.Column):
+        name = column.name.lower()
+        if not name.startswith("__") and name != group.lower() and (column.table or name not in aliases):
+            return None   # a bare column that is not the group key
+
+    tree.set("expressions", [e if isinstance(e, exp.Alias) else exp.alias_(e, name, quoted=True)
+                             for e, name in zip(tree.expressions, names)])
+    pivot = sqlglot.parse_one(pivot_sql(group, used, columns), read="sqlite")
+    source.replace(pivot.subquery(source.alias_or_name))
+    return tree.sql(dialect="sqlite")
+
+
+# ─────────────────────────────────────────
+# ADMIN
+# ─────────────────────────────────────────
+def status(table_name: str) -> dict:
+    info = catalog.get(table_name)
+    if info is None:
+        raise ValueError(f"Table '{table_name}' does not exist.")
+    if info.engine != "sqlite":
+        return {"table_name": table_name, "current": False, "groups": [], "reason": "not a SQLite table"}
+    with table_store.reader(table_name) as conn:
+        version = built_version(conn)
+        groups = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT group_column FROM {VALUES_TABLE} WHERE group_column != '' ORDER BY 1;"
+        )] if version else []
+        built_at = conn.execute(f"SELECT built_at FROM {META_TABLE};").fetchone()[0] if version else None
+    return {"table_name": table_name, "current": bool(version) and version == info.version,
+            "groups": groups, "built_at": built_at}
+
+
+def rebuild(table_name: str) -> dict:
+    """Recompute a table's summaries (e.g. after a migration or with them disabled at load time)."""
+    info = catalog.get(table_name)
+    if info is None or info.engine != "sqlite":
+        raise ValueError(f"Summaries exist for SQLite tables only; '{table_name}' is not one.")
+    with table_store.writer(table_name) as conn:
+        build(conn, table_name, info.version)
+    return status(table_name)
+
+
+def verify(sql: str, table_name: str) -> dict:
+    """Run a query both directly and from the summaries and compare the results.
+
+    Rows are compared in order when the query has an ORDER BY, as multisets
+    otherwise; result column names must match too.
+    """
+    with table_store.reader(table_name) as conn:
+        rewritten = rewrite(conn, sql, table_name)
+        if rewritten is None:
+            return {"rewritten": False, "summary_sql": None}
+
+        def fetch(query):
+            started = time.perf_counter()
+            cursor = conn.execute(query)
+            rows = cursor.fetchall()
+            return [d[0] for d in cursor.description], rows, round((time.perf_counter() - started) * 1000, 2)
+
+        names, original, original_ms = fetch(sql)
+        summary_names, summary, summary_ms = fetch(rewritten)
+
+    ordered = sqlglot.parse_one(sql, read="sqlite").args.get("order") is not None
+    same_rows = original == summary if ordered else sorted(map(repr, original)) == sorted(map(repr, summary))
+    return {
+        "rewritten":   True,
+        "summary_sql": rewritten,
+        "identical":   same_rows and names == summary_names,
+        "row_count":   len(original),
+        "original_ms": original_ms,
+        "summary_ms":  summary_ms,
+        **({} if same_rows else {"original": original[:5], "summary": summary[:5]})
+    }
@@ -1,27 +1,280 @@
 import pandas as pd
 import sqlite3
+import gzip
+import json
+import time
 import re
-from backend.database import DB_PATH, table_exists
+import os
+from backend.config import CSV_CHUNK_ROWS, DEFAULT_ENGINE, SUMMARIES_ENABLED, VALUE_INDEX_ENABLED
+from backend.database import table_store, table_exists, bump_table_version, new_version, set_table_engine
+from backend.columnar import ENGINES, parquet_store, parquet_path, LOW_CARDINALITY
+from backend.catalog import catalog
+from backend.inference import infer_column, load_type, normalize_chunk
+from backend.metrics import record_ingestion
+from backend import summaries, value_index
 
+LOAD_MODES = ("create", "append", "upsert")
 
-def save_csv_to_db(file, table_name: str):
-    """Read CSV file and save as a SQLite table."""
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def open_upload_stream(file, filename: str = ""):
+    """Wrap an upload in an on-the-fly decompressor if it is .gz or .zst."""
+    head = file.read(4)
+    file.seek(0)
+    name = (filename or "").lower()
+
+    if head.startswith(GZIP_MAGIC) or name.endswith(".gz"):
+        return gzip.GzipFile(fileobj=file, mode="rb")
+
+    if head.startswith(ZSTD_MAGIC) or name.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("Zstandard uploads need the 'zstandard' package. Run: pip install zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(file)
+
+    return file
+
+
+def clean_column_names(columns) -> list:
+    """Clean column names — remove spaces, special chars."""
+    return [re.sub(r'[^a-zA-Z0-9_]', '_', str(col).strip()) for col in columns]
+
+
+def chunk_rows(chunk: pd.DataFrame):
+    """Yield plain Python tuples with NaN mapped to NULL."""
+    chunk = chunk.astype(object).where(chunk.notna(), None)
+    return chunk.itertuples(index=False, name=None)
+
+
+def save_csv_to_db(file, table_name: str, filename: str = "", engine: str = DEFAULT_ENGINE,
+                   mode: str = "create", key: str = "") -> dict:
+    """Stream a (optionally compressed) CSV into a table of the chosen engine.
+
+    SQLite tables are loaded in fixed-size chunks with inferred, normalized
+    column types; DuckDB tables are converted to Parquet by DuckDB's own
+    CSV reader. mode="append"/"upsert" loads into an existing table instead
+    (see load_into_table).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Use one of: {', '.join(ENGINES)}.")
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Unknown load mode '{mode}'. Use one of: {', '.join(LOAD_MODES)}.")
 
     # Validate table name
     if not re.match(r'^[a-zA-Z0-9_]+$', table_name):
         raise ValueError("Table name can only contain letters, numbers, and underscores.")
+    for prefix in (summaries.SUMMARY_PREFIX, value_index.VALUE_INDEX_PREFIX):
+        if table_name.startswith(prefix):
+            raise ValueError(f"Table names starting with '{prefix}' are reserved.")
+
+    if mode != "create":
+        return load_into_table(file, table_name, filename, mode, key)
 
     # Check uniqueness
     if table_exists(table_name):
         raise ValueError(f"Table '{table_name}' already exists. Please choose a unique name.")
 
-    df = pd.read_csv(file)
+    started = time.perf_counter()
+    stream = open_upload_stream(file, filename)
+    if engine == "duckdb":
+        row_count = parquet_store.ingest(stream, table_name, clean_column_names)
+        if table_store.exists(table_name):   # a SQLite upload claimed the name meanwhile
+            parquet_store.drop(table_name)
+            raise ValueError(f"Table '{table_name}' already exists. Please choose a unique name.")
+        set_table_engine(table_name, engine)
+        return finish_ingestion(table_name, row_count, started)
+
+    # Read raw strings; backend.inference decides and normalizes the types
+    reader = pd.read_csv(stream, chunksize=CSV_CHUNK_ROWS, dtype=str)
+
+    row_count = 0
+    columns = None
+    version = new_version()
+    # Built in a private file and linked into place — no other table is locked
+    with table_store.create(table_name) as conn:
+        for chunk in reader:
+            if columns is None:
+                # The first chunk is the sample the declared types are inferred
+                # from; every chunk (this one included) is validated against them.
+                columns = clean_column_names(chunk.columns)
+                types = [infer_column(chunk[src]) for src in chunk.columns]
+                declared = [col_type for col_type, _ in types]
+                col_defs = ", ".join(f'"{col}" {col_type}' for col, col_type in zip(columns, declared))
+                conn.execute(f'CREATE TABLE "{table_name}" ({col_defs});')
+                placeholders = ", ".join("?" for _ in columns)
+                insert_sql = f'INSERT INTO "{table_name}" VALUES ({placeholders});'
+
+            typed, types = normalize_chunk(chunk, types)
+            conn.executemany(insert_sql, chunk_rows(typed))
+            row_count += len(chunk)
+
+        if columns is None:
+            raise ValueError("CSV file has no columns.")
+        retype_table(conn, table_name, columns, declared, [col_type for col_type, _ in types],
+                     lambda positions: read_raw_columns(file, filename, positions))
+        if SUMMARIES_ENABLED:
+            summaries.build(conn, table_name, version)
+        if VALUE_INDEX_ENABLED:
+            value_index.build(conn, table_name, version)
+    if os.path.exists(parquet_path(table_name)):   # a DuckDB upload claimed the name meanwhile
+        table_store.drop(table_name)
+        raise ValueError(f"Table '{table_name}' already exists. Please choose a unique name.")
+
+    return finish_ingestion(table_name, row_count, started, version)
+
+
+def read_raw_columns(file, filename: str, positions: list):
+    """Re-read the raw strings of the columns at `positions`, in chunks."""
+    file.seek(0)
+    return pd.read_csv(open_upload_stream(file, filename), chunksize=CSV_CHUNK_ROWS, dtype=str, usecols=positions)
+
+
+def retype_table(conn, table_name: str, columns: list, declared: list, final: list, raw_chunks):
+    """Rebuild the table if later chunks widened a column past its declared type.
+
+    A column widened to REAL keeps its values (cast); one widened to TEXT is
+    reloaded from the raw CSV strings (`raw_chunks(positions)` re-reads the
+    upload), so none of its rows keeps a value normalized for the old type.
+    """
+    if declared == final:
+        return
+    widened = [i for i, (old, col_type) in enumerate(zip(declared, final)) if col_type == "TEXT" != old]
+    if widened:
+        # Rows were inserted in CSV order into a new table: row i has rowid i + 1
+        raw_table = f'temp."{table_name}__raw"'
+        raw_defs = ", ".join(f'"{columns[i]}" TEXT' for i in widened)
+        conn.execute(f'CREATE TABLE {raw_table} (row INTEGER PRIMARY KEY, {raw_defs});')
+        insert_raw = f'INSERT INTO {raw_table} VALUES (?, {", ".join("?" for _ in widened)});'
+        rowid = 0
+        for chunk in raw_chunks(widened):
+            chunk.insert(0, "row", range(rowid + 1, rowid + len(chunk) + 1))
+            conn.executemany(insert_raw, chunk_rows(chunk))
+            rowid += len(chunk)
+
+    col_defs = ", ".join(f'"{col}" {col_type}' for col, col_type in zip(columns, final))
+    select = ", ".join(
+        f'r."{col}"' if i in widened else f'CAST(t."{col}" AS {col_type})' if col_type != old else f't."{col}"'
+        for i, (col, old, col_type) in enumerate(zip(columns, declared, final))
+    )
+    source = f'"{table_name}" t' + (f' JOIN {raw_table} r ON r.row = t.rowid' if widened else "")
+    conn.execute(f'CREATE TABLE "{table_name}__retyped" ({col_defs});')
+    conn.execute(f'INSERT INTO "{table_name}__retyped" SELECT {select} FROM {source} ORDER BY t.rowid;')
+    conn.execute(f'DROP TABLE "{table_name}";')
+    conn.execute(f'ALTER TABLE "{table_name}__retyped" RENAME TO "{table_name}";')
+    if widened:
+        conn.execute(f'DROP TABLE {raw_table};')
+
+
+def finish_ingestion(table_name: str, row_count: int, started: float, version: str = "") -> dict:
+    bump_table_version(table_name, version)
+    catalog.refresh(table_name)
+    return ingestion_stats(row_count, started)
+
+
+def ingestion_stats(row_count: int, started: float, inserted: int | None = None, updated: int = 0) -> dict:
+    elapsed = time.perf_counter() - started
+    record_ingestion(row_count, elapsed)
+    return {
+        "rows":         row_count,
+        "inserted":     row_count if inserted is None else inserted,
+        "updated":      updated,
+        "seconds":      round(elapsed, 3),
+        "rows_per_sec": round(row_count / elapsed) if elapsed > 0 else row_count
+    }
+
+
+# ─────────────────────────────────────────
+# INCREMENTAL LOADS (append / upsert)
+# ─────────────────────────────────────────
+def ensure_unique_key(conn, table_name: str, key: str):
+    """Create the unique index ON CONFLICT needs (once per table and key)."""
+    try:
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "ux_key_{table_name}_{key}" ON "{table_name}" ("{key}");')
+    except sqlite3.IntegrityError:
+        raise ValueError(f"Column '{key}' has duplicate values in '{table_name}' and cannot be an upsert key.")
+
+
+def count_existing_keys(conn, table_name: str, key: str, keys: list) -> int:
+    return conn.execute(
+        f'SELECT COUNT(*) FROM "{table_name}" WHERE "{key}" IN (SELECT value FROM json_each(?));',
+        (json.dumps(keys, default=str),)
+    ).fetchone()[0]
+
+
+def load_into_table(file, table_name: str, filename: str, mode: str, key: str) -> dict:
+    """Append or upsert a CSV into an existing SQLite table.
+
+    The upload's columns must be a subset of the table's (missing ones load
+    as NULL) and its values must fit the declared types; nothing is written
+    otherwise. Upserts go through a unique index on `key` with
+    INSERT ... ON CONFLICT, the last row winning for keys repeated in the
+    file. The catalog stats, the table's summaries and its value index are
+    updated from the loaded rows instead of rescanning the table (an upsert
+    that updated rows rebuilds them).
+    """
+    info = catalog.get(table_name)
+    if info is None:
+        raise ValueError(f"Table '{table_name}' does not exist.")
+    if info.engine != "sqlite":
+        raise ValueError("Append and upsert are supported for SQLite tables only.")
+    declared = dict(info.columns)
+    if mode == "upsert" and key not in declared:
+        raise ValueError(f"Upsert needs a key column of '{table_name}'. Use one of: {', '.join(declared)}.")
+
+    started = time.perf_counter()
+    reader = pd.read_csv(open_upload_stream(file, filename), chunksize=CSV_CHUNK_ROWS, dtype=str)
+    inserted = updated = 0
+    new_values = {col: set(values) for col, values in info.samples.items()}   # merged, so the cap sees the total
+    columns = None
+    version = new_version()
+    with table_store.writer(table_name) as conn:
+        if mode == "upsert":
+            ensure_unique_key(conn, table_name, key)
+        after_rowid = conn.execute(f'SELECT MAX(rowid) FROM "{table_name}";').fetchone()[0]
+        for chunk in reader:
+            if columns is None:
+                columns = clean_column_names(chunk.columns)
+                unknown = [col for col in columns if col not in declared]
+                if unknown:
+                    raise ValueError(f"Columns not in '{table_name}': {', '.join(unknown)}.")
+                if mode == "upsert" and key not in columns:
+                    raise ValueError(f"The upload has no '{key}' column to upsert on.")
+                types = [load_type(col, declared[col], chunk[src]) for col, src in zip(columns, chunk.columns)]
+                col_list = ", ".join(f'"{col}"' for col in columns)
+                placeholders = ", ".join("?" for _ in columns)
+                insert_sql = f'INSERT INTO "{table_name}" ({col_list}) VALUES ({placeholders})'
+                if mode == "upsert":
+                    updates = ", ".join(f'"{col}"=excluded."{col}"' for col in columns if col != key)
+                    insert_sql += f' ON CONFLICT("{key}") DO ' + (f"UPDATE SET {updates}" if updates else "NOTHING")
 
-    # Clean column names — remove spaces, special chars
-    df.columns = [re.sub(r'[^a-zA-Z0-9_]', '_', col.strip()) for col in df.columns]
+            chunk.columns = columns
+            typed, _ = normalize_chunk(chunk, types, widen=False)
+            typed.columns = columns
+            if mode == "upsert":
+                typed = typed[typed[key].isna() | ~typed[key].duplicated(keep="last")]
+                existing = count_existing_keys(conn, table_name, key, typed[key].dropna().tolist())
+                updated += existing
+                inserted += len(typed) - existing
+            else:
+                inserted += len(typed)
+            try:
+                conn.executemany(insert_sql + ";", chunk_rows(typed))
+            except sqlite3.IntegrityError as e:
+                raise ValueError(f"Rows conflict with a unique index of '{table_name}': {e}")
+            for col, values in new_values.items():
+                if col in typed and len(values) <= LOW_CARDINALITY:
+                    values.update(str(v) for v in typed[col].dropna().unique()[:LOW_CARDINALITY + 1])
 
-    conn = sqlite3.connect(DB_PATH)
-    df.to_sql(table_name, conn, if_exists="fail", index=False)
-    conn.close()
+        if columns is None:
+            raise ValueError("CSV file has no columns.")
+        if SUMMARIES_ENABLED:
+            summaries.apply_load(conn, table_name, version, info.version, after_rowid or 0, rebuild=updated > 0)
+        if VALUE_INDEX_ENABLED:
+            value_index.apply_load(conn, table_name, version, info.version, after_rowid or 0, rebuild=updated > 0)
 
-    return len(df)
\ No newline at end of file
+    bump_table_version(table_name, version)
+    catalog.apply_load(table_name, version, inserted, new_values)
+    return ingestion_stats(inserted + updated, started, inserted, updated)
@@ -0,0 +1,133 @@
+import re
+import sqlglot
+from sqlglot import exp
+
+FORBIDDEN_NODES = (
+    exp.Insert, exp.Update, exp.Delete, exp.Drop, exp.Alter,
+    exp.Create, exp.Command, exp.Pragma,
+)
+QUERY_NODES = (exp.Select, exp.Union, exp.Intersect, exp.Except)
+
+
+class SQLValidationError(ValueError):
+    """Raised when SQL cannot be accepted as-is or repaired locally.
+
+    `repairable` is False for SQL that must be regenerated (writes, multiple
+    statements) and True when an LLM might still be able to fix it.
+    """
+
+    def __init__(self, message: str, repairable: bool = True):
+        super().__init__(message)
+        self.repairable = repairable
+
+
+# ─────────────────────────────────────────
+# FUZZY NAME MATCHING
+# ─────────────────────────────────────────
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)
+            ))
+        previous = current
+    return previous[-1]
+
+
+def closest_name(name: str, candidates) -> str | None:
+    """Return the single closest candidate within a length-scaled edit budget."""
+    key = re.sub(r"[^a-z0-9]", "", name.lower())
+    budget = max(1, min(3, len(key) // 3))
+    scored = sorted(
+        (edit_distance(key, re.sub(r"[^a-z0-9]", "", c.lower())), c) for c in candidates
+    )
+    if not scored or scored[0][0] > budget:
+        return None
+    if len(scored) > 1 and scored[1][0] == scored[0][0]:
+        return None   # ambiguous — let the caller decide
+    return scored[0][1]
+
+
+# ─────────────────────────────────────────
+# VALIDATION
+# ─────────────────────────────────────────
+def parse_single(sql: str, dialect: str = "sqlite"):
+    try:
+        statements = [s for s in sqlglot.parse(sql, read=dialect) if s is not None]
+    except sqlglot.errors.ParseError as e:
+        raise SQLValidationError(f"Could not parse SQL: {e}")
+    if len(statements) != 1:
+        raise SQLValidationError("Only a single SQL statement is allowed.", repairable=False)
+    return statements[0]
+
+
+def is_read_only(sql: str, dialect: str = "sqlite") -> bool:
+    """True if `sql` is a single query with no write/DDL anywhere in it."""
+    try:
+        tree = parse_single(sql, dialect)
+    except SQLValidationError:
+        # Unparseable — fall back to a whole-word keyword check
+        return not re.search(r"\b(insert|update|delete|drop|alter|create|replace|attach|pragma)\b", sql, re.I)
+    return isinstance(tree, QUERY_NODES) and not any(tree.find_all(*FORBIDDEN_NODES))
+
+
+def validate_sql(sql: str, table_name: str, columns: list, dialect: str = "sqlite") -> tuple[str, list]:
+    """Check that `sql` is one SELECT over `table_name` using known `columns`.
+
+    Near-miss table/column names are repaired by edit distance. Returns
+    (sql, fixes) — the original text when nothing changed — or raises
+    SQLValidationError. `dialect` is the sqlglot dialect of the table's engine.
+    """
+    tree = parse_single(sql, dialect)
+    if not isinstance(tree, QUERY_NODES) or any(tree.find_all(*FORBIDDEN_NODES)):
+        raise SQLValidationError("Only SELECT statements are allowed.", repairable=False)
+
+    fixes = []
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+
+    # Tables — only the selected table (or CTEs built on it)
+    table_aliases = {table_name.lower()}
+    for table in tree.find_all(exp.Table):
+        name = table.name
+        if name.lower() in cte_names or name.lower() == table_name.lower():
+            pass
+        elif closest_name(name, [table_name]):
+            fixes.append(f"table {name} -> {table_name}")
+            table.set("this", exp.to_identifier(table_name, quoted=True))
+        else:
+            raise SQLValidationError(f"Only table '{table_name}' may be queried, found '{name}'.", repairable=False)
+        if table.alias:
+            table_aliases.add(table.alias.lower())
+
+    # Columns — real columns, output aliases and derived (CTE/subquery) names
+    known = {c.lower(): c for c in columns}
+    aliases = {a.alias.lower() for a in tree.find_all(exp.Alias)}
+    for table_alias in tree.find_all(exp.TableAlias):
+        aliases |= {col.name.lower() for col in table_alias.columns}
+    for column in list(tree.find_all(exp.Column)):
+        name = column.name
+        if column.table and column.table.lower() not in table_aliases | cte_names:
+            raise SQLValidationError(f"Unknown table reference '{column.table}'.")
+        if not name or name.lower() in known or name.lower() in aliases:
+            continue
+        match = closest_name(name, columns)
+        if match:
+            fixes.append(f"column {name} -> {match}")
+            column.set("this", exp.to_identifier(match, quoted=column.this.quoted))
+        elif column.this.quoted and not column.table and dialect == "sqlite":
+            # SQLite reads an unknown "double-quoted" name as a string literal
+            fixes.append(f'"{name}" -> string literal')
+            column.replace(exp.Literal.string(name))
+        elif not cte_names:
+            raise SQLValidationError(f"Unknown column '{name}' in table '{table_name}'.")
+
+    if not fixes:
+        return sql, fixes
+    return tree.sql(dialect=dialect), fixes
@@ -0,0 +1,338 @@
+import re
+import time
+import sqlite3
+import logging
+from difflib import SequenceMatcher
+import sqlglot
+from sqlglot import exp
+from backend.config import VALUE_INDEX_ENABLED, VALUE_INDEX_MAX_DISTINCT
+from backend.database import table_store
+from backend.catalog import catalog
+from backend.columnar import quote_ident
+
+logger = logging.getLogger(__name__)
+
+# Side tables kept inside each table's own database file (like the summaries):
+# the distinct values of its text columns in an FTS5 trigram index.
+VALUE_INDEX_PREFIX = "__values_"
+INDEX_TABLE   = "__values_index"
+COLUMNS_TABLE = "__values_columns"
+META_TABLE    = "__values_meta"
+
+TEXT_TYPES     = ("TEXT", "")
+MAX_IN_VALUES  = 5      # a literal matching more stored values than this is left alone
+MIN_SIMILARITY = 0.75   # difflib ratio for a misspelt literal to be replaced
+MIN_CONTAINED  = 3      # shortest stored value matched inside a longer literal
+HINTS_PER_WORD = 5      # a question word matching more values than this is too vague to hint
+MAX_HINTS      = 10
+CASE_FUNCS     = {exp.Upper: str.upper, exp.Lower: str.lower, None: lambda text: text}
+
+# Words never looked up for prompt hints
+STOPWORDS = {
+    "the", "and", "for", "with", "what", "which", "who", "whom", "how", "many", "much", "show", "list",
+    "all", "are", "was", "were", "from", "per", "each", "total", "average", "count", "number", "top",
+    "than", "more", "less", "over", "under", "between", "only", "this", "that", "there", "have", "has",
+    "get", "give", "find", "where", "when", "does", "did", "any", "not", "most", "least", "sum", "rows",
+}
+
+
+# ─────────────────────────────────────────
+# BUILDING
+# ─────────────────────────────────────────
+def ensure_tables(conn):
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5(col UNINDEXED, value, tokenize='trigram');")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {COLUMNS_TABLE} (name TEXT PRIMARY KEY, distinct_values INTEGER);")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (version TEXT, built_at REAL);")
+
+
+def built_version(conn) -> str:
+    """Data version the stored index describes ('' if there is none)."""
+    try:
+        row = conn.execute(f"SELECT version FROM {META_TABLE};").fetchone()
+    except sqlite3.OperationalError:
+        return ""
+    return row[0] if row else ""
+
+
+def index_column(conn, table_name: str, column: str, after_rowid: int | None = None) -> int | None:
+    """Add the column's distinct values (or those of rows past `after_rowid`) to the index.
+
+    Returns the column's distinct value count, or None (and nothing indexed)
+    once it has more than VALUE_INDEX_MAX_DISTINCT.
+    """
+    col = quote_ident(column)
+    table = quote_ident(table_name)
+    if after_rowid is None:
+        # DISTINCT with a LIMIT stops early on high-cardinality columns (ids, free text)
+        distinct = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT DISTINCT {col} FROM {table} WHERE {col} IS NOT NULL LIMIT ?);",
+            (VALUE_INDEX_MAX_DISTINCT + 1,)
+        ).fetchone()[0]
+        if distinct > VALUE_INDEX_MAX_DISTINCT:
+            return None
+    where = "" if after_rowid is None else f" AND rowid > {int(after_rowid)}"
+    conn.execute(
+        f"INSERT INTO {INDEX_TABLE} (col, value) SELECT ?, v FROM (SELECT DISTINCT CAST({col} AS TEXT) AS v "
+        f"FROM {table} WHERE {col} IS NOT NULL{where} "
+        f"EXCEPT SELECT value FROM {INDEX_TABLE} WHERE col = ? LIMIT ?);",
+        (column, column, VALUE_INDEX_MAX_DISTINCT + 1)
+    )
+    count = conn.execute(f"SELECT COUNT(*) FROM {INDEX_TABLE} WHERE col = ?;", (column,)).fetchone()[0]
+    if count > VALUE_INDEX_MAX_DISTINCT:
+        conn.execute(f"DELETE FROM {INDEX_TABLE} WHERE col = ?;", (column,))
+        return None
+    return count
+
+
+def stamp(conn, version: str):
+    conn.execute(f"DELETE FROM {META_TABLE};")
+    conn.execute(f"INSERT INTO {META_TABLE} VALUES (?, ?);", (version, time.time()))
+
+
+def build(conn, table_name: str, version: str):
+    """Index the distinct values of the table's text columns from scratch (inside the caller's write).
+
+    Does nothing if this SQLite build lacks FTS5's trigram tokenizer.
+    """
+    try:
+        ensure_tables(conn)
+    except sqlite3.OperationalError as e:
+        logger.warning("value index unavailable (%s) — literals are not grounded", e)
+        return
+    conn.execute(f"DELETE FROM {INDEX_TABLE};")
+    conn.execute(f"DELETE FROM {COLUMNS_TABLE};")
+    for row in conn.execute(f"PRAGMA table_info({quote_ident(table_name)});").fetchall():
+        if row[2].upper() not in TEXT_TYPES:
+            continue
+        count = index_column(conn, table_name, row[1])
+        if count is not None:
+            conn.execute(f"INSERT INTO {COLUMNS_TABLE} VALUES (?, ?);", (row[1], count))
+    stamp(conn, version)
+
+
+def apply_load(conn, table_name: str, version: str, previous: str, after_rowid: int, rebuild: bool = False):
+    """Bring the index up to date after an append/upsert, in the load's transaction.
+
+    Values of appended rows are added to an index that was current for
+    `previous`; updated rows may have dropped values, so `rebuild` (or a
+    missing/stale index) rebuilds it.
+    """
+    if rebuild or built_version(conn) != previous:
+        build(conn, table_name, version)
+        return
+    for (column,) in conn.execute(f"SELECT name FROM {COLUMNS_TABLE};").fetchall():
+        count = index_column(conn, table_name, column, after_rowid)
+        if count is None:
+            conn.execute(f"DELETE FROM {COLUMNS_TABLE} WHERE name = ?;", (column,))
+        else:
+            conn.execute(f"UPDATE {COLUMNS_TABLE} SET distinct_values = ? WHERE name = ?;", (count, column))
+    stamp(conn, version)
+
+
+# ─────────────────────────────────────────
+# LOOKUP
+# ─────────────────────────────────────────
+def current_columns(conn, table_name: str) -> set:
+    """Indexed columns, if the index is stamped with the table's current data version."""
+    info = catalog.get(table_name)
+    if info is None or built_version(conn) != info.version:
+        return set()
+    return {row[0] for row in conn.execute(f"SELECT name FROM {COLUMNS_TABLE};")}
+
+
+def fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def has_value(conn, column: str, text: str, column_func, literal_func) -> bool:
+    """True if column_func(some stored value) = literal_func(text), as the filter compares them."""
+    target = CASE_FUNCS[literal_func](text)
+    # LIKE is case-insensitive (and % or _ in the text only widen it); the exact comparison is below
+    rows = conn.execute(f"SELECT value FROM {INDEX_TABLE} WHERE col = ? AND value LIKE ?;", (column, text))
+    return any(CASE_FUNCS[column_func](value) == target for (value,) in rows)
+
+
+def closest_values(conn, column: str, text: str) -> list:
+    """Stored values of `column` that `text` most likely means, best first (empty if unclear).
+
+    Values containing the text ("Hdfc" → "HDFC Bank") or contained in it
+    ("UPI payment" → "UPI") win over merely similar spellings; more than
+    MAX_IN_VALUES such matches is too ambiguous to rewrite.
+    """
+    needle = text.upper()
+    if len(text) >= 3:
+        # Any shared trigram makes a candidate; bm25 ranks those sharing the most
+        trigrams = {text[i:i + 3] for i in range(len(text) - 2)}
+        candidates = conn.execute(
+            f"SELECT value FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH ? AND col = ? ORDER BY rank LIMIT 50;",
+            (" OR ".join(fts_phrase(t) for t in sorted(trigrams)), column)
+        ).fetchall()
+    else:
+        candidates = conn.execute(f"SELECT value FROM {INDEX_TABLE} WHERE col = ? LIMIT 1000;", (column,)).fetchall()
+    values = [value for (value,) in candidates]
+
+    contained = [v for v in values if needle in v.upper() or (len(v) >= MIN_CONTAINED and v.upper() in needle)]
+    if contained:
+        if len(contained) > MAX_IN_VALUES:
+            return []
+        return sorted(contained, key=lambda v: abs(len(v) - len(text)))
+
+    scored = sorted(((SequenceMatcher(None, needle, v.upper()).ratio(), v) for v in values), reverse=True)
+    if not scored or scored[0][0] < MIN_SIMILARITY:
+        return []
+    return [v for score, v in scored if score >= scored[0][0] - 0.01][:MAX_IN_VALUES]
+
+
+# ─────────────────────────────────────────
+# GROUNDING
+# ─────────────────────────────────────────
+# Before a query runs, string literals compared with an indexed column —
+# col = 'x', UPPER(col) = 'X', col IN ('x', ...) — that match no stored
+# value are replaced by the closest stored values (one value, or an IN list).
+def compared_column(node, columns: set):
+    """(column name, case function) for `col`, `UPPER(col)` or `LOWER(col)` on an indexed column."""
+    func = type(node) if isinstance(node, (exp.Upper, exp.Lower)) else None
+    column = node.this if func else node
+    if isinstance(column, exp.Column) and column.name in columns:
+        return column.name, func
+    return None, None
+
+
+def literal_text(node) -> tuple:
+    """(string, case function) for `'x'`, `UPPER('x')` or `LOWER('x')`; (None, None) otherwise."""
+    func = type(node) if isinstance(node, (exp.Upper, exp.Lower)) else None
+    literal = node.this if func else node
+    if isinstance(literal, exp.Literal) and literal.is_string:
+        return literal.this, func
+    return None, None
+
+
+def grounded_values(conn, column: str, func, literal) -> tuple:
+    """(text, closest stored values) for a literal matching no stored value, else (text, None)."""
+    text, literal_func = literal_text(literal)
+    if text is None or has_value(conn, column, text, func, literal_func):
+        return text, None
+    return text, closest_values(conn, column, text) or None
+
+
+def as_literals(values: list, func) -> list:
+    """Stored values as literals under the column's case function, so they compare equal to it."""
+    return [func(this=exp.Literal.string(v)) if func else exp.Literal.string(v) for v in values]
+
+
+def match_note(text: str, values: list, column: str) -> str:
+    return f"matched '{text}' to {', '.join(repr(v) for v in values)} in {column}"
+
+
+def ground(conn, sql: str, table_name: str, dialect: str = "sqlite") -> tuple[str, list]:
+    """Return (sql, notes) with unmatched filter literals replaced by stored values."""
+    columns = current_columns(conn, table_name)
+    if not columns:
+        return sql, []
+    try:
+        tree = sqlglot.parse_one(sql, read=dialect)
+    except sqlglot.errors.ParseError:
+        return sql, []
+
+    notes = []
+    for node in list(tree.find_all(exp.EQ, exp.In)):
+        if isinstance(node, exp.EQ):
+            for side, other in ((node.this, node.expression), (node.expression, node.this)):
+                column, func = compared_column(side, columns)
+                if column is None or literal_text(other)[0] is None:
+                    continue
+                text, values = grounded_values(conn, column, func, other)
+                if values is None:
+                    break
+                literals = as_literals(values, func)
+                replacement = (exp.EQ(this=side.copy(), expression=literals[0]) if len(literals) == 1
+                               else exp.In(this=side.copy(), expressions=literals))
+                node.replace(replacement)
+                notes.append(match_note(text, values, column))
+                break
+        elif node.args.get("expressions") and not node.args.get("query"):
+            column, func = compared_column(node.this, columns)
+            if column is None:
+                continue
+            kept, changed = [], False
+            for item in node.expressions:
+                text, values = grounded_values(conn, column, func, item)
+                if values is None:
+                    kept.append(item)
+                    continue
+                changed = True
+                kept += as_literals(values, func)
+                notes.append(match_note(text, values, column))
+            if changed:
+                unique = list({item.sql(): item for item in kept}.values())
+                node.set("expressions", unique)
+    if not notes:
+        return sql, []
+    return tree.sql(dialect=dialect), notes
+
+
+def ground_sql(sql: str, table_name: str) -> tuple[str, list]:
+    """ground() on the table's own connection; SQLite tables with a current index only."""
+    info = catalog.get(table_name)
+    if not VALUE_INDEX_ENABLED or info is None or info.engine != "sqlite":
+        return sql, []
+    with table_store.reader(table_name) as conn:
+        try:
+            return ground(conn, sql, table_name)
+        except sqlite3.OperationalError:
+            return sql, []   # no index in this file
+
+
+# ─────────────────────────────────────────
+# PROMPT HINTS
+# ─────────────────────────────────────────
+def question_hints(question: str, table_name: str) -> list:
+    """[(column, value)] of stored values containing a word of the question."""
+    info = catalog.get(table_name)
+    if not VALUE_INDEX_ENABLED or info is None or info.engine != "sqlite":
+        return []
+    names = {name.lower() for name, _ in info.columns} | {table_name.lower()}
+    words = [w for w in dict.fromkeys(re.findall(r"[a-z0-9][a-z0-9&'.-]*[a-z0-9]", question.lower()))
+             if len(w) >= 3 and w not in STOPWORDS and w not in names and w.rstrip("s") not in names]
+    hints = []
+    with table_store.reader(table_name) as conn:
+        try:
+            if not current_columns(conn, table_name):
+                return []
+            for word in words:
+                rows = conn.execute(
+                    f"SELECT col, value FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH ? LIMIT ?;",
+                    (fts_phrase(word), HINTS_PER_WORD + 1)
+                ).fetchall()
+                if len(rows) <= HINTS_PER_WORD:
+                    hints += [row for row in rows if row not in hints]
+        except sqlite3.OperationalError:
+            return []
+    return hints[:MAX_HINTS]
+
+
+# ─────────────────────────────────────────
+# ADMIN
+# ─────────────────────────────────────────
+def status(table_name: str) -> dict:
+    info = catalog.get(table_name)
+    if info is None:
+        raise ValueError(f"Table '{table_name}' does not exist.")
+    if info.engine != "sqlite":
+        return {"table_name": table_name, "current": False, "columns": {}, "reason": "not a SQLite table"}
+    with table_store.reader(table_name) as conn:
+        version = built_version(conn)
+        columns = dict(conn.execute(f"SELECT name, distinct_values FROM {COLUMNS_TABLE} ORDER BY name;")) if version else {}
+        built_at = conn.execute(f"SELECT built_at FROM {META_TABLE};").fetchone()[0] if version else None
+    return {"table_name": table_name, "current": bool(version) and version == info.version,
+            "columns": columns, "built_at": built_at}
+
+
+def rebuild(table_name: str) -> dict:
+    """Rebuild a table's value index (e.g. for tables loaded before it existed)."""
+    info = catalog.get(table_name)
+    if info is None or info.engine != "sqlite":
+        raise ValueError(f"Value indexes exist for SQLite tables only; '{table_name}' is not one.")
+    with table_store.writer(table_name) as conn:
+        build(conn, table_name, info.version)
+    return status(table_name)
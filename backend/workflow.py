@@ -1,24 +1,50 @@
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import START, END, StateGraph
 from backend.nodes import (
     State,
+    fast_path_node,
+    afast_path_node,
     query_gen_node,
+    aquery_gen_node,
     query_validation_node,
+    aquery_validation_node,
     execute_query_node,
+    aexecute_query_node,
     final_output_node,
-    should_continue
+    afinal_output_node,
+    repair_query_node,
+    arepair_query_node,
+    after_fast_path,
+    should_continue,
+    after_execute
 )
+from backend.sessions import session_store
+from backend.metrics import instrument_node
+
+# Each node carries a sync and an async implementation — `invoke` uses the
+# former, `ainvoke` / `astream` the latter. Both are timed when metrics are on.
+def node(name: str, func, afunc) -> RunnableLambda:
+    func, afunc = instrument_node(name, func, afunc)
+    return RunnableLambda(func, afunc=afunc)
+
 
 workflow = StateGraph(State)
 
-workflow.add_node("query_gen",        query_gen_node)
-workflow.add_node("query_validation", query_validation_node)
-workflow.add_node("execute_query",    execute_query_node)
-workflow.add_node("final_output",     final_output_node)
+workflow.add_node("fast_path",        node("fast_path",        fast_path_node,        afast_path_node))
+workflow.add_node("query_gen",        node("query_gen",        query_gen_node,        aquery_gen_node))
+workflow.add_node("query_validation", node("query_validation", query_validation_node, aquery_validation_node))
+workflow.add_node("execute_query",    node("execute_query",    execute_query_node,    aexecute_query_node))
+workflow.add_node("repair_query",     node("repair_query",     repair_query_node,     arepair_query_node))
+workflow.add_node("final_output",     node("final_output",     final_output_node,     afinal_output_node))
 
-workflow.add_edge(START,              "query_gen")
+workflow.add_edge(START,              "fast_path")
+workflow.add_conditional_edges("fast_path", after_fast_path)
 workflow.add_edge("query_gen",        "query_validation")
 workflow.add_conditional_edges("query_validation", should_continue)
-workflow.add_edge("execute_query",    "final_output")
+workflow.add_conditional_edges("execute_query", after_execute)
+workflow.add_edge("repair_query",     "query_validation")
 workflow.add_edge("final_output",     END)
 
-app_graph = workflow.compile()
\ No newline at end of file
+app_graph = workflow.compile()
+# Same graph with state kept per session (thread_id = session ID) for follow-up questions
+session_graph = workflow.compile(checkpointer=session_store.checkpointer)
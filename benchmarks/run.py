@@ -0,0 +1,394 @@
+"""Offline benchmark suite.
+
+Runs against a throwaway database with the deterministic stub LLM, so no
+API key or network is needed:
+
+    python -m benchmarks.run --out bench.json
+    python -m benchmarks.run --out new.json --compare bench.json
+
+Covers CSV ingestion throughput by file size, db_query_tool latency by
+query shape, the same shapes on each storage engine (SQLite vs DuckDB over
+Parquet), single /ask latency per graph node, template questions answered
+by the LLM-free fast path, and /ask throughput under N concurrent clients against the FastAPI app (in-process, or a running
+server via --url).
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import statistics
+
+BENCH_TABLE = "bench"
+
+# Question → canned SQL returned by the stub LLM, one per query shape
+QUERY_SHAPES = {
+    "point_lookup": f'SELECT * FROM "{BENCH_TABLE}" WHERE id = 4242',
+    "text_filter":  f"SELECT * FROM \"{BENCH_TABLE}\" WHERE UPPER(status) = 'FAILED' LIMIT 50",
+    "aggregate":    f'SELECT COUNT(*) AS n, SUM(amount) AS total, AVG(amount) AS mean FROM "{BENCH_TABLE}"',
+    "group_by":     f'SELECT category, COUNT(*) AS n, SUM(amount) AS total FROM "{BENCH_TABLE}" GROUP BY category',
+    "order_limit":  f'SELECT * FROM "{BENCH_TABLE}" ORDER BY amount DESC LIMIT 10',
+    "like_scan":    f"SELECT * FROM \"{BENCH_TABLE}\" WHERE description LIKE '%delta%' LIMIT 50",
+}
+QUESTIONS = {f"benchmark question: {shape}": sql for shape, sql in QUERY_SHAPES.items()}
+
+# Template questions the fast path answers without the LLM, by intent
+FAST_PATH_QUESTIONS = {
+    "row_count":       "How many rows are there?",
+    "preview":         "Show the first 10 rows",
+    "aggregate_avg":   "What is the average amount?",
+    "distinct_values": "What are the distinct values of category?",
+    "count_by":        "Count by status",
+}
+
+CATEGORIES = ["food", "travel", "rent", "fuel", "shopping", "health", "utilities", "education"]
+STATUSES   = ["SUCCESS", "FAILED", "PENDING"]
+WORDS      = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+
+
+# ─────────────────────────────────────────
+# HELPERS
+# ─────────────────────────────────────────
+def make_csv(rows: int, seed: int = 7) -> bytes:
+    """Deterministic transactions-like CSV with numeric, date and text columns."""
+    rng = random.Random(seed)
+    out = io.StringIO()
+    out.write("id,date,category,amount,status,description\n")
+    for i in range(rows):
+        out.write(
+            f"{i},2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d},{rng.choice(CATEGORIES)},"
+            f"{rng.uniform(1, 5000):.2f},{rng.choice(STATUSES)},{rng.choice(WORDS)} {rng.choice(WORDS)}\n"
+        )
+    return out.getvalue().encode("utf-8")
+
+
+def summarize(samples: list) -> dict:
+    """Latency summary in milliseconds."""
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "n":       len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms":  round(pick(0.50) * 1000, 3),
+        "p95_ms":  round(pick(0.95) * 1000, 3),
+        "max_ms":  round(ordered[-1] * 1000, 3)
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+# ─────────────────────────────────────────
+# BENCHMARKS
+# ─────────────────────────────────────────
+def bench_ingestion(sizes: list) -> list:
+    from backend.utils import save_csv_to_db
+    from backend.database import drop_table
+
+    results = []
+    for rows in sizes:
+        data = make_csv(rows)
+        table = f"ingest_{rows}"
+        stats = save_csv_to_db(io.BytesIO(data), table)
+        results.append({
+            "rows":         rows,
+            "bytes":        len(data),
+            "seconds":      stats["seconds"],
+            "rows_per_sec": stats["rows_per_sec"],
+            "mb_per_sec":   round(len(data) / 1e6 / max(stats["seconds"], 1e-9), 2)
+        })
+        drop_table(table)
+    return results
+
+
+def bench_queries(repeat: int) -> dict:
+    from backend.database import db_query_tool
+
+    results = {}
+    for shape, sql in QUERY_SHAPES.items():
+        db_query_tool(sql, BENCH_TABLE)   # warm the page cache and statement cache
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = db_query_tool(sql, BENCH_TABLE)
+            samples.append(time.perf_counter() - started)
+        results[shape] = {**summarize(samples), "rows": len(rows)}
+    return results
+
+
+def bench_engines(engines: list, table_rows: int, repeat: int) -> dict:
+    """Ingest the same CSV into each engine and time every query shape on it."""
+    from backend.utils import save_csv_to_db
+    from backend.database import db_query_tool, drop_table
+
+    data = make_csv(table_rows)
+    results = {}
+    for engine in engines:
+        table = f"{BENCH_TABLE}_{engine}"
+        try:
+            stats = save_csv_to_db(io.BytesIO(data), table, engine=engine)
+        except ValueError as e:   # e.g. duckdb not installed
+            results[engine] = {"skipped": str(e)}
+            continue
+        shapes = {}
+        for shape, sql in QUERY_SHAPES.items():
+            sql = sql.replace(f'"{BENCH_TABLE}"', f'"{table}"')
+            db_query_tool(sql, table)
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                rows = db_query_tool(sql, table)
+                samples.append(time.perf_counter() - started)
+            shapes[shape] = {**summarize(samples), "rows": len(rows)}
+        results[engine] = {"ingest_rows_per_sec": stats["rows_per_sec"], "queries": shapes}
+        drop_table(table)
+    return results
+
+
+async def bench_fast_path(repeat: int) -> dict:
+    """End-to-end graph latency of template questions, and which path answered them."""
+    from langchain_core.messages import HumanMessage
+    from backend.workflow import app_graph
+
+    results = {}
+    for intent, question in FAST_PATH_QUESTIONS.items():
+        samples, path = [], ""
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = await app_graph.ainvoke({
+                "messages":    [HumanMessage(content=question)],
+                "table_name":  BENCH_TABLE,
+                "retry_count": 0
+            })
+            samples.append(time.perf_counter() - started)
+            path = response.get("path") or "llm"
+        results[intent] = {**summarize(samples), "path": path}
+    return results
+
+
+async def bench_ask_latency(repeat: int) -> dict:
+    """Per-node latency from the graph's update stream, plus end-to-end time."""
+    from langchain_core.messages import HumanMessage
+    from backend.workflow import app_graph
+
+    nodes, totals = {}, []
+    questions = list(QUESTIONS)
+    for i in range(repeat):
+        state = {
+            "messages":    [HumanMessage(content=questions[i % len(questions)])],
+            "table_name":  BENCH_TABLE,
+            "sql_query":   "",
+            "raw_result":  [],
+            "nl_answer":   "",
+            "error":       "",
+            "retry_count": 0
+        }
+        started = last = time.perf_counter()
+        async for update in app_graph.astream(state, stream_mode="updates"):
+            now = time.perf_counter()
+            for node in update:
+                nodes.setdefault(node, []).append(now - last)
+            last = now
+        totals.append(time.perf_counter() - started)
+    return {"total": summarize(totals), "nodes": {node: summarize(s) for node, s in nodes.items()}}
+
+
+async def bench_ask_throughput(client, concurrency_levels: list, requests_per_level: int) -> list:
+    questions = list(QUESTIONS)
+    results = []
+    for concurrency in concurrency_levels:
+        queue = asyncio.Queue()
+        for i in range(requests_per_level):
+            queue.put_nowait(questions[i % len(questions)])
+        latencies, statuses = [], {}
+
+        async def worker():
+            while not queue.empty():
+                question = queue.get_nowait()
+                started = time.perf_counter()
+                res = await client.post("/ask", json={"question": question, "table_name": BENCH_TABLE})
+                latencies.append(time.perf_counter() - started)
+                statuses[res.status_code] = statuses.get(res.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        results.append({
+            "concurrency":  concurrency,
+            "requests":     requests_per_level,
+            "seconds":      round(elapsed, 3),
+            "req_per_sec":  round(requests_per_level / elapsed, 2),
+            "latency":      summarize(latencies),
+            "status_codes": {str(k): v for k, v in sorted(statuses.items())}
+        })
+    return results
+
+
+# ─────────────────────────────────────────
+# COMPARISON
+# ─────────────────────────────────────────
+def headline_metrics(report: dict) -> dict:
+    """Flatten the numbers worth tracking between commits (higher-is-better noted per key)."""
+    metrics = {}
+    for row in report.get("ingestion", []):
+        metrics[f"ingestion.{row['rows']}.rows_per_sec (higher)"] = row["rows_per_sec"]
+    for shape, row in report.get("queries", {}).items():
+        metrics[f"query.{shape}.p50_ms"] = row["p50_ms"]
+    for engine, result in report.get("engines", {}).items():
+        for shape, row in result.get("queries", {}).items():
+            metrics[f"engine.{engine}.{shape}.p50_ms"] = row["p50_ms"]
+    latency = report.get("ask_latency", {})
+    if latency:
+        metrics["ask.total.p50_ms"] = latency["total"]["p50_ms"]
+        for node, row in latency["nodes"].items():
+            metrics[f"ask.node.{node}.p50_ms"] = row["p50_ms"]
+    for intent, row in report.get("fast_path", {}).items():
+        metrics[f"fast_path.{intent}.p50_ms"] = row["p50_ms"]
+    for row in report.get("ask_throughput", []):
+        metrics[f"throughput.c{row['concurrency']}.req_per_sec (higher)"] = row["req_per_sec"]
+    return metrics
+
+
+def compare(current: dict, baseline: dict) -> list:
+    now, before = headline_metrics(current), headline_metrics(baseline)
+    lines = []
+    for key in sorted(now.keys() & before.keys()):
+        change = (now[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+        lines.append(f"{key:<48} {before[key]:>12} → {now[key]:>12}  ({change:+.1f}%)")
+    return lines
+
+
+# ─────────────────────────────────────────
+# MAIN
+# ─────────────────────────────────────────
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the SQL agent backend.")
+    parser.add_argument("--out", default="bench.json", help="where to write the JSON results")
+    parser.add_argument("--compare", default="", help="earlier results file to compare against")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="CSV sizes (rows) for ingestion")
+    parser.add_argument("--table-rows", type=int, default=100000, help="rows in the table used by query/ask benches")
+    parser.add_argument("--repeat", type=int, default=50, help="repetitions per query shape / ask latency")
+    parser.add_argument("--concurrency", default="1,8,32", help="concurrent /ask clients per level")
+    parser.add_argument("--requests", type=int, default=64, help="/ask requests per concurrency level")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated stub LLM latency per call")
+    parser.add_argument("--url", default="", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--engines", default="sqlite,duckdb", help="storage engines to compare on the query shapes")
+    parser.add_argument("--only", default="", help="comma list of: ingestion,queries,engines,ask_latency,fast_path,ask_throughput")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, workdir: str):
+    """Point the backend at a scratch database and the stub LLM (before importing it)."""
+    responses = os.path.join(workdir, "stub_responses.json")
+    with open(responses, "w", encoding="utf-8") as f:
+        json.dump(QUESTIONS, f)
+    os.environ.update({
+        "TABLES_DIR":            os.path.join(workdir, "tables"),
+        "DB_PATH":               os.path.join(workdir, "legacy.db"),   # nothing to migrate
+        "CATALOG_PATH":          os.path.join(workdir, "catalog.db"),
+        "PARQUET_DIR":           os.path.join(workdir, "parquet"),
+        "LLM_PROVIDER":          "stub",
+        "STUB_LLM_LATENCY_MS":   str(args.llm_latency_ms),
+        "STUB_LLM_RESPONSES":    responses,
+        "ANSWER_CACHE_BACKEND":  "none",   # measure the pipeline, not the cache
+        "INDEX_ADVISOR_ENABLED": "0",      # keep the schema fixed across runs
+    })
+
+
+async def run(args) -> dict:
+    selected = set(filter(None, args.only.split(","))) or {
+        "ingestion", "queries", "engines", "ask_latency", "fast_path", "ask_throughput"
+    }
+    report = {
+        "meta": {
+            "commit":         git_commit(),
+            "timestamp":      time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python":         platform.python_version(),
+            "platform":       platform.platform(),
+            "table_rows":     args.table_rows,
+            "llm_latency_ms": args.llm_latency_ms,
+            "target":         args.url or "in-process"
+        }
+    }
+
+    from backend.utils import save_csv_to_db
+    from backend.database import TABLES_DIR, table_exists
+    if TABLES_DIR != os.environ["TABLES_DIR"]:
+        # config.py loads .env with override=True — never benchmark against real tables
+        raise SystemExit(f"TABLES_DIR is overridden (by .env?) to {TABLES_DIR}; refusing to run.")
+    if not table_exists(BENCH_TABLE):
+        save_csv_to_db(io.BytesIO(make_csv(args.table_rows)), BENCH_TABLE)
+
+    if "ingestion" in selected:
+        print("· ingestion", file=sys.stderr)
+        report["ingestion"] = await asyncio.to_thread(bench_ingestion, [int(s) for s in args.sizes.split(",")])
+    if "queries" in selected:
+        print("· db_query_tool", file=sys.stderr)
+        report["queries"] = await asyncio.to_thread(bench_queries, args.repeat)
+    if "engines" in selected:
+        print("· storage engines", file=sys.stderr)
+        report["engines"] = await asyncio.to_thread(
+            bench_engines, args.engines.split(","), args.table_rows, args.repeat
+        )
+    if "ask_latency" in selected:
+        print("· /ask latency by node", file=sys.stderr)
+        report["ask_latency"] = await bench_ask_latency(args.repeat)
+    if "fast_path" in selected:
+        print("· fast path", file=sys.stderr)
+        report["fast_path"] = await bench_fast_path(args.repeat)
+    if "ask_throughput" in selected:
+        print("· /ask throughput", file=sys.stderr)
+        import httpx
+        if args.url:
+            # The server must run with LLM_PROVIDER=stub and STUB_LLM_RESPONSES pointing at the same questions
+            client = httpx.AsyncClient(base_url=args.url, timeout=300)
+            await client.post("/upload", files={"file": ("bench.csv", make_csv(args.table_rows), "text/csv")},
+                              data={"table_name": BENCH_TABLE})   # 400 if it already exists
+        else:
+            from backend.app import app
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300)
+        async with client:
+            report["ask_throughput"] = await bench_ask_throughput(
+                client, [int(c) for c in args.concurrency.split(",")], args.requests
+            )
+    return report
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="sql_agent_bench_") as workdir:
+        configure_environment(args, workdir)
+        report = asyncio.run(run(args))
+        from backend.database import table_store, catalog_pool
+        table_store.close()
+        catalog_pool.close()
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nChange vs {args.compare} (commit {baseline.get('meta', {}).get('commit', '?')}):")
+        for line in compare(report, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 import streamlit as st
 import requests
+import json
+import time
+import uuid
 
 # ── Config ────────────────────────────────────────────
 BACKEND_URL = st.secrets.get("BACKEND_URL", "http://127.0.0.1:8000")
@@ -25,6 +28,55 @@ def fetch_tables():
         return []
 
 
+# ── Helper: read Server-Sent Events ───────────────────
+def iter_sse(res):
+    """Yield (event, data) pairs from a streaming requests response."""
+    event, data = "message", ""
+    for line in res.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data += line[len("data:"):].strip()
+        elif not line and data:
+            yield event, json.loads(data)
+            event, data = "message", ""
+
+
+NODE_LABELS = {
+    "query_gen":        "Generating SQL...",
+    "query_validation": "Validating SQL...",
+    "execute_query":    "Running query...",
+    "repair_query":     "Repairing failed SQL...",
+    "final_output":     "Summarizing results..."
+}
+
+
+# ── Helper: render result rows ────────────────────────
+def render_result_table(raw):
+    if not raw:
+        st.info("No rows returned for this query.")
+        return
+    # Build pure HTML table — zero pyarrow dependency
+    headers = list(raw[0].keys())
+    header_html = "".join(f"<th style='padding:8px 12px; background:#1e3a5f; color:white; text-align:left;'>{h}</th>" for h in headers)
+    rows_html = ""
+    for i, row in enumerate(raw):
+        bg = "#f0f4f8" if i % 2 == 0 else "#ffffff"
+        cells = "".join(f"<td style='padding:8px 14px; border-bottom:1px solid #ddd; color:#111111; font-size:14px;'>{row.get(h, '')}</td>" for h in headers)
+        rows_html += f"<tr style='background:{bg};'>{cells}</tr>"
+
+    table_html = f"""
+    <div style='overflow-x:auto; border-radius:8px; border:1px solid #ddd; margin-top:8px;'>
+    <table style='width:100%; border-collapse:collapse; font-size:14px; font-family:sans-serif; background:#ffffff;'>
+        <thead><tr>{header_html}</tr></thead>
+        <tbody>{rows_html}</tbody>
+    </table>
+    </div>
+    """
+    st.markdown(table_html, unsafe_allow_html=True)
+    st.caption(f"🔢 {len(raw)} row(s) returned")
+
+
 # ════════════════════════════════════════════════════
 # SECTION 1 — Upload CSV
 # ════════════════════════════════════════════════════
@@ -32,13 +84,25 @@ st.header("📂 Step 1 — Upload CSV Dataset")
 
 col1, col2 = st.columns([3, 2])
 with col1:
-    csv_file = st.file_uploader("Choose a CSV file", type="csv")
+    csv_file = st.file_uploader("Choose a CSV file", type=["csv", "gz", "zst"])
 with col2:
     table_name_input = st.text_input(
-        "Unique Table Name",
+        "Table Name",
         placeholder="e.g. sales_2024",
-        help="Only letters, numbers, underscores. Must be unique."
+        help="Only letters, numbers, underscores. Must be unique unless appending/upserting."
+    )
+    engine_input = st.selectbox(
+        "Storage Engine",
+        ["sqlite", "duckdb"],
+        help="duckdb stores the table as Parquet — faster scans and aggregates on large files."
     )
+    mode_input = st.radio(
+        "Load Mode",
+        ["create", "append", "upsert"],
+        horizontal=True,
+        help="append/upsert load into an existing SQLite table instead of creating a new one."
+    )
+    key_input = st.text_input("Upsert Key Column", placeholder="e.g. id") if mode_input == "upsert" else ""
 
 if st.button("⬆️ Upload CSV", use_container_width=True):
     if not csv_file:
@@ -49,7 +113,8 @@ if st.button("⬆️ Upload CSV", use_container_width=True):
         with st.spinner("Uploading..."):
             try:
                 files = {"file": (csv_file.name, csv_file, "text/csv")}
-                data  = {"table_name": table_name_input}
+                data  = {"table_name": table_name_input, "engine": engine_input,
+                         "mode": mode_input, "key": key_input}
                 res   = requests.post(f"{BACKEND_URL}/upload", files=files, data=data, timeout=30)
                 body  = res.json()
                 if res.status_code == 200:
@@ -118,29 +183,49 @@ else:
         help="Choose the dataset you want to analyze."
     )
 
+    profile_mode = st.radio(
+        "Report mode",
+        options=["auto", "full", "minimal"],
+        horizontal=True,
+        key="profile_mode",
+        help="auto = full report for small tables, sampled minimal report for large ones."
+    )
+
     if st.button("✨ Generate Insights Report", use_container_width=True):
-        with st.spinner("Analyzing dataset... This may take 15-30 seconds ⏳"):
+        with st.spinner("Analyzing dataset... Large tables are sampled ⏳"):
             try:
-                res = requests.get(
+                res = requests.post(
                     f"{BACKEND_URL}/profile/{insight_table}",
-                    timeout=120
+                    params={"mode": profile_mode},
+                    timeout=30
                 )
-                if res.status_code == 200:
-                    html_bytes = res.content
+                job = res.json()
+                if res.status_code not in (200, 202):
+                    raise RuntimeError(job.get("error", "Unknown error"))
+
+                # Poll the background job — another click on the same table joins it
+                deadline = time.time() + 600
+                while job["status"] == "running" and time.time() < deadline:
+                    time.sleep(2)
+                    job = requests.get(f"{BACKEND_URL}/profile/jobs/{job['job_id']}", timeout=30).json()
+
+                if job["status"] == "done":
+                    report = requests.get(f"{BACKEND_URL}/profile/jobs/{job['job_id']}/report", timeout=120)
                     st.success("✅ Report generated! Click below to download.")
+                    if job.get("sampled"):
+                        st.caption("ℹ️ Large table — the report was built from a systematic row sample.")
                     st.download_button(
                         label="📥 Download Full Insights Report (HTML)",
-                        data=html_bytes,
+                        data=report.content,
                         file_name=f"{insight_table}_insights_report.html",
                         mime="text/html",
                         use_container_width=True
                     )
                     st.info("💡 Open the downloaded HTML file in your browser to explore the full interactive report.")
+                elif job["status"] == "failed":
+                    st.error(f"❌ {job.get('error') or 'Report generation failed.'}")
                 else:
-                    error = res.json().get("error", "Unknown error")
-                    st.error(f"❌ {error}")
-            except requests.exceptions.Timeout:
-                st.error("❌ Report generation timed out. Try with a smaller dataset.")
+                    st.warning("⏳ Still running — click again later to pick up the same report.")
             except Exception as e:
                 st.error(f"❌ Error: {e}")
 
@@ -177,69 +262,82 @@ else:
         placeholder="e.g. What is the total amount spent?"
     )
 
+    follow_up = st.checkbox(
+        "Remember my previous answer",
+        value=False,
+        help="Follow-ups like \"sort that by amount\" refine the previous answer instead of starting over. "
+             "Questions asked this way skip the answer cache."
+    )
+    st.session_state.setdefault("session_id", uuid.uuid4().hex)
+
     if st.button("🔍 Ask", use_container_width=True):
         if not question:
             st.warning("⚠️ Please enter a question.")
         else:
-            with st.spinner("Generating SQL and fetching answer..."):
-                try:
-                    res = requests.post(
-                        f"{BACKEND_URL}/ask",
-                        json={"question": question, "table_name": selected_table},
-                        timeout=60
-                    )
-                    data = res.json()
+            status = st.status("Generating SQL...", expanded=False)
+            try:
+                res = requests.post(
+                    f"{BACKEND_URL}/ask/stream",
+                    json={
+                        "question": question,
+                        "table_name": selected_table,
+                        "session_id": st.session_state["session_id"] if follow_up else ""
+                    },
+                    stream=True,
+                    timeout=60
+                )
+                if res.status_code != 200:
+                    st.error(f"❌ Error: {res.json().get('error', 'Request failed.')}")
+                else:
+                    answer_text = ""
+                    answer_box = None
+                    got_rows = False
 
-                    if data.get("error"):
-                        st.error(f"❌ Error: {data['error']}")
-                    else:
-                        # ── 1. Generated SQL ──────────────────────
-                        st.subheader("🧠 Generated SQL Query")
-                        sql = data.get("sql_query", "")
-                        if sql:
-                            st.code(sql, language="sql")
-                        else:
-                            st.warning("No SQL query returned.")
+                    for event, data in iter_sse(res):
+                        if event == "node":
+                            status.update(label=NODE_LABELS.get(data["node"], data["node"]))
 
-                        st.divider()
+                        # ── 1. Generated SQL ──────────────────────
+                        elif event == "sql":
+                            st.subheader("🧠 Generated SQL Query")
+                            if data.get("sql"):
+                                st.code(data["sql"], language="sql")
+                            else:
+                                st.warning("No SQL query returned.")
+                            st.divider()
 
                         # ── 2. Raw Results ────────────────────────
-                        st.subheader("📊 Query Results")
-                        raw = data.get("raw_result", [])
-                        if raw:
-                            # Build pure HTML table — zero pyarrow dependency
-                            headers = list(raw[0].keys())
-                            header_html = "".join(f"<th style='padding:8px 12px; background:#1e3a5f; color:white; text-align:left;'>{h}</th>" for h in headers)
-                            rows_html = ""
-                            for i, row in enumerate(raw):
-                                bg = "#f0f4f8" if i % 2 == 0 else "#ffffff"
-                                cells = "".join(f"<td style='padding:8px 14px; border-bottom:1px solid #ddd; color:#111111; font-size:14px;'>{row.get(h, '')}</td>" for h in headers)
-                                rows_html += f"<tr style='background:{bg};'>{cells}</tr>"
-
-                            table_html = f"""
-                            <div style='overflow-x:auto; border-radius:8px; border:1px solid #ddd; margin-top:8px;'>
-                            <table style='width:100%; border-collapse:collapse; font-size:14px; font-family:sans-serif; background:#ffffff;'>
-                                <thead><tr>{header_html}</tr></thead>
-                                <tbody>{rows_html}</tbody>
-                            </table>
-                            </div>
-                            """
-                            st.markdown(table_html, unsafe_allow_html=True)
-                            st.caption(f"🔢 {len(raw)} row(s) returned")
-                        else:
-                            st.info("No rows returned for this query.")
-
-                        st.divider()
-
-                        # ── 3. Natural Language Answer ─────────────
-                        st.subheader("💡 Answer")
-                        answer = data.get("answer", "")
-                        if answer:
-                            st.success(answer)
-                        else:
-                            st.warning("No answer returned.")
-
-                except requests.exceptions.Timeout:
-                    st.error("❌ Request timed out. The backend may be slow — try again.")
-                except Exception as e:
-                    st.error(f"❌ Error: {e}")
\ No newline at end of file
+                        elif event == "rows":
+                            got_rows = True
+                            st.subheader("📊 Query Results")
+                            render_result_table(data.get("rows", []))
+                            if data.get("truncated"):
+                                st.caption(f"✂️ Showing the first {data['row_cap']} rows — use Export for the full result.")
+                            st.divider()
+                            st.subheader("💡 Answer")
+                            answer_box = st.empty()
+
+                        # ── 3. Natural Language Answer (token by token)
+                        elif event == "token":
+                            answer_text += data.get("text", "")
+                            if answer_box is not None:
+                                answer_box.success(answer_text)
+
+                        elif event == "error":
+                            st.error(f"❌ Error: {data.get('error')}")
+
+                        elif event == "done":
+                            if data.get("error"):
+                                st.error(f"❌ Error: {data['error']}")
+                            elif got_rows:
+                                answer = data.get("answer", "")
+                                if answer:
+                                    answer_box.success(answer)
+                                else:
+                                    answer_box.warning("No answer returned.")
+                            status.update(label="Done", state="complete")
+
+            except requests.exceptions.Timeout:
+                st.error("❌ Request timed out. The backend may be slow — try again.")
+            except Exception as e:
+                st.error(f"❌ Error: {e}")